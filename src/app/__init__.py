@@ -8,7 +8,19 @@ def create_app(config_class=Config):
     
     # Import and register blueprints inside create_app to avoid circular imports
     from app.routes.audio_routes import audio_bp ,branding_bp
+    from app.routes.stream_routes import stream_redirect_bp
     app.register_blueprint(audio_bp)
     app.register_blueprint(branding_bp)
+    app.register_blueprint(stream_redirect_bp)
     
-    return app
\ No newline at end of file
+    return app
+
+def create_stream_app(config_class=Config):
+    """Create the minimal app served by the gevent stream server (/api/stream only)."""
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    from app.routes.stream_routes import stream_bp
+    app.register_blueprint(stream_bp)
+
+    return app
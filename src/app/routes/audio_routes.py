@@ -2,26 +2,34 @@ import json
 import os
 import re
 import logging
-from flask import Blueprint, jsonify, request, send_from_directory, render_template,abort
+from flask import Blueprint, jsonify, request, send_from_directory, send_file, render_template,abort,current_app,Response
 from flask_cors import CORS
 import glob
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app.services.audio_handler import get_audio_handler
+from app.services import database
+from app.services.event_bus import get_event_bus
+from app.services.settings_service import get_settings_service, to_bool
+from app.services.retention import remove_audio_files, get_retention_service
+from app.services.audio_archiver import find_audio_variant, audio_mimetype
+from app.services.audio_analysis import analyze_clip
+from app.services.channel_registry import get_channel_registry, next_channel_id
+from app.services.device_presence import get_device_presence
+from app.services.upload_ingest import (
+    receive_upload, receive_batch, UploadRejected, admit_device_upload, duplicate_upload_body
+)
+from app.services.upload_sessions import get_upload_sessions
 from datetime import datetime,timezone
 from ..utils.logging_setup import error_logger,event_logger
-import threading
+from ..utils.recording_ids import now_ms, recording_filename, parse_captured_at
+from ..utils.config_cache import cached_config_response
 import sqlite3
 from serial import Serial, SerialException
 import serial.tools.list_ports
 
-db_lock = threading.Lock()
-DB_PATH = os.path.join('db', 'default.db')
-
-# New lock for channels.json
-channels_json_lock = threading.Lock()
-
 logs_bp = Blueprint('logs', __name__)
 # logs_bp = Blueprint('logs', __name__)
 
@@ -36,25 +44,12 @@ LOG_TYPES = {
 settings_bp = Blueprint('settings', __name__)
 
 
-# Path to settings.json
-SETTINGS_JSON_PATH = os.path.join('db', 'settings.json')
-USERS_JSON_PATH = os.path.join('db', 'users.json')
 branding_bp = Blueprint('branding', __name__)
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'ico'}
-BRANDING_JSON_PATH = os.path.join('db', 'branding.json')
 audio_bp = Blueprint('audio', __name__)
 
-# Set the path to the JSON file
-CHANNELS_JSON_PATH = os.path.join('db', 'channels.json')
-FREQUENCIES_JSON_PATH = os.path.join('db', 'frequencies.json')
-BRANDING_JSON_PATH = os.path.join('db', 'branding.json')
-
-# Load channels.json for MAC to channel_id mapping
-with open(CHANNELS_JSON_PATH, 'r') as f:
-    CHANNELS = json.load(f)
-
 # Set the base directory for recordings
 RECORDINGS_DIR = os.path.join(os.getcwd(), 'recordings')
 
@@ -69,161 +64,396 @@ def allowed_file(filename):
     """Check if the file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_channel_id_from_mac(mac, refresh=False):
+def notify_change(entity, entity_id='*'):
+    """Log a channel/settings change for /api/sync and push it to /api/stream clients."""
+    try:
+        database.record_change(entity, entity_id)
+        get_event_bus().publish(entity, {'id': entity_id})
+    except Exception as e:
+        error_logger.error(f"Error recording {entity} change: {str(e)}")
+
+def get_channel_details(channel_id):
     """
-    Retrieve channel_id from MAC address.
-    
+    Return the recording settings a device needs for a channel.
+
     Args:
-        mac (str): The MAC address to look up
-        refresh (bool): Whether to refresh channel data from disk
-        
+        channel_id (int): The channel ID to look up
+
     Returns:
-        int or None: The channel ID if found, None otherwise
+        dict: Channel details including sensitivity, silence, etc.
     """
-    global CHANNELS
-    
-    # Reload channels from JSON file if refresh is True
-    if refresh:
-        try:
-            with open(CHANNELS_JSON_PATH, 'r') as f:
-                CHANNELS = json.load(f)
-        except Exception as e:
-            error_logger.error(f"Error refreshing channels from JSON: {str(e)}")
-            # Continue with existing CHANNELS data if refresh fails
-    
-    # Look up the channel ID by MAC address
-    if mac:
-        mac = mac.upper()  # Normalize MAC address to uppercase
-        for channel in CHANNELS:
-            if channel.get('mac') == mac:
-                return channel.get('id')
-    
-    return None
-def get_channel_details(channel_id):
-    """Retrieve channel_id from MAC address."""
-    if os.path.exists(CHANNELS_JSON_PATH):
-        with open(CHANNELS_JSON_PATH, 'r') as f:
-            channel = json.load(f)
-    for channel in CHANNELS:
-        if channel['id'] == channel_id:
-            return channel
-    return None
+    channel = get_channel_registry().get(channel_id)
+    # Upload responses have always reported the channel's status as its state
+    return device_channel_settings(channel, state_field='status') if channel else {}
 
 
-def get_channel_details(channel_id):
+def device_channel_settings(channel, state_field='state'):
     """
-    Fetch the latest channel details from the JSON file.
-    
+    The subset of a channel's settings sent back to its device.
+
     Args:
-        channel_id (int): The channel ID to look up
-        
+        channel (dict): The channel
+        state_field (str): Channel field reported as state unless the channel is disabled
+    """
+    return {
+        'sensitivity': channel.get('sensitivity', '10'),
+        'silence': channel.get('silence', '1600'),
+        'min_rec': channel.get('min_rec', '1000'),
+        'max_rec': channel.get('max_rec', '10000'),
+        'audio_gain': channel.get('audio_gain', '0'),
+        'state': 'stop' if channel.get('status') == 'disabled' else channel.get(state_field, 'resume'),
+    }
+
+
+def _discard_duplicate(result, relative_path):
+    """
+    Delete an uploaded copy of a clip that is already stored under another name.
+
     Returns:
-        dict: Channel details including sensitivity, silence, etc.
+        dict or None: The existing recording (id, filename) if this upload was a duplicate
     """
-    channel_details = {}
-    
-    try:
-        # Always read the latest data from file
-        if os.path.exists(CHANNELS_JSON_PATH):
-            with open(CHANNELS_JSON_PATH, 'r') as f:
-                channels_data = json.load(f)
-
-            # Extract details for the specific channel
-            for channel in channels_data:
-                if channel.get('id') == channel_id:
-                    channel_details = {
-                        'sensitivity': channel.get('sensitivity', '10'),
-                        'silence': channel.get('silence', '1600'),
-                        'min_rec': channel.get('min_rec', '1000'),
-                        'max_rec': channel.get('max_rec', '10000'),
-                        'audio_gain': channel.get('audio_gain', '0'),
-                        'state': 'stop' if channel.get('status') == 'disabled' else channel.get('status', 'resume'),
-                    }
-                    break
-    except Exception as e:
-        error_logger.error(f"Error fetching channel details: {str(e)}")
-    
-    return channel_details
+    duplicate = result.get('duplicate_of')
+    if not duplicate or duplicate['filename'] == relative_path:
+        return None
+    remove_audio_files([relative_path])
+    return duplicate
 
 
-# Initialize CHANNELS global variable
-CHANNELS = []
+def _duplicate_response(duplicate, result, channel_id):
+    return jsonify(duplicate_upload_body(
+        duplicate, result.get('timestamp'), channel_id, get_channel_details(channel_id)
+    )), 200
+
+
+def _admit_device_upload():
+    """Return (mac, channel_id) of the device uploading with ?mac=, or raise UploadRejected."""
+    mac = request.args.get('mac')
+    return mac, admit_device_upload(mac)
+
+
+def _rejected_response(e):
+    return jsonify({'error': e.message}), e.status, e.headers
+
+
+def _upload_response(result, relative_path, channel_id, size, sha256):
+    """Answer a device whose clip was queued, or point it at the recording the clip duplicates."""
+    duplicate = _discard_duplicate(result, relative_path)
+    if duplicate:
+        return _duplicate_response(duplicate, result, channel_id)
+    return jsonify({
+        'message': 'File uploaded successfully and queued for processing',
+        'filename': relative_path,  # Return the relative path
+        'timestamp': result.get('timestamp'),
+        'status': result.get('status'),
+        'channel_id': channel_id,
+        'channel_details': get_channel_details(channel_id),
+        'size': size,
+        'sha256': sha256
+    }), 200
+
 
-# Load initial channel data
-try:
-    with open(CHANNELS_JSON_PATH, 'r') as f:
-        CHANNELS = json.load(f)
-except Exception as e:
-    error_logger.error(f"Error loading initial channel data: {str(e)}")
-    
 # Update your route handlers
 @audio_bp.route('/api/uploads', methods=['POST'])
 def upload_audio():
-    """Handle audio file uploads with real-time channel MAC address fetching."""
+    """
+    Handle audio file uploads with real-time channel MAC address fetching.
+
+    Devices may pass captured_at (epoch ms/s or ISO 8601) with the capture
+    time of the clip; the server receive time is recorded alongside it. The
+    clip is sent as the multipart 'file' field or as the raw request body.
+    Each device is held to the upload rate limit (429 with Retry-After).
+    A clip identical to one received on the channel recently is not stored
+    again; the response then points at the existing recording.
+    """
     try:
-        mac = request.args.get('mac')
-        if not mac:
-            return jsonify({'error': 'MAC address is required'}), 400
+        received_at_ms = now_ms()
+        mac, channel_id = _admit_device_upload()
 
-        # Fetch latest channel information directly from JSON file
-        channel_id = get_channel_id_from_mac(mac, refresh=True)
-        if channel_id is None:
-            return jsonify({'error': 'Invalid MAC address'}), 400
+        # Unique per clip, even for bursts within the same second
+        filename = recording_filename(received_at_ms)
+        # Create relative path for database storage
+        relative_path = os.path.join('recordings', f'channel_{channel_id}', filename)
+        # Create absolute path for file saving
+        absolute_path = os.path.join(os.getcwd(), relative_path)
 
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part in the request'}), 400
+        # Create directory for the channel if it doesn't exist
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
 
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected for uploading'}), 400
+        # Stream the body straight to its final path, hashing and checking it on the way
+        form, clip = receive_upload(request, absolute_path, current_app.config.get('MAX_CONTENT_LENGTH'))
 
-        if file and allowed_file(file.filename):
-            # Generate filename with current date and time
-            current_time = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-            filename = f"audio_{current_time}.wav"
+        try:
+            captured_at_ms = parse_captured_at(
+                request.args.get('captured_at') or form.get('captured_at'),
+                received_at_ms
+            )
 
-            # Create relative path for database storage
-            relative_path = os.path.join('recordings', f'channel_{channel_id}', filename)
-            # Create absolute path for file saving
-            absolute_path = os.path.join(os.getcwd(), relative_path)
+            # Get audio handler instance and queue the file for processing
+            audio_handler = get_audio_handler()
+            success, result = audio_handler.queue_upload_for_processing(
+                relative_path, channel_id,
+                captured_at_ms=captured_at_ms, received_at_ms=received_at_ms,
+                content_hash=clip.sha256
+            )
+        except Exception:
+            # Never leave a clip on disk that no row points at
+            clip.discard()
+            raise
 
-            # Create directory for the channel if it doesn't exist
-            os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        if success:
+            return _upload_response(result, relative_path, channel_id, clip.size, clip.sha256)
 
-            # Save the file
-            file.save(absolute_path)
+        clip.discard()
+        return jsonify({'error': f'Error queueing file: {result}'}), 500
 
-            # Get audio handler instance and queue the file for processing
-            audio_handler = get_audio_handler()
-            success, result = audio_handler.queue_upload_for_processing(relative_path, channel_id)
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in upload_audio: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+@audio_bp.route('/api/uploads/batch', methods=['POST'])
+def upload_audio_batch():
+    """
+    Accept a device's buffered clips in one request after it reconnects.
+
+    The body is multipart/form-data with one 'file' part per clip and
+    captured_at fields in the same order, or a tar stream whose members are
+    the clips (capture time from a captured_at pax header or the mtime).
+    Clips are written straight to their final paths, recorded in one
+    transaction and transcribed after any live uploads. Clips that fail
+    validation are listed under rejected, clips already stored under
+    duplicates; the rest are still accepted.
+    """
+    try:
+        received_at_ms = now_ms()
+        mac, channel_id = _admit_device_upload()
 
-            if success:
-                # Fetch latest channel details directly from JSON file
-                channel_details = get_channel_details(channel_id)
-                
-                return jsonify({
-                    'message': 'File uploaded successfully and queued for processing',
-                    'filename': relative_path,  # Return the relative path
-                    'timestamp': result.get('timestamp'),
-                    'status': result.get('status'),
-                    'channel_id': channel_id,
-                    'channel_details': channel_details
-                }), 200
+        directory = os.path.join('recordings', f'channel_{channel_id}')
+        os.makedirs(os.path.join(os.getcwd(), directory), exist_ok=True)
 
-            return jsonify({'error': f'Error queueing file: {result}'}), 500
+        def next_path():
+            return os.path.join(os.getcwd(), directory, recording_filename(received_at_ms))
 
-        return jsonify({'error': 'Allowed file types are wav, mp3'}), 400
+        clips = receive_batch(
+            request, next_path,
+            max_bytes=current_app.config.get('BATCH_MAX_CONTENT_LENGTH'),
+            max_clip_bytes=current_app.config.get('MAX_CONTENT_LENGTH'),
+            max_clips=current_app.config.get('BATCH_MAX_CLIPS')
+        )
 
+        accepted = []
+        queued = []
+        rejected = []
+        try:
+            for clip in clips:
+                if clip.error is None:
+                    try:
+                        captured_at_ms = parse_captured_at(clip.captured_at, received_at_ms, strict=True)
+                    except ValueError as e:
+                        clip.discard()
+                        clip.error = str(e)
+                if clip.error is not None:
+                    rejected.append({'source': clip.source, 'error': clip.error})
+                    continue
+                accepted.append(clip)
+                queued.append((os.path.join(directory, os.path.basename(clip.path)), captured_at_ms, clip.sha256))
+            if not accepted:
+                return jsonify({'error': 'No valid clips in the batch', 'rejected': rejected}), 400
+
+            duplicates = get_audio_handler().queue_batch_for_processing(queued, channel_id, received_at_ms)
+        except Exception:
+            # Never leave a clip on disk that no row points at
+            for clip in clips:
+                clip.discard()
+            raise
+        remove_audio_files(duplicates)
+        event_logger.info(
+            f"Batch of {len(accepted) - len(duplicates)} clips received for MAC: {mac} "
+            f"({len(duplicates)} duplicates, {len(rejected)} rejected)"
+        )
+
+        return jsonify({
+            'message': f'{len(accepted) - len(duplicates)} clips uploaded and queued for processing',
+            'channel_id': channel_id,
+            'accepted': [
+                {
+                    'source': clip.source,
+                    'filename': relative_path,
+                    'captured_at_ms': captured_at_ms,
+                    'size': clip.size,
+                    'sha256': clip.sha256
+                }
+                for clip, (relative_path, captured_at_ms, _) in zip(accepted, queued)
+                if relative_path not in duplicates
+            ],
+            'duplicates': [
+                {
+                    'source': clip.source,
+                    'recording_id': duplicates[relative_path]['id'],
+                    'filename': duplicates[relative_path]['filename'],
+                    'sha256': clip.sha256
+                }
+                for clip, (relative_path, _, _) in zip(accepted, queued)
+                if relative_path in duplicates
+            ],
+            'rejected': rejected,
+            'channel_details': get_channel_details(channel_id)
+        }), 200
+
+    except UploadRejected as e:
+        return _rejected_response(e)
     except Exception as e:
-        error_logger.error(f"Error in upload_audio: {str(e)}")
+        error_logger.error(f"Error in upload_audio_batch: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+def _device_session(session_id):
+    """Return the upload session for the requesting device (by ?mac=), or raise UploadRejected."""
+    session = get_upload_sessions().status(session_id)
+    if (request.args.get('mac') or '').upper() != session['mac']:
+        raise UploadRejected('Unknown upload session', 404)
+    return session
+
+
+def _session_response(session, status=200):
+    response = jsonify({
+        'session_id': session['id'],
+        'offset': session['offset'],
+        'size': session['size'],
+        'channel_id': session['channel_id']
+    })
+    response.headers['Upload-Offset'] = str(session['offset'])
+    return response, status
+
+
+@audio_bp.route('/api/uploads/sessions', methods=['POST'])
+def create_upload_session():
+    """
+    Start a resumable upload of one clip.
+
+    Query parameters:
+        mac: The device's MAC address
+        size: Total clip size in bytes (optional, enables completeness checks)
+        captured_at: Capture time of the clip (epoch ms/s or ISO 8601)
+
+    The device then PUTs chunks to /api/uploads/sessions/<id>?offset=N
+    (N being the offset the server reported), asks for the offset with GET
+    after an error, and POSTs /api/uploads/sessions/<id>/complete at the end.
+    """
+    try:
+        mac, channel_id = _admit_device_upload()
+
+        captured_at = request.args.get('captured_at')
+        session = get_upload_sessions().create(
+            channel_id, mac.upper(),
+            size=request.args.get('size', type=int),
+            captured_at_ms=parse_captured_at(captured_at, now_ms()) if captured_at else None
+        )
+        return _session_response(session, 201)
+
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in create_upload_session: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@audio_bp.route('/api/uploads/sessions/<session_id>', methods=['GET'])
+def get_upload_session(session_id):
+    """Return the offset received so far (also in the Upload-Offset header)."""
+    try:
+        return _session_response(_device_session(session_id))
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in get_upload_session: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@audio_bp.route('/api/uploads/sessions/<session_id>', methods=['PUT'])
+def put_upload_chunk(session_id):
+    """
+    Append the request body to the session at ?offset= (or the Upload-Offset header).
+
+    Answers 409 with the current offset when offset does not match it.
+    """
+    try:
+        _device_session(session_id)
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            offset = request.headers.get('Upload-Offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'offset is required'}), 400
+
+        sessions = get_upload_sessions()
+        try:
+            sessions.append(session_id, offset, request.stream)
+        except UploadRejected as e:
+            response = jsonify({'error': e.message, 'offset': sessions.status(session_id)['offset']})
+            return response, e.status
+        return _session_response(sessions.status(session_id))
+
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in put_upload_chunk: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
+
+
+@audio_bp.route('/api/uploads/sessions/<session_id>/complete', methods=['POST'])
+def complete_upload_session(session_id):
+    """Finish a resumable upload and queue the clip like /api/uploads does."""
+    try:
+        received_at_ms = now_ms()
+        session = _device_session(session_id)
+        channel_id = session['channel_id']
+
+        filename = recording_filename(received_at_ms)
+        relative_path = os.path.join('recordings', f'channel_{channel_id}', filename)
+        absolute_path = os.path.join(os.getcwd(), relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+        clip = get_upload_sessions().finalize(session_id, absolute_path)
+
+        audio_handler = get_audio_handler()
+        success, result = audio_handler.queue_upload_for_processing(
+            relative_path, channel_id,
+            captured_at_ms=session['captured_at_ms'], received_at_ms=received_at_ms,
+            content_hash=clip['sha256']
+        )
+        if success:
+            return _upload_response(result, relative_path, channel_id, clip['size'], clip['sha256'])
+
+        return jsonify({'error': f'Error queueing file: {result}'}), 500
+
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in complete_upload_session: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@audio_bp.route('/api/uploads/sessions/<session_id>', methods=['DELETE'])
+def abort_upload_session(session_id):
+    """Abandon a resumable upload and delete its data."""
+    try:
+        _device_session(session_id)
+        get_upload_sessions().abort(session_id)
+        return jsonify({'message': 'Upload session deleted'}), 200
+    except UploadRejected as e:
+        return _rejected_response(e)
+    except Exception as e:
+        error_logger.error(f"Error in abort_upload_session: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
 @audio_bp.route('/api/uploads/queue', methods=['POST'])
 def upload_audio_queue():
     """Handle audio file uploads with real-time channel MAC address fetching."""
     try:
         mac = request.args.get('mac')  # Fetch MAC from query parameters
         relative_path = request.args.get('relative_path')  # Fetch from query parameters
-        channel_id = request.args.get('channel_id')  # Fetch from query parameters
+        channel_id = request.args.get('channel_id', type=int)  # Fetch from query parameters
 
         # Validate required parameters
         if not relative_path or not channel_id:
@@ -231,9 +461,19 @@ def upload_audio_queue():
 
         # Get audio handler instance and queue the file for processing
         audio_handler = get_audio_handler()
-        success, result = audio_handler.queue_upload_for_processing(relative_path, channel_id)
+        success, result = audio_handler.queue_upload_for_processing(
+            relative_path, channel_id,
+            captured_at_ms=request.args.get('captured_at_ms', type=int),
+            received_at_ms=request.args.get('received_at_ms', type=int),
+            content_hash=request.args.get('content_hash')
+        )
 
         if success:
+            duplicate = _discard_duplicate(result, relative_path)
+            if duplicate:
+                # Drop the forwarding service's placeholder row along with the copy
+                database.delete_queued_recording(channel_id, relative_path)
+                return jsonify({'message': 'OK', 'duplicate_of': duplicate}), 200
             return jsonify({'message': 'OK'}), 200
         
         return jsonify({'error': f'Error queueing file: {result}'}), 500
@@ -259,8 +499,165 @@ def get_upload_status(filename):
         return jsonify({'error': 'Internal server error'}), 500
 @audio_bp.route('/api/recordings')
 def get_recordings():
+    """
+    Return a page of recordings, newest first.
+
+    Query parameters:
+        limit: Page size (capped at RECORDINGS_MAX_PAGE_SIZE)
+        before_id / after_id: Keyset cursor for older / newer pages
+        channel_id: Restrict to one channel
+        start / end: Timestamp range (YYYYmmdd_HHMMSS)
+        status: Comma-separated list of statuses
+        min_<metric> / max_<metric>: Range on a signal metric (rms_dbfs,
+            peak_dbfs, clipping_ratio, snr_db, speech_ratio), e.g.
+            max_snr_db=10 for weak transmissions
+
+    The id to pass as before_id for the next older page is returned in the
+    X-Next-Before-Id header when more rows may exist.
+    """
+    limit = request.args.get('limit', current_app.config.get('RECORDINGS_PAGE_SIZE', 500), type=int)
+    limit = max(1, min(limit, current_app.config.get('RECORDINGS_MAX_PAGE_SIZE', 5000)))
+    status = request.args.get('status')
+    filters = {
+        'before_id': request.args.get('before_id', type=int),
+        'after_id': request.args.get('after_id', type=int),
+        'channel_id': request.args.get('channel_id', type=int),
+        'start': request.args.get('start'),
+        'end': request.args.get('end'),
+        'statuses': [s.strip() for s in status.split(',') if s.strip()] if status else None,
+        'metric_ranges': {
+            column: (request.args.get(f'min_{column}', type=float), request.args.get(f'max_{column}', type=float))
+            for column in database.METRIC_COLUMNS
+            if f'min_{column}' in request.args or f'max_{column}' in request.args
+        },
+    }
+
     audio_handler = get_audio_handler()
-    return jsonify(audio_handler.get_all_recordings() if audio_handler else [])
+    recordings = audio_handler.get_all_recordings(limit, **filters) if audio_handler else []
+
+    response = jsonify(recordings)
+    if len(recordings) == limit:
+        response.headers['X-Next-Before-Id'] = str(recordings[-1]['id'])
+    return response
+
+
+@audio_bp.route('/api/search')
+def search_recordings():
+    """
+    Full-text search over transcriptions.
+
+    Query parameters:
+        q: Search text; "quoted phrases" and prefix* terms are supported
+        channel_id: Restrict to one channel
+        start / end: Timestamp range (YYYYmmdd_HHMMSS)
+        limit / offset: Paging over the BM25-ranked results
+
+    Each result carries a snippet with matches wrapped in <mark> tags.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+
+    limit = request.args.get('limit', 50, type=int)
+    limit = max(1, min(limit, current_app.config.get('RECORDINGS_MAX_PAGE_SIZE', 5000)))
+    try:
+        results = database.search_recordings(
+            query,
+            limit,
+            offset=max(0, request.args.get('offset', 0, type=int)),
+            channel_id=request.args.get('channel_id', type=int),
+            start=request.args.get('start'),
+            end=request.args.get('end')
+        )
+        return jsonify(results)
+    except sqlite3.OperationalError as e:
+        error_logger.error(f"Error searching recordings: {str(e)}")
+        return jsonify({'error': 'Search is unavailable'}), 503
+
+
+@audio_bp.route('/api/stats')
+def get_stats():
+    """
+    Return per-channel traffic time series from the rollup tables.
+
+    Query parameters:
+        period: 'minute', 'hour' or 'day' (default 'minute')
+        start / end: Epoch milliseconds; defaults to the last
+            STATS_DEFAULT_BUCKETS buckets
+        channel_id: Restrict to one channel
+
+    Each point holds messages, airtime_ms and pending (recordings in that
+    bucket still awaiting a transcription) for one channel and bucket.
+    """
+    widths = dict(database.ROLLUP_PERIODS)
+    period = request.args.get('period', 'minute')
+    if period not in widths:
+        return jsonify({'error': f"period must be one of {', '.join(widths)}"}), 400
+    width = widths[period]
+
+    end = request.args.get('end', type=int) or now_ms()
+    start = request.args.get('start', type=int)
+    if start is None:
+        start = end - current_app.config.get('STATS_DEFAULT_BUCKETS', 60) * width
+    # Bound the response regardless of the requested range
+    start = max(start, end - current_app.config.get('STATS_MAX_BUCKETS', 2000) * width)
+    start -= start % width
+
+    try:
+        series = database.get_rollups(period, start, end, request.args.get('channel_id', type=int))
+    except sqlite3.Error as e:
+        error_logger.error(f"Error retrieving stats: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+    return jsonify({
+        'period': period,
+        'bucket_ms': width,
+        'start': start,
+        'end': end,
+        'series': series
+    })
+
+
+@audio_bp.route('/api/retention')
+def get_retention_report():
+    """Return the retention policies, the last pass's reclaimed space and current free space."""
+    service = get_retention_service()
+    if service is None:
+        return jsonify({'error': 'Retention service is not running'}), 503
+    return jsonify({
+        'default_policy': service.default_policy,
+        'channel_policies': service.channel_policies,
+        'min_free_bytes': service.min_free_bytes,
+        'target_free_bytes': service.target_free_bytes,
+        'archive_dir': service.archive_dir,
+        'last_report': service.last_report,
+        'free_bytes': service.free_bytes()
+    })
+
+
+@audio_bp.route('/api/alerts')
+def get_alerts():
+    """
+    Return keyword alert hits, newest first.
+
+    Query parameters:
+        limit: Page size
+        before_id: Keyset cursor (id of the last hit on the previous page)
+        channel_id: Restrict to one channel
+        keyword: Restrict to one keyword
+    """
+    limit = request.args.get('limit', 100, type=int)
+    limit = max(1, min(limit, current_app.config.get('RECORDINGS_MAX_PAGE_SIZE', 5000)))
+    try:
+        return jsonify(database.query_alerts(
+            limit,
+            before_id=request.args.get('before_id', type=int),
+            channel_id=request.args.get('channel_id', type=int),
+            keyword=request.args.get('keyword')
+        ))
+    except sqlite3.Error as e:
+        error_logger.error(f"Error retrieving alerts: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
 
 
 @audio_bp.route('/api/channel/<int:channel_id>/recordings')
@@ -268,21 +665,130 @@ def get_channel_recordings(channel_id):
     audio_handler = get_audio_handler()
     return jsonify(audio_handler.get_channel_recordings(channel_id) if audio_handler else [])
 
+@audio_bp.route('/api/channel/<int:channel_id>/audio_metrics')
+def get_channel_audio_metrics(channel_id):
+    """
+    Average signal metrics over a channel's latest recordings, for tuning
+    the device's sensitivity and audio_gain.
+
+    Query parameters:
+        sample: Number of recent analyzed recordings to average (default 200)
+    """
+    sample = max(1, min(request.args.get('sample', 200, type=int), 5000))
+    try:
+        return jsonify(dict(database.get_channel_metrics(channel_id, sample), channel_id=channel_id))
+    except sqlite3.Error as e:
+        error_logger.error(f"Error retrieving audio metrics for channel {channel_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def load_channels():
+    """Load all channels with default values for missing fields."""
+    channels_data = get_channel_registry().all()
+
+    # Add default values for model and language if not present
+    for channel in channels_data:
+        channel.setdefault('model', 'medium.en')  # Default model
+        channel.setdefault('src_language', 'english')  # Default language
+
+    return channels_data
+
 @audio_bp.route('/api/channels')
+@cached_config_response('channels')
 def get_channels():
     """Fetch and return all channels with default values for missing fields."""
-    if os.path.exists(CHANNELS_JSON_PATH):
-        with open(CHANNELS_JSON_PATH, 'r') as f:
-            channels_data = json.load(f)
-        
-        # Add default values for model and language if not present
-        for channel in channels_data:
-            channel.setdefault('model', 'medium.en')  # Default model
-            channel.setdefault('src_language', 'english')  # Default language
-        
-        return jsonify(channels_data)
-    
-    return jsonify([])
+    return jsonify(load_channels())
+
+@audio_bp.route('/api/sync')
+def sync():
+    """
+    Return everything that changed since a change version.
+
+    Query parameters:
+        since: The version returned by the previous sync (omit for a full snapshot)
+        before_id: next_before_id of the previous page of a full snapshot
+
+    Responds 304 with no body when nothing changed. Otherwise returns the new
+    version plus only the recordings, channels and settings that changed,
+    and the ids of deleted recordings and channels; has_more is set when the
+    delta was cut at RECORDINGS_MAX_PAGE_SIZE and the client should sync
+    again straight away. Cursors older than the change log's pruned deletes
+    get a full snapshot.
+
+    A full snapshot holds RECORDINGS_PAGE_SIZE recordings, newest first. When
+    has_more is set the client fetches the older ones with
+    before_id=next_before_id (and no since) until it is not, then syncs
+    since the version of the first page so nothing changed meanwhile is missed.
+    """
+    since = request.args.get('since', type=int)
+    before_id = request.args.get('before_id', type=int)
+    max_changes = current_app.config.get('RECORDINGS_MAX_PAGE_SIZE', 5000)
+
+    try:
+        version = database.get_change_version()
+        if since is not None and since == version:
+            return '', 304
+
+        settings = init_settings()
+        hide_hallucinations = to_bool(settings.get("global_hallucination"))
+
+        if not since or since > version or since < database.get_change_floor():
+            # Full snapshot (first sync, the database was reset under the client,
+            # or deletes it has not seen were pruned)
+            page_size = current_app.config.get('RECORDINGS_PAGE_SIZE', 500)
+            # One row past the page tells whether older recordings remain
+            recordings = database.query_recordings(
+                page_size + 1, before_id=before_id, hide_hallucinations=hide_hallucinations
+            )
+            has_more = len(recordings) > page_size
+            recordings = recordings[:page_size]
+            return jsonify({
+                'version': version,
+                'full': True,
+                'has_more': has_more,
+                'next_before_id': recordings[-1]['id'] if has_more else None,
+                'recordings': recordings,
+                'deleted_recordings': [],
+                'channels': load_channels(),
+                'deleted_channels': [],
+                'settings': settings,
+            })
+
+        changes = database.get_changes_since(since, max_changes)
+        changed_ids = [int(c['entity_id']) for c in changes if c['entity'] == 'recording' and c['op'] != 'delete']
+        deleted_ids = [int(c['entity_id']) for c in changes if c['entity'] == 'recording' and c['op'] == 'delete']
+        changed_channels = {c['entity_id'] for c in changes if c['entity'] == 'channel'}
+        settings_changed = any(c['entity'] == 'settings' for c in changes)
+
+        recordings = []
+        for recording in database.get_recordings_by_ids(changed_ids):
+            # A recording that turned into a hallucination disappears from the client
+            if hide_hallucinations and recording['transcription'] in database.HALLUCINATION_PLACEHOLDERS:
+                deleted_ids.append(recording['id'])
+            else:
+                recordings.append(recording)
+
+        channels, deleted_channels = None, []
+        if changed_channels:
+            current = load_channels()
+            channels = [c for c in current if str(c.get('id')) in changed_channels]
+            # A changed channel that no longer exists was deleted
+            deleted_channels = sorted(
+                int(cid) for cid in changed_channels - {str(c.get('id')) for c in current} if cid.isdigit()
+            )
+
+        return jsonify({
+            'version': changes[-1]['version'] if changes else version,
+            'full': False,
+            'has_more': len(changes) == max_changes,
+            'recordings': recordings,
+            'deleted_recordings': deleted_ids,
+            'channels': channels,
+            'deleted_channels': deleted_channels,
+            'settings': settings if settings_changed else None,
+        })
+    except Exception as e:
+        error_logger.error(f"Error in sync: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
 @audio_bp.route('/api/channel/<int:channel_id>', methods=['PUT'])
 def update_channel(channel_id):
     """Update a channel's data."""
@@ -291,70 +797,67 @@ def update_channel(channel_id):
     if not data:
         return jsonify({'error': 'Request body is missing or invalid'}), 400
 
-    # Load existing channel data
-    if os.path.exists(CHANNELS_JSON_PATH):
-        with open(CHANNELS_JSON_PATH, 'r') as f:
-            channels_data = json.load(f)
-
-        # Find the channel by ID
-        channel = next((c for c in channels_data if c['id'] == channel_id), None)
-        if not channel:
-            return jsonify({'error': 'Channel not found'}), 404
-
-        # Validate required fields if they're provided
-        if 'name' in data and not data['name']:
-            return jsonify({'error': 'Name cannot be empty'}), 400
-        if 'status' in data and not data['status']:
-            return jsonify({'error': 'Status cannot be empty'}), 400
-
-        # Validate color formats if they're provided
-        hex_color_pattern = r'^#[0-9A-Fa-f]{6}$'
-        colors_to_validate = [
-            ('color', data.get('color')),
-            ('background_color', data.get('background_color')),
-            ('team_color', data.get('team_color'))
-        ]
-        for color_field, color_value in colors_to_validate:
-            if color_value and not re.match(hex_color_pattern, color_value):
-                return jsonify({'error': f'Invalid {color_field} format. Use a hex color code (e.g., #RRGGBB).'}), 400
-
-        # Validate audio settings if they're provided
-        audio_validations = [
-            ('sensitivity', data.get('sensitivity'), lambda x: 0 <= float(x) <= 100, "Sensitivity must be between 0 and 100."),
-            ('silence', data.get('silence'), lambda x: 500 <= float(x) <= 5000, "Silence must be between 500 and 5000 milliseconds."),
-            ('min_rec', data.get('min_rec'), lambda x: 1000 <= float(x) <= 5000, "Min recording time must be between 1000 and 5000 milliseconds."),
-            ('max_rec', data.get('max_rec'), lambda x: 10000 <= float(x) <= 30000, "Max recording time must be between 10000 and 30000 milliseconds."),
-            ('audio_gain', data.get('audio_gain'), lambda x: 0 <= float(x) <= 5, "Audio gain must be between 0 and 5.")
-        ]
+    registry = get_channel_registry()
+    if registry.get(channel_id) is None:
+        return jsonify({'error': 'Channel not found'}), 404
 
-        for field, value, validation_func, error_msg in audio_validations:
-            if value is not None:  # Only validate if the field is provided
-                try:
-                    float_value = float(value)
-                    if not validation_func(float_value):
-                        return jsonify({'error': error_msg}), 400
-                except ValueError:
-                    return jsonify({'error': f'Invalid {field} value. Must be a number.'}), 400
-
-        # Update only the fields that were provided in the request
-        fields_to_update = [
-            'name', 'status', 'model', 'color', 'background_color', 'team_color',
-            'src_language', 'target_language', 'sensitivity', 'silence', 'min_rec',
-            'max_rec', 'audio_gain', 'driver', 'mac', 'person', 'tag', 'car',
-            'frequency', 'tone', 'type'
-        ]
+    # Validate required fields if they're provided
+    if 'name' in data and not data['name']:
+        return jsonify({'error': 'Name cannot be empty'}), 400
+    if 'status' in data and not data['status']:
+        return jsonify({'error': 'Status cannot be empty'}), 400
 
+    # Validate color formats if they're provided
+    hex_color_pattern = r'^#[0-9A-Fa-f]{6}$'
+    colors_to_validate = [
+        ('color', data.get('color')),
+        ('background_color', data.get('background_color')),
+        ('team_color', data.get('team_color'))
+    ]
+    for color_field, color_value in colors_to_validate:
+        if color_value and not re.match(hex_color_pattern, color_value):
+            return jsonify({'error': f'Invalid {color_field} format. Use a hex color code (e.g., #RRGGBB).'}), 400
+
+    # Validate audio settings if they're provided
+    audio_validations = [
+        ('sensitivity', data.get('sensitivity'), lambda x: 0 <= float(x) <= 100, "Sensitivity must be between 0 and 100."),
+        ('silence', data.get('silence'), lambda x: 500 <= float(x) <= 5000, "Silence must be between 500 and 5000 milliseconds."),
+        ('min_rec', data.get('min_rec'), lambda x: 1000 <= float(x) <= 5000, "Min recording time must be between 1000 and 5000 milliseconds."),
+        ('max_rec', data.get('max_rec'), lambda x: 10000 <= float(x) <= 30000, "Max recording time must be between 10000 and 30000 milliseconds."),
+        ('audio_gain', data.get('audio_gain'), lambda x: 0 <= float(x) <= 5, "Audio gain must be between 0 and 5.")
+    ]
+
+    for field, value, validation_func, error_msg in audio_validations:
+        if value is not None:  # Only validate if the field is provided
+            try:
+                float_value = float(value)
+                if not validation_func(float_value):
+                    return jsonify({'error': error_msg}), 400
+            except ValueError:
+                return jsonify({'error': f'Invalid {field} value. Must be a number.'}), 400
+
+    # Update only the fields that were provided in the request
+    fields_to_update = [
+        'name', 'status', 'model', 'color', 'background_color', 'team_color',
+        'src_language', 'target_language', 'sensitivity', 'silence', 'min_rec',
+        'max_rec', 'audio_gain', 'driver', 'mac', 'person', 'tag', 'car',
+        'frequency', 'tone', 'type'
+    ]
+
+    def apply(channels):
+        channel = next((c for c in channels if c.get('id') == channel_id), None)
+        if channel is None:
+            return False
         for field in fields_to_update:
             if field in data:
                 channel[field] = data[field]
+        return True
 
-        # Save updated data back to the file
-        with open(CHANNELS_JSON_PATH, 'w') as f:
-            json.dump(channels_data, f, indent=4)
-
-        return jsonify({'message': 'Channel updated successfully'}), 200
+    if not registry.update(apply):
+        return jsonify({'error': 'Channel not found'}), 404
+    notify_change('channel', channel_id)
 
-    return jsonify({'error': 'Channels file not found'}), 500
+    return jsonify({'message': 'Channel updated successfully'}), 200
 @audio_bp.route('/api/channel', methods=['POST'])
 def create_channel():
     """
@@ -417,18 +920,9 @@ def create_channel():
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
-    # Load existing channels or initialize an empty list
-    channels_data = []
-    if os.path.exists(CHANNELS_JSON_PATH):
-        with open(CHANNELS_JSON_PATH, 'r') as f:
-            channels_data = json.load(f)
-
-    # Determine the next ID for the new channel
-    new_id = max([channel['id'] for channel in channels_data], default=0) + 1
-
     # Create new channel entry
     new_channel = {
-        'id': new_id,
+        'id': None,
         'name': name,
         'status': status,
         'model': model,
@@ -449,127 +943,143 @@ def create_channel():
         'audio_gain': audio_gain
     }
 
-    channels_data.append(new_channel)
+    def apply(channels):
+        new_channel['id'] = next_channel_id(channels)
+        channels.append(new_channel)
+        return new_channel['id']
 
-    # Save the updated data back to the file
-    with open(CHANNELS_JSON_PATH, 'w') as f:
-        json.dump(channels_data, f, indent=4)
+    new_id = get_channel_registry().update(apply)
+    notify_change('channel', new_id)
 
     return jsonify({'message': 'Channel created successfully', 'channel_id': new_id}), 201
+def load_peaks(recording_ids):
+    """Return stored peaks for the ids, computing (and storing) any that are missing."""
+    peaks = database.get_peaks(recording_ids)
+    for recording_id in recording_ids:
+        if recording_id in peaks:
+            continue
+        # Clips ingested before peaks existed are analyzed on first request
+        recording = database.get_recording(recording_id)
+        path = find_audio_variant(recording['filename']) if recording and recording['filename'] else None
+        analysis = analyze_clip(path) if path else None
+        if analysis:
+            database.save_peaks(recording_id, analysis)
+            peaks[recording_id] = dict(analysis, recording_id=recording_id)
+    return peaks
+
+
+def peaks_json(entry):
+    return {
+        'recording_id': entry['recording_id'],
+        'sample_rate': entry['sample_rate'],
+        'samples_per_peak': entry['samples_per_peak'],
+        'length': len(entry['peaks']) // 2,
+        # Interleaved min, max pairs scaled to [-127, 127]
+        'peaks': list(memoryview(entry['peaks']).cast('b'))
+    }
+
+
+@audio_bp.route('/api/recordings/<int:recording_id>/peaks')
+def get_recording_peaks(recording_id):
+    """
+    Return a recording's precomputed waveform peaks.
+
+    Query parameters:
+        format: 'json' (default) or 'binary' for the raw int8 min/max pairs,
+            with sample rate and samples per peak in X-Sample-Rate and
+            X-Samples-Per-Peak headers
+    """
+    try:
+        entry = load_peaks([recording_id]).get(recording_id)
+    except sqlite3.Error as e:
+        error_logger.error(f"Error retrieving peaks for recording {recording_id}: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    if entry is None:
+        return jsonify({'error': 'Peaks not available'}), 404
+
+    if request.args.get('format') == 'binary':
+        response = Response(entry['peaks'], mimetype='application/octet-stream')
+        response.headers['X-Sample-Rate'] = str(entry['sample_rate'])
+        response.headers['X-Samples-Per-Peak'] = str(entry['samples_per_peak'])
+    else:
+        response = jsonify(peaks_json(entry))
+    # Peaks never change once computed
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('AUDIO_CACHE_MAX_AGE', 31536000)}"
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+@audio_bp.route('/api/peaks')
+def get_peaks_batch():
+    """
+    Return waveform peaks for several recordings in one request.
+
+    Query parameters:
+        ids: Comma-separated recording ids (at most RECORDINGS_PAGE_SIZE)
+    """
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    ids = ids[:current_app.config.get('RECORDINGS_PAGE_SIZE', 500)]
+    try:
+        peaks = load_peaks(ids)
+    except sqlite3.Error as e:
+        error_logger.error(f"Error retrieving peaks: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+    return jsonify({str(rid): peaks_json(entry) for rid, entry in peaks.items()})
+
+
 @audio_bp.route('/api/recordings/<path:filename>')
 def serve_audio(filename):
-    # Construct the full file path
-    file_path = os.path.join(RECORDINGS_DIR, filename)
-    
-    # Check if the file exists
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return send_from_directory(RECORDINGS_DIR, filename)
-    
-    # If the file doesn't exist, return a 404 error
+    """
+    Serve a recording's audio with conditional and Range request support.
+
+    Clips never change once written, so responses carry a strong ETag
+    (inode, size and mtime) and a long-lived immutable Cache-Control;
+    replays come from the browser cache and seeking fetches only the
+    requested byte range.
+    """
+    # Construct the full file path, rejecting anything outside RECORDINGS_DIR
+    file_path = safe_join(RECORDINGS_DIR, filename)
+
+    max_age = current_app.config.get('AUDIO_CACHE_MAX_AGE', 31536000)
+    # The archiver may replace the file, or retention delete it, between the
+    # lookup and the open; look once more before answering 404
+    for _ in range(2):
+        # A .wav request may be served by its archived .opus/.flac variant
+        found = find_audio_variant(file_path) if file_path else None
+        if not found:
+            break
+        try:
+            st = os.stat(found)
+            # send_file answers If-None-Match/If-Modified-Since with 304 and Range
+            # with 206; the file body goes through the server's wsgi.file_wrapper
+            # (or X-Sendfile when USE_X_SENDFILE is set behind a proxy)
+            response = send_file(
+                found,
+                mimetype=audio_mimetype(found),
+                conditional=True,
+                etag=f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}",
+                last_modified=st.st_mtime,
+                max_age=max_age
+            )
+        except FileNotFoundError:
+            continue
+        response.headers['Cache-Control'] = f"public, max-age={max_age}, immutable"
+        return response
     return abort(404, description="Audio file not found")
 
 
 # settings 
 
 def init_settings():
-    """Initialize settings file if it doesn't exist"""
+    """Return a copy of the settings, storing defaults for any missing keys."""
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(SETTINGS_JSON_PATH), exist_ok=True)
-        
-        # Default settings structure
-        default_settings = {
-            "global_model": "medium.en",
-            "global_target_language": "english",
-            "global_hallucination": "False",
-            "global_timezone": "UTC",
-            "keywords": []
-        }
-        
-        # Create or validate settings file
-        if not os.path.exists(SETTINGS_JSON_PATH):
-            with open(SETTINGS_JSON_PATH, 'w') as f:
-                json.dump(default_settings, f, indent=4)
-            return default_settings
-        
-        # Read and validate existing settings
-        try:
-            with open(SETTINGS_JSON_PATH, 'r') as f:
-                settings = json.load(f)
-            
-            # Ensure all required keys exist
-            missing_keys = False
-            for key in default_settings:
-                if key not in settings:
-                    settings[key] = default_settings[key]
-                    missing_keys = True
-            
-            # If any keys were missing, update the file
-            if missing_keys:
-                with open(SETTINGS_JSON_PATH, 'w') as f:
-                    json.dump(settings, f, indent=4)
-            
-            return settings
-            
-        except json.JSONDecodeError:
-            # If file is corrupted, recreate it
-            with open(SETTINGS_JSON_PATH, 'w') as f:
-                json.dump(default_settings, f, indent=4)
-            return default_settings
-            
+        return get_settings_service().ensure_defaults()
     except Exception as e:
         logging.error(f"Error initializing settings: {str(e)}")
         raise
-def init_users():
-    """Initialize settings file if it doesn't exist"""
-    try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(USERS_JSON_PATH), exist_ok=True)
-        
-        # Default settings structure
-        default_users = {
-            "admin1": {
-               "password": "admin@123"
-                   },
-            "admin2": {
-                "password": "admin@123"
-            }
-        }
-        
-        # Create or validate settings file
-        if not os.path.exists(USERS_JSON_PATH):
-            with open(USERS_JSON_PATH, 'w') as f:
-                json.dump(default_users, f, indent=4)
-            return default_users
-        
-        # Read and validate existing settings
-        try:
-            with open(USERS_JSON_PATH, 'r') as f:
-                settings = json.load(f)
-            
-            # Ensure all required keys exist
-            missing_keys = False
-            for key in default_users:
-                if key not in settings:
-                    settings[key] = default_users[key]
-                    missing_keys = True
-            
-            # If any keys were missing, update the file
-            if missing_keys:
-                with open(USERS_JSON_PATH, 'w') as f:
-                    json.dump(settings, f, indent=4)
-            
-            return settings
-            
-        except json.JSONDecodeError:
-            # If file is corrupted, recreate it
-            with open(USERS_JSON_PATH, 'w') as f:
-                json.dump(default_users, f, indent=4)
-            return default_users
-            
-    except Exception as e:
-        logging.error(f"Error initializing users: {str(e)}")
-        raise
 
 @settings_bp.route('/api/settings/keywords', methods=['POST'])
 def add_keyword():
@@ -603,9 +1113,9 @@ def add_keyword():
             if keyword not in settings['keywords']:
                 settings['keywords'].append(keyword)
                 
-                # Write updated settings
-                with open(SETTINGS_JSON_PATH, 'w') as f:
-                    json.dump(settings, f, indent=4)
+                # Write updated settings; the keyword matcher follows the change
+                get_settings_service().update({'keywords': settings['keywords']})
+                notify_change('settings')
             
             return jsonify({
                 'message': 'Keyword added successfully',
@@ -636,8 +1146,8 @@ def remove_keyword(keyword):
             settings['keywords'].remove(keyword)
             
             # Save updated settings
-            with open(SETTINGS_JSON_PATH, 'w') as f:
-                json.dump(settings, f, indent=4)
+            get_settings_service().update({'keywords': settings['keywords']})
+            notify_change('settings')
             
         return jsonify({
             'message': 'Keyword removed successfully',
@@ -649,49 +1159,19 @@ def remove_keyword(keyword):
         return jsonify({'error': str(e)}), 500
     
 @settings_bp.route('/api/settings', methods=['GET'])
+@cached_config_response('settings')
 def get_settings():
             """Fetch all settings"""
-            init_settings()
             try:
-                with open(SETTINGS_JSON_PATH, 'r') as f:
-                    settings = json.load(f)
-                return jsonify(settings)
+                return jsonify(init_settings())
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
-def init_users():
-    """Initialize users.json if it doesn't exist"""
-    try:
-        with open(USERS_JSON_PATH, 'r') as f:
-            json.load(f)
-    except FileNotFoundError:
-        with open(USERS_JSON_PATH, 'w') as f:
-            # Create with default admin user
-            default_users = {
-                "admin@example.com": {
-                    "name": "Admin User",
-                    "password": "admin123",
-                    "role": "admin",
-                    "status": "Active",
-                    # "lastActive": "Just now",
-                    "accessLevel": "Level 3"
-                }
-            }
-            json.dump(default_users, f, indent=4)
-
-def init_users():
-    """Initialize users.json if it doesn't exist"""
-    if not os.path.exists(USERS_JSON_PATH):
-        with open(USERS_JSON_PATH, 'w') as f:
-            json.dump({}, f)
-
 @settings_bp.route('/api/users', methods=['GET'])
+@cached_config_response('users')
 def get_users():
     """Fetch all users"""
-    init_users()
     try:
-        with open(USERS_JSON_PATH, 'r') as f:
-            users = json.load(f)
-        return jsonify(users)
+        return jsonify(database.get_config_records('users'))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -710,11 +1190,8 @@ def create_user():
         if data['role'] not in ['admin', 'member']:
             return jsonify({'error': 'Invalid role'}), 400
             
-        with open(USERS_JSON_PATH, 'r') as f:
-            users = json.load(f)
-            
         # Check if email already exists
-        if data['email'] in users:
+        if database.get_config_record('users', data['email']) is not None:
             return jsonify({'error': 'Email already exists'}), 409
         
         # Create new user object
@@ -727,10 +1204,7 @@ def create_user():
             'accessLevel': 'Level 3' if data['role'] == 'admin' else 'Level 1'
         }
         
-        # Save to JSON file
-        users[data['email']] = new_user
-        with open(USERS_JSON_PATH, 'w') as f:
-            json.dump(users, f, indent=4)
+        database.save_config_record('users', new_user, key=data['email'])
             
         return jsonify({'message': 'User created successfully', 'user': {**new_user, 'email': data['email']}}), 201
         
@@ -743,29 +1217,26 @@ def update_user(email):
     try:
         data = request.get_json()
         
-        with open(USERS_JSON_PATH, 'r') as f:
-            users = json.load(f)
-            
-        if email not in users:
+        user = database.get_config_record('users', email)
+        if user is None:
             return jsonify({'error': 'User not found'}), 404
             
         # Update allowed fields
         if 'name' in data:
-            users[email]['name'] = data['name']
+            user['name'] = data['name']
         if 'role' in data:
             if data['role'] not in ['admin', 'member']:
                 return jsonify({'error': 'Invalid role'}), 400
-            users[email]['role'] = data['role']
-            users[email]['accessLevel'] = "Level 3" if data['role'] == 'admin' else "Level 1"
+            user['role'] = data['role']
+            user['accessLevel'] = "Level 3" if data['role'] == 'admin' else "Level 1"
         if 'password' in data and data['password']:
-            users[email]['password'] = data['password']
+            user['password'] = data['password']
             
-        with open(USERS_JSON_PATH, 'w') as f:
-            json.dump(users, f, indent=4)
+        database.save_config_record('users', user, key=email)
             
         return jsonify({
             'message': 'User updated successfully',
-            'user': {**users[email], 'email': email}
+            'user': {**user, 'email': email}
         })
         
     except Exception as e:
@@ -775,21 +1246,13 @@ def update_user(email):
 def delete_user(email):
     """Delete a user"""
     try:
-        with open(USERS_JSON_PATH, 'r') as f:
-            users = json.load(f)
-            
-        if email not in users:
-            return jsonify({'error': 'User not found'}), 404
-            
         # Prevent deleting the last admin
         # remaining_admins = sum(1 for u in users.values() if u['role'] == 'admin')
         # if users[email]['role'] == 'admin' and remaining_admins <= 1:
         #     return jsonify({'error': 'Cannot delete the last admin user'}), 400
             
-        del users[email]
-        
-        with open(USERS_JSON_PATH, 'w') as f:
-            json.dump(users, f, indent=4)
+        if not database.delete_config_record('users', email):
+            return jsonify({'error': 'User not found'}), 404
             
         return jsonify({'message': 'User deleted successfully'})
         
@@ -798,7 +1261,6 @@ def delete_user(email):
 @settings_bp.route('/api/settings', methods=['PUT'])
 def update_settings():
     """Update settings"""
-    init_settings()
     try:
         data = request.get_json()
         
@@ -806,9 +1268,6 @@ def update_settings():
         if not isinstance(data, dict):
             return jsonify({'error': 'Invalid data format'}), 400
 
-        with open(SETTINGS_JSON_PATH, 'r') as f:
-            current_settings = json.load(f)
-        
         # Update fields if provided
         updateable_fields = [
             'global_model',
@@ -820,12 +1279,11 @@ def update_settings():
             'global_transcribe_node'
         ]
         
-        for field in updateable_fields:
-            if field in data:
-                current_settings[field] = data[field]
-        
-        with open(SETTINGS_JSON_PATH, 'w') as f:
-            json.dump(current_settings, f, indent=4)
+        # Subscribers (transcription toggles, model) apply the change live
+        get_settings_service().update({
+            field: data[field] for field in updateable_fields if field in data
+        })
+        notify_change('settings')
         
         return jsonify({'message': 'Settings updated successfully'})
     except Exception as e:
@@ -927,18 +1385,17 @@ def get_gmt_time():
 
 @settings_bp.route('/api/truncate_recordings', methods=['POST'])
 def truncate_recordings():
-    """API route to truncate the recordings table."""
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        try:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM recordings')  # Deletes all rows from the table
-            conn.commit()
-            return jsonify({"message": "Recordings table truncated successfully."}), 200
-        except sqlite3.Error as e:
-            return jsonify({"error": f"Failed to truncate recordings table: {str(e)}"}), 500
-        finally:
-            conn.close()
+    """API route to truncate the recordings table and remove its audio files."""
+    try:
+        filenames = database.truncate_recordings()
+        removed, reclaimed = remove_audio_files(filenames)
+        return jsonify({
+            "message": "Recordings table truncated successfully.",
+            "files_removed": removed,
+            "bytes_reclaimed": reclaimed
+        }), 200
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Failed to truncate recordings table: {str(e)}"}), 500
  
  
 @settings_bp.route('/api/event', methods=['POST'])
@@ -956,185 +1413,158 @@ def handle_event():
         # Parse JSON body (optional)
         data = request.get_json(silent=True)
 
-        # Use lock for thread-safe access
-        with channels_json_lock:
-            # Load the latest CHANNELS data from the file
-            with open(CHANNELS_JSON_PATH, 'r') as f:
-                CHANNELS = json.load(f)
-
-            # Check if channel with given MAC exists
-            existing_channel = next((channel for channel in CHANNELS if channel['mac'] == mac), None)
-
-            # Default channel attributes
-            default_channel = {
-                "id": None,
-                "mac": mac,
-                "name": None,
-                "status": "enabled",
-                "model": "small.en",
-                "src_language": "english",
-                "sensitivity": "10",
-                "silence": "1000",
-                "min_rec": "1000",
-                "max_rec": "10000",
-                "audio_gain": "0",
-                "color": "#000000",
-                "background_color": "#ffffff",
-                "team_color": "#b54f4f",
-                "target_language": "english",
-                "driver": "driver name",
-                "person": "person name",
-                "tag": "tag",
-                "car": "car name",
-                "state": "resume"
-            }
+        registry = get_channel_registry()
+        presence = get_device_presence()
 
-            # If no JSON body is provided (ping request)
-            if data is None:
-                if existing_channel:
-                    event_logger.info(f"Ping received for MAC: {mac}. Returning latest channel data.")
-                    return jsonify({
-                        "message": "Channel exists",
-                        "channel": {
-                            "audio_gain": existing_channel.get("audio_gain"),
-                            "max_rec": existing_channel.get("max_rec"),
-                            "min_rec": existing_channel.get("min_rec"),
-                            "silence": existing_channel.get("silence"),
-                            "sensitivity": existing_channel.get("sensitivity"),
-                            "state": "stop" if existing_channel.get("status") == "disabled" else existing_channel.get("state", "resume"),
-                        }
-                    }), 200
-                else:
-                    # Create a new channel if none exists
-                    new_channel_id = max([channel.get('id', 0) for channel in CHANNELS], default=0) + 1
-                    default_channel["id"] = new_channel_id
-                    default_channel["name"] = f"channel{new_channel_id}"
-                    CHANNELS.append(default_channel)
-
-                    # Save new channel to file
-                    with open(CHANNELS_JSON_PATH, 'w') as f:
-                        json.dump(CHANNELS, f, indent=4)
-
-                    event_logger.info(f"Ping received for MAC: {mac}. No channel found, created new channel: {default_channel}")
-                    return jsonify({
-                        "message": "New channel created due to ping request",
-                        "channel": {
-                            "audio_gain": default_channel.get("audio_gain"),
-                            "max_rec": default_channel.get("max_rec"),
-                            "min_rec": default_channel.get("min_rec"),
-                            "silence": default_channel.get("silence"),
-                            "sensitivity": default_channel.get("sensitivity"),
-                            "state": default_channel.get("state", "resume"),
-                        }
-                    }), 201
-
-            # If JSON body is provided and channel exists, update only if changes are needed
-            if existing_channel:
-                # Check for changes
-                changes_needed = False
-                updated_fields = {}
-                for key, value in data.items():
-                    if key in existing_channel and existing_channel[key] != value:
-                        changes_needed = True
-                        updated_fields[key] = value
-
-                if changes_needed:
-                    # Update existing channel with provided data
-                    index = CHANNELS.index(existing_channel)
-                    existing_channel.update(updated_fields)
-                    CHANNELS[index] = existing_channel
-
-                    # Save updates to the file
-                    with open(CHANNELS_JSON_PATH, 'w') as f:
-                        json.dump(CHANNELS, f, indent=4)
-
-                    event_logger.info(f"Updated channel for MAC: {mac}. Changes: {updated_fields}")
-                else:
-                    event_logger.info(f"No changes needed for MAC: {mac}. Current data matches: {data}")
-
-                return jsonify({
-                    "message": "Channel processed successfully" if changes_needed else "No update needed",
-                    "channel": {
-                        "audio_gain": existing_channel.get("audio_gain"),
-                        "max_rec": existing_channel.get("max_rec"),
-                        "min_rec": existing_channel.get("min_rec"),
-                        "silence": existing_channel.get("silence"),
-                        "sensitivity": existing_channel.get("sensitivity"),
-                        "state": "stop" if existing_channel.get("status") == "disabled" else existing_channel.get("state", "resume"),
-                    }
-                }), 200
-
-            # If MAC is new and JSON body is provided, create a new channel
-            new_channel_id = max([channel.get('id', 0) for channel in CHANNELS], default=0) + 1
-            default_channel["id"] = new_channel_id
-            default_channel["name"] = f"channel{new_channel_id}"
-            default_channel.update(data)
-            CHANNELS.append(default_channel)
-
-            # Save new channel to file
-            with open(CHANNELS_JSON_PATH, 'w') as f:
-                json.dump(CHANNELS, f, indent=4)
-
-            event_logger.info(f"New channel added for MAC: {mac}. Details: {default_channel}")
+        # Ping for a known device: answer from the in-memory snapshots without locking
+        existing_channel = registry.get_by_mac(mac)
+        if data is None and existing_channel:
+            presence.record(mac, existing_channel.get('id'))
+            event_logger.info(f"Ping received for MAC: {mac}. Returning latest channel data.")
             return jsonify({
-                "message": "New channel added successfully",
-                "channel": {
-                    "audio_gain": default_channel.get("audio_gain"),
-                    "max_rec": default_channel.get("max_rec"),
-                    "min_rec": default_channel.get("min_rec"),
-                    "silence": default_channel.get("silence"),
-                    "sensitivity": default_channel.get("sensitivity"),
-                    "state": default_channel.get("state", "resume"),
-                }
-            }), 201
+                "message": "Channel exists",
+                "channel": device_channel_settings(existing_channel)
+            }), 200
+
+        # Default channel attributes
+        default_channel = {
+            "id": None,
+            "mac": mac,
+            "name": None,
+            "status": "enabled",
+            "model": "small.en",
+            "src_language": "english",
+            "sensitivity": "10",
+            "silence": "1000",
+            "min_rec": "1000",
+            "max_rec": "10000",
+            "audio_gain": "0",
+            "color": "#000000",
+            "background_color": "#ffffff",
+            "team_color": "#b54f4f",
+            "target_language": "english",
+            "driver": "driver name",
+            "person": "person name",
+            "tag": "tag",
+            "car": "car name",
+            "state": "resume"
+        }
+
+        def apply(channels):
+            """Create or update the device's channel; returns (channel, created, updated_fields)."""
+            channel = next((c for c in channels if c.get('mac') == mac), None)
+            if channel is None:
+                channel = dict(default_channel)
+                channel["id"] = next_channel_id(channels)
+                channel["name"] = f"channel{channel['id']}"
+                channel.update(data or {})
+                channels.append(channel)
+                return channel, True, {}
+
+            # Update only if changes are needed
+            updated_fields = {key: value for key, value in (data or {}).items()
+                              if key in channel and channel[key] != value}
+            channel.update(updated_fields)
+            return channel, False, updated_fields
+
+        channel, created, updated_fields = registry.update(apply)
+        presence.record(mac, channel.get('id'), data if isinstance(data, dict) else None)
+        if created or updated_fields:
+            notify_change('channel', channel.get('id'))
+
+        if created and data is None:
+            event_logger.info(f"Ping received for MAC: {mac}. No channel found, created new channel: {channel}")
+            message = "New channel created due to ping request"
+        elif created:
+            event_logger.info(f"New channel added for MAC: {mac}. Details: {channel}")
+            message = "New channel added successfully"
+        elif updated_fields:
+            event_logger.info(f"Updated channel for MAC: {mac}. Changes: {updated_fields}")
+            message = "Channel processed successfully"
+        else:
+            event_logger.info(f"No changes needed for MAC: {mac}. Current data matches: {data}")
+            message = "No update needed"
+
+        return jsonify({
+            "message": message,
+            "channel": device_channel_settings(channel)
+        }), 201 if created else 200
 
     except Exception as e:
         error_logger.error(f"Error in handle_event: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
     
     
-def ensure_json_file():
-    """Ensure the JSON file exists with proper structure."""
-    if not os.path.exists(FREQUENCIES_JSON_PATH):
-        with open(FREQUENCIES_JSON_PATH, 'w') as f:
-            json.dump([], f)
+@audio_bp.route('/api/devices', methods=['GET'])
+def get_devices():
+    """
+    Return the presence of every device: last seen time, ping rate, the
+    fields its firmware last reported and whether it is online. Channels
+    whose device has never pinged are listed as offline.
+    """
+    try:
+        presence = get_device_presence()
+        channels = get_channel_registry().all()
+        by_mac = {str(c.get('mac') or '').upper(): c for c in channels if c.get('mac')}
+        devices = presence.all()
+        for device in devices:
+            channel = by_mac.pop(device['mac'], None)
+            if channel:
+                device['channel_id'] = channel.get('id')
+            device['channel_name'] = channel.get('name') if channel else None
+        for mac, channel in by_mac.items():
+            devices.append({
+                'mac': mac,
+                'channel_id': channel.get('id'),
+                'channel_name': channel.get('name'),
+                'first_seen': None,
+                'last_seen': None,
+                'pings': 0,
+                'interval_ms': None,
+                'reported': {},
+                'reported_at': None,
+                'online': False,
+                'ping_rate_per_min': None
+            })
+
+        online = sum(1 for device in devices if device['online'])
+        return jsonify({
+            'devices': devices,
+            'online': online,
+            'offline': len(devices) - online,
+            'offline_after_seconds': presence.offline_after_ms // 1000
+        })
+    except Exception as e:
+        error_logger.error(f"Error retrieving devices: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+FREQUENCY_FIELDS = ['name', 'frequency', 'type', 'tone', 'tag', 'person', 'status']
 
 @audio_bp.route('/api/frequencies', methods=['GET'])
+@cached_config_response('frequencies')
 def get_frequencies():
     """Get all frequency entries."""
-    ensure_json_file()
-    with open(FREQUENCIES_JSON_PATH, 'r') as f:
-        frequencies_data = json.load(f)
-    return jsonify(frequencies_data)
+    return jsonify(list(database.get_config_records('frequencies').values()))
 
 @audio_bp.route('/api/frequencies', methods=['POST'])
 def add_frequency():
     """Add a new frequency entry."""
     try:
         new_freq = request.json
-        required_fields = ['name', 'frequency', 'type', 'tone', 'tag', 'person', 'status']
         
         # Validate required fields
-        for field in required_fields:
+        for field in FREQUENCY_FIELDS:
             if field not in new_freq:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
-        ensure_json_file()
-        with open(FREQUENCIES_JSON_PATH, 'r') as f:
-            frequencies_data = json.load(f)
-
-        # Generate new ID
-        new_id = max([freq.get('id', 0) for freq in frequencies_data], default=0) + 1
-        new_freq['id'] = new_id
-        
         # Ensure proper data types and defaults
+        new_freq.pop('id', None)
         new_freq['frequency'] = float(new_freq['frequency'])
         new_freq['status'] = new_freq.get('status', 'active')
         
-        frequencies_data.append(new_freq)
-
-        with open(FREQUENCIES_JSON_PATH, 'w') as f:
-            json.dump(frequencies_data, f, indent=4)
+        # The database assigns the next id
+        new_freq['id'] = database.save_config_record('frequencies', new_freq)
 
         return jsonify(new_freq), 201
     except Exception as e:
@@ -1145,28 +1575,24 @@ def update_frequency(freq_id):
     """Update an existing frequency by ID."""
     try:
         update_data = request.json
-        ensure_json_file()
         
-        with open(FREQUENCIES_JSON_PATH, 'r') as f:
-            frequencies_data = json.load(f)
-
-        for freq in frequencies_data:
-            if freq.get('id') == freq_id:
-                # Update only provided fields
-                for key, value in update_data.items():
-                    if key in ['name', 'frequency', 'type', 'tone', 'tag', 'person', 'status']:
-                        freq[key] = value
-                
-                # Ensure frequency is stored as float
-                if 'frequency' in update_data:
-                    freq['frequency'] = float(freq['frequency'])
+        with database.transaction():
+            freq = database.get_config_record('frequencies', freq_id)
+            if freq is None:
+                return jsonify({'error': 'Frequency not found'}), 404
+
+            # Update only provided fields
+            for key, value in update_data.items():
+                if key in FREQUENCY_FIELDS:
+                    freq[key] = value
+            
+            # Ensure frequency is stored as float
+            if 'frequency' in update_data:
+                freq['frequency'] = float(freq['frequency'])
 
-                with open(FREQUENCIES_JSON_PATH, 'w') as f:
-                    json.dump(frequencies_data, f, indent=4)
+            database.save_config_record('frequencies', freq)
                     
-                return jsonify(freq)
-
-        return jsonify({'error': 'Frequency not found'}), 404
+        return jsonify(freq)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -1174,20 +1600,9 @@ def update_frequency(freq_id):
 def delete_frequency(freq_id):
     """Delete a frequency entry by ID."""
     try:
-        ensure_json_file()
-        
-        with open(FREQUENCIES_JSON_PATH, 'r') as f:
-            frequencies_data = json.load(f)
-
-        original_length = len(frequencies_data)
-        frequencies_data = [freq for freq in frequencies_data if freq.get('id') != freq_id]
-
-        if len(frequencies_data) == original_length:
+        if not database.delete_config_record('frequencies', freq_id):
             return jsonify({'error': 'Frequency not found'}), 404
 
-        with open(FREQUENCIES_JSON_PATH, 'w') as f:
-            json.dump(frequencies_data, f, indent=4)
-
         return jsonify({'message': 'Frequency deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -1199,12 +1614,11 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @branding_bp.route('/api/branding', methods=['GET'])
+@cached_config_response('branding')
 def get_branding():
     """Fetch and return branding settings."""
-    if os.path.exists(BRANDING_JSON_PATH):
-        with open(BRANDING_JSON_PATH, 'r') as f:
-            branding_data = json.load(f)
-        
+    branding_data = database.get_config_values('branding')
+    if branding_data:
         # Set default values if missing
         branding_data.setdefault('organization_name', '')
         branding_data.setdefault('tagline', '')
@@ -1302,7 +1716,7 @@ def get_branding():
 
 @branding_bp.route('/api/branding', methods=['PUT'])
 def update_branding():
-    """Update branding settings in the JSON file."""
+    """Replace the branding settings."""
     if not request.is_json:
         return jsonify({'error': 'Invalid request format. JSON expected'}), 400
     
@@ -1324,8 +1738,7 @@ def update_branding():
         }
     }
     
-    with open(BRANDING_JSON_PATH, 'w') as f:
-        json.dump(updated_branding, f, indent=4)
+    database.set_config_values('branding', updated_branding, replace=True)
     
     return jsonify({'message': 'Branding settings updated successfully'}), 200
 
@@ -1335,29 +1748,13 @@ def delete_recording(recording_id):
 
     """Delete a specific recording by ID."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        # Get filename before deleting to remove associated audio file
-        cursor.execute("SELECT filename FROM recordings WHERE id = ?", (recording_id,))
-        result = cursor.fetchone()
-        if not result:
-            return jsonify({"error": "Recording not found"}), 404
-
-        filename = result[0]
-
         # Delete the recording from the database
-        cursor.execute("DELETE FROM recordings WHERE id = ?", (recording_id,))
-        conn.commit()
+        recording = database.delete_recording(recording_id)
+        if not recording:
+            return jsonify({"error": "Recording not found"}), 404
 
-        # Optionally, delete the audio file
-        # file_path = os.path.join("path/to/recordings", filename)  # Adjust as needed
-        # if os.path.exists(file_path):
-        #     os.remove(file_path)
+        remove_audio_files([recording['filename']])
 
         return jsonify({"message": "Recording deleted successfully"}), 200
     except sqlite3.Error as e:
         return jsonify({"error": f"Database error: {str(e)}"}), 500
-    finally:
-        conn.close()
- 
\ No newline at end of file
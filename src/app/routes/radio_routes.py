@@ -6,9 +6,8 @@ import time
 from flask import Blueprint, jsonify, request
 from serial import Serial, SerialException
 import serial.tools.list_ports
-
-# Path to inventory JSON
-RADIO_JSON_PATH = os.path.join('db', 'scanner_inventory.json')
+from app.services import database
+from app.utils.config_cache import cached_config_response
 
 MIN_SAFE_WAIT_TIME = 0.1
 
@@ -357,34 +356,14 @@ def set_backlight(port, backlight):
 
 # Load current inventory of connected scanners
 def load_inventory():
-    """
-    Load existing scanner inventory from JSON file.
-    Creates an empty inventory file if it doesn't exist.
-    """
-    if os.path.exists(RADIO_JSON_PATH):
-        try:
-            with open(RADIO_JSON_PATH, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logging.error(f"Error decoding {RADIO_JSON_PATH}, creating new inventory")
-            # Create a new empty inventory if file is corrupted
-            save_inventory({})
-            return {}
-    else:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(RADIO_JSON_PATH), exist_ok=True)
-        # Create a new empty inventory file
-        logging.info(f"Creating new inventory file at {RADIO_JSON_PATH}")
-        save_inventory({})
-        return {}
+    """Load the scanner inventory as {scanner name: scanner data}."""
+    return database.get_config_records('scanners')
 
-# Save inventory to json file on disk
+# Save inventory to the database
 def save_inventory(inventory):
-    """Save scanner inventory to JSON file."""
-    os.makedirs(os.path.dirname(RADIO_JSON_PATH), exist_ok=True)
-    with open(RADIO_JSON_PATH, 'w') as f:
-        json.dump(inventory, f, indent=4)
-    logging.info(f"Saved scanner inventory to {RADIO_JSON_PATH}")
+    """Save the scanner inventory; only scanners that changed are written."""
+    database.replace_config_records('scanners', inventory)
+    logging.info("Saved scanner inventory")
 
 # Verify that the scanner connected on port is correct one
 def verify_scanner(port, expected_name):
@@ -455,16 +434,13 @@ def find_scanner_port_by_id(scanner_id, inventory):
 def init_scanners():
     """
     Check all COM ports and update the connection status of scanners in inventory.
-    Creates scanner_inventory.json if it doesn't exist and populates it with connected scanners.
+    Populates the scanner inventory with connected scanners.
     Maintains scanner identities across port changes without reprogramming IDs.
     
     Returns:
         dict: Summary of connected and disconnected scanners
     """
-    # Ensure the db directory exists
-    os.makedirs(os.path.dirname(RADIO_JSON_PATH), exist_ok=True)
-    
-    # Load existing inventory or create empty one if file doesn't exist
+    # Load existing inventory
     inventory = load_inventory()
     
     # Get all available COM ports in the system
@@ -647,9 +623,8 @@ def clear_scanners():
                 if not success:
                     logging.error(f"Failed to clear scanner on {port}")
 
-        # Clear the inventory file
-        with open(RADIO_JSON_PATH, 'w') as f:
-            json.dump({}, f)
+        # Clear the inventory
+        save_inventory({})
         logging.info("Scanner inventory cleared")
 
         return jsonify({"message": "Scanners and inventory cleared successfully"}), 200
@@ -658,6 +633,7 @@ def clear_scanners():
         return jsonify({"error": str(e)}), 500
 
 @radio_bp.route('/api/radio/list', methods=['GET'])
+@cached_config_response('scanners')
 def list_scanners():
     """Return a JSON list of all scanners in the inventory."""
     try:
@@ -0,0 +1,100 @@
+# app/routes/stream_routes.py
+import json
+import time
+from urllib.parse import urlsplit, urlencode
+from flask import Blueprint, Response, request, current_app, redirect
+from app.services.event_bus import get_event_bus
+
+try:
+    # Cooperative wait when served by gevent; set() may come from any publishing thread
+    from gevent.event import Event as StreamWakeup
+except ImportError:
+    from threading import Event as StreamWakeup
+
+stream_bp = Blueprint('stream', __name__)
+# Registered on the main (waitress) app to hand clients over to the stream server
+stream_redirect_bp = Blueprint('stream_redirect', __name__)
+
+
+def format_sse(event):
+    """Serialize an Event into a Server-Sent Events frame."""
+    return f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+@stream_bp.route('/api/stream')
+def stream_events():
+    """
+    Server-Sent Events feed of recording lifecycle, channel and settings events.
+
+    Clients resume with the Last-Event-ID header (sent automatically by
+    EventSource on reconnect) or a last_event_id query parameter. When the
+    requested id is older than the buffered history a 'resync' event is sent
+    and the client should fall back to /api/sync.
+    """
+    bus = get_event_bus()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_event_id) if last_event_id else bus.last_id
+    except ValueError:
+        last_id = bus.last_id
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)
+
+    def generate():
+        cursor = last_id
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 3000\n\n"
+
+        if cursor > bus.last_id:
+            # Server restarted since the client's last event
+            yield f"event: resync\ndata: {json.dumps({'reason': 'restart'})}\n\n"
+            cursor = 0
+
+        # Woken by every publish; idle streams sleep until an event or the heartbeat is due
+        wakeup = StreamWakeup()
+        notify = lambda event: wakeup.set()
+        bus.subscribe(notify)
+        try:
+            last_write = time.monotonic()
+            while True:
+                # Cleared before reading so a publish in between is not missed
+                wakeup.clear()
+                events, complete = bus.events_since(cursor)
+                if not complete:
+                    yield f"event: resync\ndata: {json.dumps({'reason': 'gap'})}\n\n"
+                if events:
+                    for event in events:
+                        yield format_sse(event)
+                    cursor = events[-1].id
+                    last_write = time.monotonic()
+                    continue
+                if not wakeup.wait(max(0.0, heartbeat - (time.monotonic() - last_write))):
+                    yield ": heartbeat\n\n"
+                    last_write = time.monotonic()
+        finally:
+            bus.unsubscribe(notify)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@stream_redirect_bp.route('/api/stream')
+def redirect_to_stream_server():
+    """
+    Send SSE clients to the dedicated stream server.
+
+    Long-lived streams would otherwise each pin one of waitress's worker
+    threads; the stream server multiplexes them on a single gevent thread.
+    """
+    host = urlsplit(request.host_url).hostname
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal
+    port = current_app.config.get('STREAM_PORT', 4001)
+
+    args = request.args.to_dict()
+    if 'Last-Event-ID' in request.headers and 'last_event_id' not in args:
+        args['last_event_id'] = request.headers['Last-Event-ID']
+    query = urlencode(args)
+    location = f"{request.scheme}://{host}:{port}/api/stream" + (f"?{query}" if query else "")
+    return redirect(location, code=307)
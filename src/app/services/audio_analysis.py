@@ -0,0 +1,128 @@
+# app/services/audio_analysis.py
+import wave
+import numpy as np
+from ..utils.logging_setup import error_logger
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None  # Falls back to the wave module (PCM WAV only)
+
+# Number of min/max pairs stored per clip; enough for a full-width waveform
+PEAKS_RESOLUTION = 800
+# Analysis frame length for the energy-based metrics
+FRAME_SECONDS = 0.02
+# Samples at or above this magnitude count as clipped
+CLIP_LEVEL = 0.999
+# Frames this far above the noise floor count as speech/signal
+SPEECH_MARGIN_DB = 6.0
+# dBFS reported for digital silence instead of -inf
+SILENCE_DBFS = -120.0
+
+
+def load_audio(path):
+    """
+    Read an audio file as mono float32 samples in [-1, 1].
+
+    Returns:
+        tuple: (samples, sample_rate)
+    """
+    if sf is not None:
+        data, rate = sf.read(path, dtype='float32', always_2d=True)
+        return data.mean(axis=1), rate
+
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM WAV is supported without soundfile")
+        channels = wav.getnchannels()
+        frames = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+        samples = frames.reshape(-1, channels).mean(axis=1) / 32768.0
+        return samples.astype(np.float32), wav.getframerate()
+
+
+def compute_peaks(samples, resolution=PEAKS_RESOLUTION):
+    """
+    Downsample a clip to min/max pairs for waveform drawing.
+
+    Args:
+        samples (ndarray): Mono samples in [-1, 1]
+        resolution (int): Maximum number of min/max pairs
+
+    Returns:
+        tuple: (samples_per_peak, peaks) where peaks is the bytes of an int8
+        array of interleaved min, max values scaled to [-127, 127]
+    """
+    count = len(samples)
+    if count == 0:
+        return 0, b''
+    per_peak = -(-count // resolution)  # ceiling division
+    # Pad with the last sample so the final block's min/max stay accurate
+    padded = np.pad(samples, (0, (-count) % per_peak), mode='edge')
+    blocks = padded.reshape(-1, per_peak)
+    peaks = np.empty((blocks.shape[0], 2), dtype=np.float32)
+    peaks[:, 0] = blocks.min(axis=1)
+    peaks[:, 1] = blocks.max(axis=1)
+    return per_peak, np.clip(np.round(peaks * 127), -127, 127).astype(np.int8).tobytes()
+
+
+def _dbfs(value):
+    return float(20 * np.log10(value)) if value > 0 else SILENCE_DBFS
+
+
+def compute_metrics(samples, rate):
+    """
+    Compute signal-level metrics for a clip in one vectorized pass.
+
+    The noise floor and signal level are the 10th and 90th percentiles of
+    the 20 ms frame energies; their difference is the SNR estimate, and the
+    share of frames more than SPEECH_MARGIN_DB above the floor is the speech
+    ratio.
+
+    Returns:
+        dict: duration_ms, rms_dbfs, peak_dbfs, clipping_ratio, snr_db and
+        speech_ratio
+    """
+    count = len(samples)
+    if count == 0 or not rate:
+        return {'duration_ms': 0, 'rms_dbfs': SILENCE_DBFS, 'peak_dbfs': SILENCE_DBFS,
+                'clipping_ratio': 0.0, 'snr_db': 0.0, 'speech_ratio': 0.0}
+
+    magnitude = np.abs(samples)
+    squared = np.square(samples, dtype=np.float64)
+
+    frame = max(1, int(rate * FRAME_SECONDS))
+    usable = (count // frame) * frame or count
+    frame_energy = squared[:usable].reshape(-1, min(frame, usable)).mean(axis=1)
+    frame_db = 10 * np.log10(np.maximum(frame_energy, 1e-12))
+    noise_db, signal_db = np.percentile(frame_db, [10, 90])
+
+    return {
+        'duration_ms': int(count * 1000 / rate),
+        'rms_dbfs': round(_dbfs(np.sqrt(squared.mean())), 2),
+        'peak_dbfs': round(_dbfs(magnitude.max()), 2),
+        'clipping_ratio': round(float(np.count_nonzero(magnitude >= CLIP_LEVEL)) / count, 6),
+        'snr_db': round(float(signal_db - noise_db), 2),
+        'speech_ratio': round(float(np.mean(frame_db > noise_db + SPEECH_MARGIN_DB)), 4),
+    }
+
+
+def analyze_clip(path):
+    """
+    Run the ingest-time analysis of one clip.
+
+    Returns:
+        dict or None: sample_rate, samples_per_peak, peaks and metrics (see
+        compute_metrics), or None if the file could not be decoded
+    """
+    try:
+        samples, rate = load_audio(path)
+        samples_per_peak, peaks = compute_peaks(samples)
+        return {
+            'sample_rate': rate,
+            'samples_per_peak': samples_per_peak,
+            'peaks': peaks,
+            'metrics': compute_metrics(samples, rate),
+        }
+    except Exception as e:
+        error_logger.error(f"Error analyzing audio {path}: {str(e)}")
+        return None
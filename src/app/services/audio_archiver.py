@@ -0,0 +1,191 @@
+# app/services/audio_archiver.py
+import os
+import threading
+import time
+from ..utils.logging_setup import error_logger, db_logger
+from ..utils.recording_ids import now_ms
+from . import database
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None  # Archiving is disabled without soundfile/libsndfile
+
+AUDIO_MIME_TYPES = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.flac': 'audio/flac',
+    '.opus': 'audio/ogg; codecs=opus',
+}
+# Archived variants, in the order they are looked for
+ARCHIVE_EXTENSIONS = ('.opus', '.flac')
+# Sample rates the Opus encoder accepts; anything else is archived as FLAC
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+BLOCK_FRAMES = 16384
+
+
+def audio_mimetype(path):
+    """Return the MIME type for an audio file based on its extension."""
+    return AUDIO_MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'application/octet-stream')
+
+
+def find_audio_variant(path):
+    """
+    Find the file actually holding a recording's audio.
+
+    Clients may still ask for a clip by its original .wav name after it has
+    been archived, so fall back to the archived extensions.
+
+    Returns:
+        str or None: Path of the existing file
+    """
+    if os.path.isfile(path):
+        return path
+    stem = os.path.splitext(path)[0]
+    for ext in ARCHIVE_EXTENSIONS:
+        if os.path.isfile(stem + ext):
+            return stem + ext
+    return None
+
+
+class AudioArchiver:
+    """
+    Transcode transcribed WAV clips to a compressed archive format.
+
+    Clips stay WAV for hot_window_hours after they were received (fast
+    replay and re-transcription), then are encoded to Opus (FLAC when the
+    sample rate is not one Opus supports) by a background worker. The new
+    file is fully written and renamed into place before the row's filename is
+    switched in a single compare-and-swap update; only then is the WAV
+    removed, so readers always find a complete file.
+    """
+
+    def __init__(self, audio_format='opus', hot_window_hours=24, interval=300, batch_size=50,
+                 compression_level=None, pause=0.1):
+        self.audio_format = audio_format
+        self.hot_window_ms = int(hot_window_hours * 3600 * 1000)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.compression_level = compression_level
+        self.pause = pause
+        self.running = False
+        self.thread = None
+        self._failed_ids = set()
+
+    def start(self):
+        """Start the background archive loop."""
+        if sf is None:
+            error_logger.error("soundfile is not installed, audio archiving is disabled")
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        db_logger.info(f"Audio archiver started ({self.audio_format})")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                error_logger.error(f"Error in audio archiver: {str(e)}")
+            time.sleep(self.interval)
+
+    def run_once(self):
+        """
+        Archive every eligible clip.
+
+        Returns:
+            dict: Clips archived and bytes saved
+        """
+        stats = {'archived': 0, 'bytes_saved': 0}
+        cutoff = now_ms() - self.hot_window_ms
+        after_id = 0
+        while self.running or self.thread is None:
+            rows = database.get_wav_recordings(cutoff, after_id, self.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                after_id = row['id']
+                if row['id'] in self._failed_ids:
+                    continue
+                saved = self.archive_recording(row)
+                if saved is None:
+                    self._failed_ids.add(row['id'])
+                else:
+                    stats['archived'] += 1
+                    stats['bytes_saved'] += saved
+                time.sleep(self.pause)
+
+        if stats['archived']:
+            db_logger.info(
+                f"Archived {stats['archived']} clips, saved {stats['bytes_saved'] / (1024 * 1024):.1f} MB"
+            )
+        return stats
+
+    def archive_recording(self, row):
+        """
+        Transcode one recording and switch its row to the new file.
+
+        Returns:
+            int or None: Bytes saved, None if the clip could not be archived
+        """
+        source = row['filename']
+        if not source or not os.path.isfile(source):
+            return None
+        try:
+            target, size = self._transcode(source)
+        except Exception as e:
+            error_logger.error(f"Failed to archive {source}: {str(e)}")
+            return None
+
+        original_size = os.path.getsize(source)
+        if not database.set_recording_file(row['id'], source, target, size):
+            # Row was changed or deleted meanwhile; keep the WAV
+            os.remove(target)
+            return None
+        try:
+            os.remove(source)
+        except OSError as e:
+            error_logger.error(f"Failed to remove archived WAV {source}: {str(e)}")
+        return original_size - size
+
+    def _transcode(self, source):
+        info = sf.info(source)
+        if self.audio_format == 'opus' and info.samplerate in OPUS_SAMPLE_RATES:
+            ext, fmt, subtype = '.opus', 'OGG', 'OPUS'
+        else:
+            ext, fmt, subtype = '.flac', 'FLAC', 'PCM_16'
+
+        target = os.path.splitext(source)[0] + ext
+        partial = target + '.partial'
+        kwargs = {}
+        if self.compression_level is not None:
+            kwargs['compression_level'] = self.compression_level
+        try:
+            with sf.SoundFile(partial, 'w', samplerate=info.samplerate, channels=info.channels,
+                              format=fmt, subtype=subtype, **kwargs) as out:
+                for block in sf.blocks(source, blocksize=BLOCK_FRAMES, dtype='float32'):
+                    out.write(block)
+            os.replace(partial, target)
+        except Exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return target, os.path.getsize(target)
+
+
+# Singleton instance
+_audio_archiver = None
+
+def init_audio_archiver(**kwargs):
+    """Create and start the singleton audio archiver."""
+    global _audio_archiver
+    if _audio_archiver is None:
+        _audio_archiver = AudioArchiver(**kwargs)
+        _audio_archiver.start()
+    return _audio_archiver
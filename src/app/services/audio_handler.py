@@ -1,84 +1,44 @@
 # app/services/audio_handler.py
 import os
+import itertools
 import threading
 import time
-from datetime import datetime, timezone
-from queue import Queue
+from datetime import datetime
+from queue import PriorityQueue
 import sqlite3
 import json
 from ..utils.logging_setup import error_logger, warning_logger, transcription_logger, db_logger
+from ..utils.recording_ids import now_ms, format_timestamp
+from ..utils.wav_info import wav_duration_ms
 from .transcription_service import TranscriptionService
+from .event_bus import get_event_bus
+from .keyword_alerts import get_keyword_matcher
+from .settings_service import get_settings_service, to_bool
+from .write_buffer import get_write_buffer
+from .audio_analysis import analyze_clip
+from .upload_ingest import DEDUP_WINDOW_MS
+from . import database
+
+# Upload queue priorities; lower runs first
+PRIORITY_LIVE = 0
+PRIORITY_BACKLOG = 10
 
 class UploadTask:
     """Represents a pending upload transcription task."""
-    def __init__(self, file_path, channel_id, timestamp):
+    def __init__(self, file_path, channel_id, timestamp, captured_at_ms=None, received_at_ms=None,
+                 duration_ms=None, content_hash=None):
         self.file_path = file_path
         self.channel_id = channel_id
         self.timestamp = timestamp
+        self.captured_at_ms = captured_at_ms
+        self.received_at_ms = received_at_ms
+        self.duration_ms = duration_ms
+        self.content_hash = content_hash
+        self.analysis = None
         self.status = "pending"  # pending, processing, completed, failed
         self.transcription = None
         self.error = None
 
-# Constants
-DB_PATH = os.path.join('db', 'default.db')
-SETTINGS_JSON_PATH = os.path.join('db', 'settings.json')
-
-DB_FILE_NAME = 'default.db'
- 
-try:
-    with open(SETTINGS_JSON_PATH, 'r') as f:
-        settings = json.load(f)
-    DB_FILE_NAME = settings.get("event_name", "default") + ".db"
-    DB_PATH = os.path.join('db', DB_FILE_NAME)
-except Exception as e:
-    print("Error Checking the database location")
-
-def init_db():
-    """Initialize the SQLite database with proper indices."""
-    try:
-        os.makedirs('db', exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recordings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                channel_id INTEGER,
-                filename TEXT,
-                timestamp TEXT,
-                transcription TEXT
-                status TEXT DEFAULT 'new'
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_recordings_timestamp 
-            ON recordings(timestamp DESC)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_channel_timestamp 
-            ON recordings(channel_id, timestamp DESC)
-        ''')
-        
-        conn.commit()
-        conn.close()
-        db_logger.info("Database initialized successfully")
-    except Exception as e:
-        error_logger.error(f"Failed to initialize database: {str(e)}")
-        raise
-
-def load_settings():
-    """Load settings from JSON file."""
-    try:
-        with open(SETTINGS_JSON_PATH, 'r') as f:
-            settings = json.load(f)
-            db_logger.info("Settings loaded successfully")
-            return settings
-    except Exception as e:
-        error_logger.error(f"Error loading settings: {str(e)}")
-        return {}   
-
 class AudioChannel:
     """Handle individual audio channel operations."""
     
@@ -89,96 +49,67 @@ class AudioChannel:
         os.makedirs(output_dir, exist_ok=True)
         db_logger.info(f"AudioChannel {channel_id} initialized successfully")
 
-    def save_recording(self, filename, timestamp, transcription):
-        """Save recording metadata to database with improved error handling and validation."""
+    def save_recording(self, filename, timestamp, transcription, captured_at_ms=None, received_at_ms=None,
+                       duration_ms=None, analysis=None, content_hash=None):
+        """
+        Queue recording metadata for the database write-behind buffer.
+
+        Returns:
+            Future or None: Resolves to the recording id once the row is
+            committed; None if the recording could not be queued
+        """
         with self.recording_lock:
-            conn = sqlite3.connect(DB_PATH, isolation_level='IMMEDIATE')
-            cursor = None
             try:
                 if not all([filename, timestamp, transcription]):
                     raise ValueError("Missing required fields for recording")
-                    
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT id FROM recordings 
-                    WHERE channel_id = ? AND filename = ?
-                ''', (self.channel_id, filename))
-                
-                if cursor.fetchone():
-                    cursor.execute('''
-                        UPDATE recordings 
-                        SET timestamp = ?, transcription = ?
-                        WHERE channel_id = ? AND filename = ?
-                    ''', (timestamp, transcription, self.channel_id, filename))
-                else:
-                    cursor.execute('''
-                        INSERT INTO recordings (channel_id, filename, timestamp, transcription)
-                        VALUES (?, ?, ?, ?)
-                    ''', (self.channel_id, filename, timestamp, transcription))
-                
-                conn.commit()
-                db_logger.info(f"Recording saved successfully: Channel {self.channel_id}, File: {filename}")
-                return True
-                
-            except sqlite3.Error as e:
-                error_logger.error(f"Database error while saving recording: {str(e)}")
-                if conn:
-                    conn.rollback()
-                return False
-                
+
+                keywords = get_keyword_matcher().match(transcription)
+                future = get_write_buffer().submit(
+                    database.save_recording,
+                    self.channel_id, filename, timestamp, transcription, keywords=keywords,
+                    captured_at_ms=captured_at_ms, received_at_ms=received_at_ms,
+                    duration_ms=duration_ms, analysis=analysis, content_hash=content_hash
+                )
+                future.add_done_callback(
+                    lambda f: self._on_recording_saved(f, filename, timestamp, transcription, keywords)
+                )
+                return future
+
             except Exception as e:
                 error_logger.error(f"Unexpected error while saving recording: {str(e)}")
-                if conn:
-                    conn.rollback()
-                return False
-                
-            finally:
-                if cursor:
-                    cursor.close()
-                if conn:
-                    conn.close()
+                return None
+
+    def _on_recording_saved(self, future, filename, timestamp, transcription, keywords):
+        """Log the committed write and publish keyword alerts for it."""
+        if future.exception() is not None:
+            error_logger.error(f"Database error while saving recording: {str(future.exception())}")
+            return
+        db_logger.info(f"Recording saved successfully: Channel {self.channel_id}, File: {filename}")
+
+        if keywords:
+            get_event_bus().publish('alert', {
+                'recording_id': future.result(),
+                'channel_id': self.channel_id,
+                'filename': filename,
+                'timestamp': timestamp,
+                'keywords': keywords,
+                'transcription': transcription
+            })
 
     def get_recordings(self):
-        """Retrieve recordings with validation against filesystem."""
-        with self.recording_lock:
-            conn = sqlite3.connect(DB_PATH)
-            try:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, channel_id, filename, timestamp, transcription
-                    FROM recordings
-                    WHERE channel_id = ?
-                    ORDER BY timestamp DESC
-                ''', (self.channel_id,))
-                
-                recordings = []
-                for row in cursor.fetchall():
-                    file_path = row[2]
-                    if os.path.exists(file_path):
-                        recordings.append({
-                            'id': row[0],
-                            'channel_id': row[1],
-                            'filename': row[2],
-                            'timestamp': row[3],
-                            'transcription': row[4]
-                        })
-                    else:
-                        warning_logger.warning(f"Audio file not found: {file_path}")
-                        cursor.execute('''
-                            DELETE FROM recordings
-                            WHERE id = ?
-                        ''', (row[0],))
-                
-                conn.commit()
-                return recordings
-                
-            except sqlite3.Error as e:
-                error_logger.error(f"Error retrieving recordings for channel {self.channel_id}: {str(e)}")
-                return []
-                
-            finally:
-                conn.close()
+        """Retrieve recordings whose audio file the reconciler has seen on disk."""
+        try:
+            return database.get_channel_recordings(self.channel_id)
+        except sqlite3.Error as e:
+            error_logger.error(f"Error retrieving recordings for channel {self.channel_id}: {str(e)}")
+            return []
+
+# Settings applied live by MultiChannelAudioHandler.apply_settings
+API_SETTINGS = frozenset(('open_ai_key', 'api_health_url', 'api_transcription_url'))
+TRANSCRIPTION_SETTINGS = frozenset((
+    'global_model', 'global_transcribe_local', 'global_transcribe_node', 'global_transcribe_openai',
+)) | API_SETTINGS
+
 
 class MultiChannelAudioHandler:
     """Handle multiple audio channels and their operations."""
@@ -187,23 +118,47 @@ class MultiChannelAudioHandler:
         try:
             self.running = False
             self.threads = []
-            self.db_lock = threading.Lock()
-            self.upload_queue = Queue()
+            # (priority, sequence, task): live clips overtake replayed backlogs, FIFO within each
+            self.upload_queue = PriorityQueue()
+            self.upload_sequence = itertools.count()
             self.upload_tasks = {}
+            # (channel_id, content_hash) -> file_path of clips queued but not yet saved
+            self.pending_hashes = {}
             self.upload_processor_thread = None
             self.upload_processor_lock = threading.Lock()
             self.channels = {}  # Dictionary to store channels dynamically
+            self.event_bus = get_event_bus()
 
             self.transcription_service = TranscriptionService(model_name=model_name)
-            self.trans_local = trans_local.lower() == 'true' if isinstance(trans_local, str) else bool(trans_local)
-            self.trans_openai = trans_openai.lower() == 'true' if isinstance(trans_openai, str) else bool(trans_openai)
-            self.trans_node = trans_node.lower() == 'true' if isinstance(trans_node, str) else bool(trans_node)
+            self.trans_local = to_bool(trans_local)
+            self.trans_openai = to_bool(trans_openai)
+            self.trans_node = to_bool(trans_node)
+            get_settings_service().subscribe(self.apply_settings, keys=TRANSCRIPTION_SETTINGS)
 
             db_logger.info("MultiChannelAudioHandler initialized")
         except Exception as e:
             error_logger.error(f"Failed to initialize MultiChannelAudioHandler: {str(e)}")
             raise
 
+    def apply_settings(self, changed):
+        """
+        Apply changed transcription settings without a restart.
+
+        Toggles take effect from the next clip; a new model is loaded in the
+        background while queued clips keep using the current one.
+        """
+        if 'global_transcribe_local' in changed:
+            self.trans_local = to_bool(changed['global_transcribe_local'])
+        if 'global_transcribe_openai' in changed:
+            self.trans_openai = to_bool(changed['global_transcribe_openai'])
+        if 'global_transcribe_node' in changed:
+            self.trans_node = to_bool(changed['global_transcribe_node'])
+        if changed.get('global_model'):
+            self.transcription_service.set_model(changed['global_model'])
+        if changed.keys() & API_SETTINGS:
+            self.transcription_service.apply_api_settings()
+        db_logger.info(f"Applied transcription settings: {', '.join(sorted(changed))}")
+
     def get_or_create_channel(self, channel_id):
         """Get existing channel or create new one dynamically."""
         if channel_id not in self.channels:
@@ -223,19 +178,77 @@ class MultiChannelAudioHandler:
         self.upload_processor_thread.start()
         db_logger.info("Started upload processor thread")
 
-    def queue_upload_for_processing(self, file_path, channel_id):
-        """Queue an uploaded file for processing."""
+    def _find_duplicate(self, channel_id, content_hash, file_path):
+        """Find a queued or recently transcribed copy of a clip; call with upload_processor_lock held."""
+        if not content_hash:
+            return None
+        pending = self.pending_hashes.get((channel_id, content_hash))
+        if pending and pending != file_path:
+            return {'id': None, 'filename': pending}
+        return database.find_duplicate_recording(
+            channel_id, content_hash, now_ms() - DEDUP_WINDOW_MS, exclude_filename=file_path
+        )
+
+    def _release_hash(self, task):
+        """Stop treating a task's clip as queued once it is saved or has failed."""
+        with self.upload_processor_lock:
+            key = (task.channel_id, task.content_hash)
+            if self.pending_hashes.get(key) == task.file_path:
+                del self.pending_hashes[key]
+
+    def queue_upload_for_processing(self, file_path, channel_id, captured_at_ms=None, received_at_ms=None,
+                                    content_hash=None):
+        """
+        Queue an uploaded file for processing.
+
+        A file that is already queued, or whose content_hash matches a clip
+        queued or transcribed on the channel within DEDUP_WINDOW_MS, is not
+        queued again; the result then carries duplicate_of (id and filename
+        of the existing recording, id None while it is still queued) and the
+        caller should discard its copy unless it is the same file.
+
+        Args:
+            captured_at_ms (int): Device capture time in epoch milliseconds
+            received_at_ms (int): Server receive time in epoch milliseconds (default: now)
+            content_hash (str): SHA-256 of the clip
+        """
         try:
-            timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-            task = UploadTask(file_path, channel_id, timestamp)
-            
+            received_at_ms = received_at_ms or now_ms()
+            captured_at_ms = captured_at_ms or received_at_ms
+            timestamp = format_timestamp(captured_at_ms)
+            filename = os.path.basename(file_path)
+
             with self.upload_processor_lock:
-                filename = os.path.basename(file_path)
+                existing = self.upload_tasks.get(filename)
+                if existing and existing.status != "failed":
+                    return True, {
+                        'filename': filename,
+                        'timestamp': existing.timestamp,
+                        'status': existing.status,
+                        'duplicate_of': {'id': None, 'filename': existing.file_path}
+                    }
+                duplicate = self._find_duplicate(channel_id, content_hash, file_path)
+                if duplicate:
+                    db_logger.info(f"Upload {file_path} duplicates {duplicate['filename']}, not queued")
+                    return True, {
+                        'filename': os.path.basename(duplicate['filename']),
+                        'timestamp': timestamp,
+                        'status': 'duplicate',
+                        'duplicate_of': duplicate
+                    }
+
+                duration_ms = wav_duration_ms(os.path.join(os.getcwd(), file_path))
+                task = UploadTask(file_path, channel_id, timestamp, captured_at_ms, received_at_ms, duration_ms,
+                                  content_hash)
                 self.upload_tasks[filename] = task
-                self.upload_queue.put(task)
+                if content_hash:
+                    self.pending_hashes[(channel_id, content_hash)] = file_path
+                self.upload_queue.put((PRIORITY_LIVE, next(self.upload_sequence), task))
             
             # Ensure channel exists
             self.get_or_create_channel(channel_id)
+
+            self.publish_recording_event(task, 'queued')
             
             return True, {
                 'filename': filename,
@@ -246,32 +259,107 @@ class MultiChannelAudioHandler:
             error_logger.error(f"Error queueing upload: {str(e)}")
             return False, str(e)
 
+    def queue_batch_for_processing(self, clips, channel_id, received_at_ms=None):
+        """
+        Queue a device's replayed backlog behind live uploads.
+
+        Clips that duplicate a queued or recently transcribed recording (or an earlier
+        clip of the batch) are skipped like in queue_upload_for_processing.
+        Placeholder rows for the rest are written in one transaction, so the
+        backlog shows up at once in capture order, then the clips are queued
+        at PRIORITY_BACKLOG.
+
+        Args:
+            clips (list): (file_path, captured_at_ms, content_hash) tuples
+            channel_id (int): The channel the clips belong to
+            received_at_ms (int): Server receive time in epoch milliseconds (default: now)
+
+        Returns:
+            dict: {file_path: existing recording (id, filename)} for the
+            duplicates, which the caller should discard
+        """
+        received_at_ms = received_at_ms or now_ms()
+        candidates = []
+        for file_path, captured_at_ms, content_hash in clips:
+            captured_at_ms = captured_at_ms or received_at_ms
+            duration_ms = wav_duration_ms(os.path.join(os.getcwd(), file_path))
+            candidates.append(UploadTask(file_path, channel_id, format_timestamp(captured_at_ms),
+                                         captured_at_ms, received_at_ms, duration_ms, content_hash))
+        candidates.sort(key=lambda task: task.captured_at_ms)
+
+        tasks, duplicates = [], {}
+        with self.upload_processor_lock:
+            for task in candidates:
+                duplicate = self._find_duplicate(channel_id, task.content_hash, task.file_path)
+                if duplicate:
+                    duplicates[task.file_path] = duplicate
+                    continue
+                if task.content_hash:
+                    self.pending_hashes[(channel_id, task.content_hash)] = task.file_path
+                tasks.append(task)
+
+        try:
+            with database.transaction():
+                for task in tasks:
+                    database.insert_queued_recording(
+                        channel_id, task.file_path, task.timestamp,
+                        captured_at_ms=task.captured_at_ms, received_at_ms=task.received_at_ms,
+                        duration_ms=task.duration_ms, status='new', content_hash=task.content_hash
+                    )
+        except Exception:
+            for task in tasks:
+                self._release_hash(task)
+            raise
+
+        self.get_or_create_channel(channel_id)
+        with self.upload_processor_lock:
+            for task in tasks:
+                self.upload_tasks[os.path.basename(task.file_path)] = task
+                self.upload_queue.put((PRIORITY_BACKLOG, next(self.upload_sequence), task))
+        for task in tasks:
+            self.publish_recording_event(task, 'queued')
+        return duplicates
+
     def process_upload_queue(self):
         """Process queued upload tasks."""
         while self.running:
             try:
                 if not self.upload_queue.empty():
-                    task = self.upload_queue.get()
+                    _, _, task = self.upload_queue.get()
                     
                     try:
                         task.status = "processing"
                         channel = self.get_or_create_channel(task.channel_id)
+                        self.publish_recording_event(task, 'transcribing')
                         
                         absolute_path = os.path.join(os.getcwd(), task.file_path)
+                        # Waveform peaks and signal metrics, stored with the recording
+                        task.analysis = analyze_clip(absolute_path)
                         
                         transcription_logger.info(f"Starting transcription for uploaded file: {task.file_path}")
                         transcription = self.transcription_service.transcribe_audio(
                             absolute_path,
                             use_local=self.trans_local,
                             use_openai=self.trans_openai,
-                            use_nodes=self.trans_node
+                            use_nodes=self.trans_node,
+                            on_partial=lambda text: self.publish_recording_event(task, 'partial', transcription=text)
                         )
                         transcription_logger.info(f"Transcription completed for uploaded file: {task.file_path}")
                         
                         if transcription:
-                            channel.save_recording(task.file_path, task.timestamp, transcription)
-                            task.status = "completed"
                             task.transcription = transcription
+                            future = channel.save_recording(
+                                task.file_path, task.timestamp, transcription,
+                                captured_at_ms=task.captured_at_ms,
+                                received_at_ms=task.received_at_ms,
+                                duration_ms=task.duration_ms,
+                                analysis=task.analysis,
+                                content_hash=task.content_hash
+                            )
+                            if future is None:
+                                raise Exception("Failed to queue recording for saving")
+                            # The task stays "processing" until the row is committed
+                            future.add_done_callback(lambda f, task=task: self._complete_upload(task, f))
                         else:
                             raise Exception("Transcription failed - no result returned")
                             
@@ -279,6 +367,8 @@ class MultiChannelAudioHandler:
                         error_logger.error(f"Error processing upload: {str(e)}")
                         task.status = "failed"
                         task.error = str(e)
+                        self._release_hash(task)
+                        self.publish_recording_event(task, 'failed', error=str(e))
                     
                     finally:
                         self.upload_queue.task_done()
@@ -287,6 +377,38 @@ class MultiChannelAudioHandler:
                 error_logger.error(f"Error in upload queue processor: {str(e)}")
             time.sleep(0.1)
 
+    def _complete_upload(self, task, future):
+        """Mark an upload task finished once its recording row is committed."""
+        # Saved rows carry the hash, failed clips may be sent again
+        self._release_hash(task)
+        if future.exception() is not None:
+            task.status = "failed"
+            task.error = str(future.exception())
+            self.publish_recording_event(task, 'failed', error=task.error)
+            return
+        task.status = "completed"
+        self.publish_recording_event(task, 'completed', recording_id=future.result())
+
+    def publish_recording_event(self, task, stage, **extra):
+        """Publish a recording lifecycle event (queued, transcribing, partial, completed, failed)."""
+        try:
+            self.event_bus.publish('recording', {
+                'stage': stage,
+                'channel_id': task.channel_id,
+                'filename': task.file_path,
+                'timestamp': task.timestamp,
+                'captured_at_ms': task.captured_at_ms,
+                **extra
+            })
+        except Exception as e:
+            error_logger.error(f"Error publishing recording event: {str(e)}")
+
+    def is_upload_pending(self, file_path):
+        """Check whether a file is still waiting in (or being processed by) the upload queue."""
+        with self.upload_processor_lock:
+            task = self.upload_tasks.get(os.path.basename(file_path))
+            return bool(task and task.status in ("pending", "processing"))
+
     def get_upload_status(self, filename):
         """Get the status of an uploaded file's processing."""
         with self.upload_processor_lock:
@@ -311,45 +433,26 @@ class MultiChannelAudioHandler:
         except Exception as e:
             error_logger.error(f"Error stopping MultiChannelAudioHandler: {str(e)}")
 
-    def get_all_recordings(self):
-        """Get all recordings across all channels, considering settings."""
-        with open(SETTINGS_JSON_PATH, 'r') as settings_file:
-            settings = json.load(settings_file)
-        
-        global_hallucination = settings.get("global_hallucination", "False") == "True"
-        
-        with self.db_lock:
-            conn = sqlite3.connect(DB_PATH)
-            try:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT id, channel_id, filename, timestamp, transcription, status
-                    FROM recordings
-                    ORDER BY timestamp DESC
-                ''')
-                recordings = cursor.fetchall()
-                
-                filtered_recordings = []
-                for row in recordings:
-                    transcription = row[4]
-                    if global_hallucination and transcription in ("...", "."):
-                        continue
-                    filtered_recordings.append({
-                        'id': row[0],
-                        'channel_id': row[1],
-                        'filename': row[2],
-                        'timestamp': row[3],
-                        'status': row[5],
-                        'transcription': transcription
-                    })
-                
-                return filtered_recordings
-            
-            except sqlite3.Error as e:
-                error_logger.error(f"Error retrieving all recordings: {str(e)}")
-                return []
-            finally:
-                conn.close()
+    def get_all_recordings(self, limit=500, before_id=None, after_id=None, channel_id=None,
+                           start=None, end=None, statuses=None, metric_ranges=None):
+        """Get a page of recordings across all channels, considering settings."""
+        try:
+            global_hallucination = get_settings_service().get_bool("global_hallucination")
+
+            return database.query_recordings(
+                limit,
+                before_id=before_id,
+                after_id=after_id,
+                channel_id=channel_id,
+                start=start,
+                end=end,
+                statuses=statuses,
+                hide_hallucinations=global_hallucination,
+                metric_ranges=metric_ranges
+            )
+        except sqlite3.Error as e:
+            error_logger.error(f"Error retrieving all recordings: {str(e)}")
+            return []
 
     def get_channel_recordings(self, channel_id):
         """Get recordings for a specific channel."""
@@ -399,13 +502,17 @@ def get_audio_handler():
             raise
     return _audio_handler
 
+def is_upload_pending(file_path):
+    """Check the upload queue without forcing the audio handler to initialize."""
+    return _audio_handler is not None and _audio_handler.is_upload_pending(file_path)
+
 def init_audio_handler():
     """Initialize the singleton audio handler instance."""
     global _audio_handler
     if _audio_handler is None:
         try:
-            init_db()
-            settings = load_settings()
+            database.run_migrations()
+            settings = get_settings_service()
             model_name = settings.get("global_model", "small")
 
             trans_local = settings.get("global_transcribe_local", "False")
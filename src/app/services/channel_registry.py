@@ -0,0 +1,191 @@
+# app/services/channel_registry.py
+import threading
+import time
+from ..utils.logging_setup import error_logger
+from . import database
+from .write_buffer import get_write_buffer
+
+
+def normalize_mac(mac):
+    """Normalize a MAC address for lookups (devices report them in either case)."""
+    return mac.strip().upper() if mac else None
+
+
+def next_channel_id(channels):
+    """Return the id for a new channel in a channel list."""
+    return max((c.get('id') or 0 for c in channels), default=0) + 1
+
+
+class _Snapshot:
+    """An immutable view of the channels with their lookup indexes."""
+    __slots__ = ('channels', 'by_mac', 'by_id')
+
+    def __init__(self, channels):
+        self.channels = channels
+        self.by_mac = {}
+        self.by_id = {}
+        for channel in channels:
+            mac = normalize_mac(channel.get('mac'))
+            if mac:
+                # First entry wins, like the linear scans this replaces
+                self.by_mac.setdefault(mac, channel)
+            self.by_id.setdefault(channel.get('id'), channel)
+
+
+class ChannelRegistry:
+    """
+    In-memory view of the channels store indexed by MAC address and by id.
+
+    Lookups read the current snapshot without locking or database access.
+    The store's version counter is checked at most every check_interval
+    seconds (and straight away when an unknown MAC is looked up) and the
+    snapshot reloaded when it moved, which picks up changes made by other
+    processes such as upload_service. Writes go through update(), which
+    serializes writers and swaps in the new snapshot straight away; only
+    the channels that changed are written, through the write-behind
+    buffer. Changes that add, remove or re-address channels wait for their
+    commit so other processes see them at once, while setting changes
+    (e.g. device heartbeats) are coalesced per channel.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        self._version = None
+        self._writes = []
+        self._snapshot = _Snapshot([])
+        self.reload()
+
+    def reload(self):
+        """Reload the channels from the database."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                version = database.get_config_version('channels')
+                channels = list(database.get_config_records('channels').values())
+            except Exception as e:
+                # Keep serving the last good copy
+                error_logger.error(f"Error loading channels: {str(e)}")
+                return
+            self._version = version
+            self._snapshot = _Snapshot(channels)
+
+    def _stale(self):
+        # While our own writes are in flight the database is behind the snapshot
+        with self._lock:
+            self._writes = [f for f in self._writes if not f.done()]
+            if self._writes:
+                return False
+        return database.get_config_version('channels') != self._version
+
+    def _current(self, force=False):
+        if force or time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            try:
+                if self._stale():
+                    self.reload()
+            except Exception as e:
+                error_logger.error(f"Error checking channels version: {str(e)}")
+        return self._snapshot
+
+    def refresh(self):
+        """Pick up changes made elsewhere now instead of at the next periodic check."""
+        self._current(force=True)
+
+    def get_id_by_mac(self, mac):
+        """
+        Look up a channel id by MAC address.
+
+        Args:
+            mac (str): The MAC address, in any case
+
+        Returns:
+            int or None: The channel ID if found, None otherwise
+        """
+        channel = self.get_by_mac(mac)
+        return channel.get('id') if channel else None
+
+    def get_by_mac(self, mac):
+        """Return a copy of the channel with this MAC address, or None."""
+        mac = normalize_mac(mac)
+        if not mac:
+            return None
+        channel = self._current().by_mac.get(mac)
+        if channel is None:
+            # A device that was just added (possibly by another process)
+            channel = self._current(force=True).by_mac.get(mac)
+        return dict(channel) if channel else None
+
+    def get(self, channel_id):
+        """Return a copy of the channel with this id, or None."""
+        channel = self._current().by_id.get(channel_id)
+        return dict(channel) if channel else None
+
+    def all(self):
+        """Return copies of every channel, ordered by id."""
+        return [dict(c) for c in self._current().channels]
+
+    def update(self, fn):
+        """
+        Modify the channels.
+
+        fn receives a fresh, mutable copy of the channel list and may change,
+        add or remove entries; the indexes are rebuilt before update returns
+        and the channels that differ are written.
+
+        Args:
+            fn (callable): Called as fn(channels)
+
+        Returns:
+            Whatever fn returned
+        """
+        with self._lock:
+            if self._stale():
+                self.reload()
+            current = self._snapshot
+            channels = [dict(c) for c in current.channels]
+            result = fn(channels)
+            if channels == current.channels:
+                return result
+
+            snapshot = _Snapshot(channels)
+            self._snapshot = snapshot
+            changed = [c for c in channels if current.by_id.get(c.get('id')) != c]
+            removed = current.by_id.keys() - snapshot.by_id.keys()
+
+            buffer = get_write_buffer()
+            futures = [
+                buffer.submit(database.save_config_record, 'channels', channel, key=('channel', channel.get('id')))
+                for channel in changed
+            ] + [
+                buffer.submit(database.delete_config_record, 'channels', channel_id, key=('channel', channel_id))
+                for channel_id in removed
+            ] + [
+                # Lets /api/sync clients drop the channel
+                buffer.submit(database.record_change, 'channel', channel_id, 'delete')
+                for channel_id in removed
+            ]
+            self._writes.extend(futures)
+            rekeyed = (snapshot.by_mac.keys() != current.by_mac.keys()
+                       or snapshot.by_id.keys() != current.by_id.keys())
+
+        # Waited for outside the lock so readers and the flush are never held up
+        if rekeyed:
+            for future in futures:
+                future.result()
+        return result
+
+
+# Singleton instance
+_channel_registry = None
+_channel_registry_lock = threading.Lock()
+
+def get_channel_registry():
+    """Get the singleton channel registry, loading the channels on first use."""
+    global _channel_registry
+    if _channel_registry is None:
+        with _channel_registry_lock:
+            if _channel_registry is None:
+                _channel_registry = ChannelRegistry()
+    return _channel_registry
@@ -0,0 +1,1728 @@
+# app/services/database.py
+import os
+import re
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from ..utils.logging_setup import error_logger, db_logger
+from ..utils.recording_ids import now_ms
+from .json_store import load_json_file
+
+SETTINGS_JSON_PATH = os.path.join('db', 'settings.json')
+# Channels, users, settings, ... live in their own database so they are
+# shared by every event database; it is attached to each connection as "config"
+CONFIG_DB_PATH = os.path.join('db', 'config.db')
+
+# Connection tuning applied to every pooled connection
+BUSY_TIMEOUT_MS = 5000
+MMAP_SIZE = 64 * 1024 * 1024
+STATEMENT_CACHE_SIZE = 256
+# FULL fsyncs every commit; NORMAL (WAL) may lose the last commits on power failure
+SYNCHRONOUS = 'NORMAL'
+
+
+def _resolve_db_path():
+    """Build the event database path from the event_name setting."""
+    db_file_name = 'default.db'
+    try:
+        event_name = None
+        if os.path.exists(CONFIG_DB_PATH):
+            conn = sqlite3.connect(CONFIG_DB_PATH)
+            try:
+                row = conn.execute("SELECT value FROM settings WHERE key = 'event_name'").fetchone()
+                event_name = json.loads(row[0]) if row else None
+            except sqlite3.OperationalError:
+                pass  # Created but not migrated yet
+            finally:
+                conn.close()
+        if event_name is None and os.path.exists(SETTINGS_JSON_PATH):
+            # Settings not imported yet
+            with open(SETTINGS_JSON_PATH, 'r') as f:
+                event_name = json.load(f).get("event_name")
+        db_file_name = (event_name or "default") + ".db"
+    except Exception as e:
+        error_logger.error(f"Error reading event name from settings, using {db_file_name}: {str(e)}")
+    return os.path.join('db', db_file_name)
+
+
+DB_PATH = _resolve_db_path()
+
+# Per-thread connection pool. Waitress runs a fixed number of worker threads,
+# so each thread keeps one long-lived connection (and its statement cache).
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+def _open_connection():
+    """Open a new connection with the standard pragmas applied."""
+    os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # transactions are managed explicitly
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute('ATTACH DATABASE ? AS config', (CONFIG_DB_PATH,))
+    for schema in ('main', 'config'):
+        conn.execute(f'PRAGMA {schema}.journal_mode=WAL')
+        conn.execute(f'PRAGMA {schema}.synchronous={SYNCHRONOUS}')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+
+def get_connection():
+    """Return the calling thread's pooled connection, opening it on first use."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _open_connection()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_all_connections():
+    """Close every pooled connection (used on shutdown)."""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+    _local.__dict__.pop('conn', None)
+
+
+def set_synchronous(mode):
+    """
+    Set PRAGMA synchronous for connections opened from now on.
+
+    Call at startup, before worker threads open their connections; the
+    calling thread's own connection is updated immediately.
+    """
+    global SYNCHRONOUS
+    mode = mode.upper()
+    if mode not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+        raise ValueError(f"Unknown synchronous mode: {mode}")
+    SYNCHRONOUS = mode
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.execute(f'PRAGMA main.synchronous={mode}')
+        conn.execute(f'PRAGMA config.synchronous={mode}')
+
+
+@contextmanager
+def transaction():
+    """
+    Run a block inside a single write transaction on the thread's connection.
+
+    Nested use joins the outer transaction instead of opening a new one.
+    """
+    conn = get_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+def _column_names(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _migration_1_recordings(conn):
+    """Base recordings table, repairing databases created without a status column."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recordings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER,
+            filename TEXT,
+            timestamp TEXT,
+            transcription TEXT,
+            status TEXT DEFAULT 'new'
+        )
+    ''')
+    if 'status' not in _column_names(conn, 'recordings'):
+        conn.execute("ALTER TABLE recordings ADD COLUMN status TEXT DEFAULT 'new'")
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_timestamp
+        ON recordings(timestamp DESC)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_channel_timestamp
+        ON recordings(channel_id, timestamp DESC)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_filename
+        ON recordings(filename)
+    ''')
+
+
+def _migration_2_listing_indexes(conn):
+    """Indexes backing keyset pagination and filtered recording listings."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_id
+        ON recordings(channel_id, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_status_id
+        ON recordings(status, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_status_id
+        ON recordings(channel_id, status, id)
+    ''')
+
+
+def _migration_3_change_log(conn):
+    """Change log holding the latest change version for every synced entity."""
+    # One row per (entity, entity_id); INSERT OR REPLACE moves an entity to a
+    # fresh AUTOINCREMENT version so the table never grows past the entity count.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            op TEXT NOT NULL,
+            UNIQUE(entity, entity_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_change_insert
+        AFTER INSERT ON recordings
+        BEGIN
+            INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+            VALUES ('recording', NEW.id, 'upsert');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_change_update
+        AFTER UPDATE ON recordings
+        BEGIN
+            INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+            VALUES ('recording', NEW.id, 'upsert');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_change_delete
+        AFTER DELETE ON recordings
+        BEGIN
+            INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+            VALUES ('recording', OLD.id, 'delete');
+        END
+    ''')
+
+
+def _migration_4_file_presence(conn):
+    """File presence/size columns maintained by the filesystem reconciler."""
+    columns = _column_names(conn, 'recordings')
+    if 'file_present' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN file_present INTEGER NOT NULL DEFAULT 1')
+    if 'file_size' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN file_size INTEGER')
+    if 'missing_since' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN missing_since INTEGER')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_present
+        ON recordings(channel_id, file_present, timestamp DESC)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_missing
+        ON recordings(missing_since) WHERE file_present = 0
+    ''')
+    # Reconciler bookkeeping must not show up as a change for sync clients
+    conn.execute('DROP TRIGGER IF EXISTS trg_recordings_change_update')
+    conn.execute('''
+        CREATE TRIGGER trg_recordings_change_update
+        AFTER UPDATE OF channel_id, filename, timestamp, transcription, status ON recordings
+        BEGIN
+            INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+            VALUES ('recording', NEW.id, 'upsert');
+        END
+    ''')
+
+
+def _migration_5_transcription_fts(conn):
+    """FTS5 index over transcriptions, kept in sync with recordings by triggers."""
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS recordings_fts USING fts5(
+                transcription,
+                content='recordings',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='2 3'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search stays unavailable, nothing else breaks
+        error_logger.error(f"FTS5 unavailable, transcription search disabled: {str(e)}")
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_fts_insert
+        AFTER INSERT ON recordings
+        BEGIN
+            INSERT INTO recordings_fts (rowid, transcription) VALUES (NEW.id, NEW.transcription);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_fts_delete
+        AFTER DELETE ON recordings
+        BEGIN
+            INSERT INTO recordings_fts (recordings_fts, rowid, transcription)
+            VALUES ('delete', OLD.id, OLD.transcription);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_fts_update
+        AFTER UPDATE OF transcription ON recordings
+        BEGIN
+            INSERT INTO recordings_fts (recordings_fts, rowid, transcription)
+            VALUES ('delete', OLD.id, OLD.transcription);
+            INSERT INTO recordings_fts (rowid, transcription) VALUES (NEW.id, NEW.transcription);
+        END
+    ''')
+    conn.execute("INSERT INTO recordings_fts (recordings_fts) VALUES ('rebuild')")
+
+
+def _migration_6_keyword_hits(conn):
+    """Keyword alert hits recorded when a transcription is saved."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS keyword_hits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recording_id INTEGER NOT NULL,
+            channel_id INTEGER,
+            keyword TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            UNIQUE(recording_id, keyword)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_keyword_hits_keyword
+        ON keyword_hits(keyword, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_keyword_hits_channel
+        ON keyword_hits(channel_id, id)
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_keyword_hits_delete
+        AFTER DELETE ON recordings
+        BEGIN
+            DELETE FROM keyword_hits WHERE recording_id = OLD.id;
+        END
+    ''')
+
+
+def _migration_7_epoch_ms_columns(conn):
+    """Millisecond capture/receive time columns, backfilled from the timestamp text."""
+    columns = _column_names(conn, 'recordings')
+    if 'captured_at_ms' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN captured_at_ms INTEGER')
+    if 'received_at_ms' not in columns:
+        conn.execute('ALTER TABLE recordings ADD COLUMN received_at_ms INTEGER')
+    # Existing rows only know the second-resolution '%Y%m%d_%H%M%S' text
+    conn.execute('''
+        UPDATE recordings
+        SET captured_at_ms = CAST(strftime('%s',
+                substr(timestamp, 1, 4) || '-' || substr(timestamp, 5, 2) || '-' ||
+                substr(timestamp, 7, 2) || ' ' || substr(timestamp, 10, 2) || ':' ||
+                substr(timestamp, 12, 2) || ':' || substr(timestamp, 14, 2)
+            ) AS INTEGER) * 1000
+        WHERE captured_at_ms IS NULL AND timestamp GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]_[0-9][0-9][0-9][0-9][0-9][0-9]*'
+    ''')
+    conn.execute('''
+        UPDATE recordings SET received_at_ms = captured_at_ms
+        WHERE received_at_ms IS NULL
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_captured
+        ON recordings(channel_id, captured_at_ms)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_received
+        ON recordings(channel_id, received_at_ms)
+    ''')
+
+
+def _migration_8_unique_channel_filename(conn):
+    """Unique (channel_id, filename) key for upserts, dropping duplicate rows first."""
+    # Keep the transcribed (then newest) row of each duplicate group
+    conn.execute('''
+        DELETE FROM recordings
+        WHERE channel_id IS NOT NULL AND filename IS NOT NULL
+          AND id != (
+              SELECT r2.id FROM recordings r2
+              WHERE r2.channel_id = recordings.channel_id
+                AND r2.filename = recordings.filename
+              ORDER BY r2.transcription IS NULL, r2.id DESC
+              LIMIT 1
+          )
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_recordings_channel_filename
+        ON recordings(channel_id, filename)
+    ''')
+    # An upsert's ON CONFLICT clause overrides the OR REPLACE inside trigger
+    # bodies, so the change log triggers delete the old entry explicitly
+    change_triggers = (
+        ('trg_recordings_change_insert', 'INSERT', 'NEW', 'upsert'),
+        ('trg_recordings_change_update',
+         'UPDATE OF channel_id, filename, timestamp, transcription, status', 'NEW', 'upsert'),
+        ('trg_recordings_change_delete', 'DELETE', 'OLD', 'delete'),
+    )
+    for name, event, row, op in change_triggers:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+        conn.execute(f'''
+            CREATE TRIGGER {name}
+            AFTER {event} ON recordings
+            BEGIN
+                DELETE FROM change_log WHERE entity = 'recording' AND entity_id = {row}.id;
+                INSERT INTO change_log (entity, entity_id, op)
+                VALUES ('recording', {row}.id, '{op}');
+            END
+        ''')
+
+
+# (period, bucket width in ms) for the per-channel traffic rollups
+ROLLUP_PERIODS = (
+    ('minute', 60 * 1000),
+    ('hour', 3600 * 1000),
+    ('day', 86400 * 1000),
+)
+
+
+def _rollup_upsert_sql(row, sign):
+    """Trigger statements adding (sign='+') or removing (sign='-') one row's contribution."""
+    ts = f'COALESCE({row}.captured_at_ms, {row}.received_at_ms)'
+    statements = []
+    for period, width in ROLLUP_PERIODS:
+        statements.append(f'''
+            INSERT INTO recording_rollups (period, channel_id, bucket_ms, messages, airtime_ms, pending)
+            SELECT '{period}', {row}.channel_id, ({ts} / {width}) * {width},
+                   {sign}1, {sign}COALESCE({row}.duration_ms, 0), {sign}({row}.transcription IS NULL)
+            WHERE {ts} IS NOT NULL
+            ON CONFLICT(period, channel_id, bucket_ms) DO UPDATE SET
+                messages = messages + excluded.messages,
+                airtime_ms = airtime_ms + excluded.airtime_ms,
+                pending = pending + excluded.pending;''')
+    return ''.join(statements)
+
+
+def _migration_9_traffic_rollups(conn):
+    """Per-channel minute/hour/day traffic rollups maintained by triggers."""
+    if 'duration_ms' not in _column_names(conn, 'recordings'):
+        conn.execute('ALTER TABLE recordings ADD COLUMN duration_ms INTEGER')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recording_rollups (
+            period TEXT NOT NULL,
+            channel_id INTEGER,
+            bucket_ms INTEGER NOT NULL,
+            messages INTEGER NOT NULL DEFAULT 0,
+            airtime_ms INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (period, channel_id, bucket_ms)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recording_rollups_bucket
+        ON recording_rollups(period, bucket_ms)
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_rollup_insert
+        AFTER INSERT ON recordings
+        BEGIN{_rollup_upsert_sql('NEW', '+')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_rollup_delete
+        AFTER DELETE ON recordings
+        BEGIN{_rollup_upsert_sql('OLD', '-')}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_rollup_update
+        AFTER UPDATE OF channel_id, captured_at_ms, received_at_ms, duration_ms, transcription
+        ON recordings
+        BEGIN{_rollup_upsert_sql('OLD', '-')}{_rollup_upsert_sql('NEW', '+')}
+        END
+    ''')
+
+    conn.execute('DELETE FROM recording_rollups')
+    for period, width in ROLLUP_PERIODS:
+        conn.execute(f'''
+            INSERT INTO recording_rollups (period, channel_id, bucket_ms, messages, airtime_ms, pending)
+            SELECT '{period}', channel_id, (ts / {width}) * {width},
+                   COUNT(*), SUM(COALESCE(duration_ms, 0)), SUM(transcription IS NULL)
+            FROM (
+                SELECT channel_id, duration_ms, transcription,
+                       COALESCE(captured_at_ms, received_at_ms) AS ts
+                FROM recordings
+            )
+            WHERE ts IS NOT NULL
+            GROUP BY channel_id, ts / {width}
+        ''')
+
+
+def _migration_10_rollup_hold(conn):
+    """Let retention delete rows without erasing their traffic rollups."""
+    # While a row exists here, deletes leave recording_rollups untouched. It is
+    # only ever set inside a write transaction, so other writers never see it.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_hold (
+            id INTEGER PRIMARY KEY CHECK (id = 1)
+        )
+    ''')
+    conn.execute('DROP TRIGGER IF EXISTS trg_recordings_rollup_delete')
+    conn.execute(f'''
+        CREATE TRIGGER trg_recordings_rollup_delete
+        AFTER DELETE ON recordings
+        WHEN NOT EXISTS (SELECT 1 FROM rollup_hold)
+        BEGIN{_rollup_upsert_sql('OLD', '-')}
+        END
+    ''')
+
+
+def _migration_11_wav_index(conn):
+    """Partial index of recordings still stored as WAV, for the audio archiver."""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_wav
+        ON recordings(id) WHERE filename LIKE '%.wav'
+    ''')
+
+
+def _migration_12_recording_peaks(conn):
+    """Precomputed waveform peaks, one row per recording."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recording_peaks (
+            recording_id INTEGER PRIMARY KEY,
+            sample_rate INTEGER NOT NULL,
+            samples_per_peak INTEGER NOT NULL,
+            peaks BLOB NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_recordings_peaks_delete
+        AFTER DELETE ON recordings
+        BEGIN
+            DELETE FROM recording_peaks WHERE recording_id = OLD.id;
+        END
+    ''')
+
+
+# Signal-level metrics computed at ingest (see audio_analysis.compute_metrics)
+METRIC_COLUMNS = ('rms_dbfs', 'peak_dbfs', 'clipping_ratio', 'snr_db', 'speech_ratio')
+
+
+def _migration_13_audio_metrics(conn):
+    """Per-clip signal metrics with indexes for sorting and filtering weak transmissions."""
+    columns = _column_names(conn, 'recordings')
+    for column in METRIC_COLUMNS:
+        if column not in columns:
+            conn.execute(f'ALTER TABLE recordings ADD COLUMN {column} REAL')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_rms
+        ON recordings(rms_dbfs)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_snr
+        ON recordings(snr_db)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_rms
+        ON recordings(channel_id, rms_dbfs)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_snr
+        ON recordings(channel_id, snr_db)
+    ''')
+
+
+def _migration_14_upload_sessions(conn):
+    """Resumable upload sessions; the received offset is the partial file's size."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            mac TEXT NOT NULL,
+            size INTEGER,
+            captured_at_ms INTEGER,
+            created_at_ms INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migration_15_content_hash(conn):
+    """SHA-256 of each clip, indexed per channel for upload deduplication."""
+    if 'content_hash' not in _column_names(conn, 'recordings'):
+        conn.execute('ALTER TABLE recordings ADD COLUMN content_hash TEXT')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recordings_channel_hash
+        ON recordings(channel_id, content_hash) WHERE content_hash IS NOT NULL
+    ''')
+
+
+def _migration_16_change_log_checkpoints(conn):
+    """Change version checkpoints for pruning delete entries from the change log."""
+    # A checkpoint maps a change version to the time it was current; pruned
+    # marks the newest one whose delete entries are gone (the sync floor)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_checkpoints (
+            version INTEGER PRIMARY KEY,
+            created_at_ms INTEGER NOT NULL,
+            pruned INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _migration_17_keyword_hit_ms(conn):
+    """Keyword hit times in epoch milliseconds like every other timestamp column."""
+    # Hits saved so far carry epoch seconds
+    conn.execute('UPDATE keyword_hits SET created_at = created_at * 1000 WHERE created_at < 100000000000')
+
+
+# Ordered list of (version, migration). Append new entries; never edit old ones.
+MIGRATIONS = [
+    (1, _migration_1_recordings),
+    (2, _migration_2_listing_indexes),
+    (3, _migration_3_change_log),
+    (4, _migration_4_file_presence),
+    (5, _migration_5_transcription_fts),
+    (6, _migration_6_keyword_hits),
+    (7, _migration_7_epoch_ms_columns),
+    (8, _migration_8_unique_channel_filename),
+    (9, _migration_9_traffic_rollups),
+    (10, _migration_10_rollup_hold),
+    (11, _migration_11_wav_index),
+    (12, _migration_12_recording_peaks),
+    (13, _migration_13_audio_metrics),
+    (14, _migration_14_upload_sessions),
+    (15, _migration_15_content_hash),
+    (16, _migration_16_change_log_checkpoints),
+    (17, _migration_17_keyword_hit_ms),
+]
+
+
+# ---------------------------------------------------------------------------
+# Config database migrations (schema "config", see CONFIG_DB_PATH)
+# ---------------------------------------------------------------------------
+
+# Record stores keyed by an integer id (kept inside the record) or by name
+CONFIG_RECORD_STORES = {
+    'channels': 'id',
+    'frequencies': 'id',
+    'users': 'email',
+    'scanners': 'name',
+    'devices': 'mac',
+}
+# Stores holding one flat object, one row per top-level key
+CONFIG_VALUE_STORES = ('settings', 'branding')
+# Files imported by config migration 1
+CONFIG_JSON_PATHS = {
+    'channels': os.path.join('db', 'channels.json'),
+    'frequencies': os.path.join('db', 'frequencies.json'),
+    'users': os.path.join('db', 'users.json'),
+    'scanners': os.path.join('db', 'scanner_inventory.json'),
+    'settings': SETTINGS_JSON_PATH,
+    'branding': os.path.join('db', 'branding.json'),
+}
+
+
+def _config_migration_1_stores(conn):
+    """Config store tables, imported from the JSON files"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config.config_versions (
+            store TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config.channels (
+            id INTEGER PRIMARY KEY,
+            mac TEXT,
+            data TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS config.idx_channels_mac ON channels(mac)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config.frequencies (
+            id INTEGER PRIMARY KEY,
+            data TEXT NOT NULL
+        )
+    ''')
+    for store, key in (('users', 'email'), ('scanners', 'name')):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS config.{store} (
+                {key} TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    for store in CONFIG_VALUE_STORES:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS config.{store} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    for store in ('channels', 'frequencies', 'users', 'scanners') + CONFIG_VALUE_STORES:
+        _create_version_triggers(conn, store)
+
+    _import_json_config()
+
+
+def _config_migration_2_devices(conn):
+    """Device presence table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS config.devices (
+            mac TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    _create_version_triggers(conn, 'devices')
+
+
+def _create_version_triggers(conn, store):
+    # Every write bumps the store's version, which readers in this and other
+    # processes poll to invalidate their caches
+    conn.execute('INSERT OR IGNORE INTO config.config_versions (store) VALUES (?)', (store,))
+    for op in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS config.{store}_{op.lower()}_version
+            AFTER {op} ON {store}
+            BEGIN
+                UPDATE config_versions SET version = version + 1 WHERE store = '{store}';
+            END
+        ''')
+
+
+def _import_json_config():
+    """One-time import of the JSON config files (which are left in place)."""
+    for store, path in CONFIG_JSON_PATHS.items():
+        if not os.path.exists(path) and not os.path.exists(path + '.bak'):
+            continue
+        try:
+            data = load_json_file(path)
+        except Exception as e:
+            error_logger.error(f"Skipping import of unreadable {path}: {str(e)}")
+            continue
+        if not data:
+            continue
+
+        if store in CONFIG_VALUE_STORES:
+            set_config_values(store, data)
+        elif CONFIG_RECORD_STORES[store] == 'id':
+            for record in data:
+                save_config_record(store, record)
+        else:
+            for key, record in data.items():
+                save_config_record(store, record, key=key)
+        db_logger.info(f"Imported {path} into the config database")
+
+
+CONFIG_MIGRATIONS = [
+    (1, _config_migration_1_stores),
+    (2, _config_migration_2_devices),
+]
+
+
+def _apply_migrations(conn, migrations, schema):
+    current = conn.execute(f'PRAGMA {schema}.user_version').fetchone()[0]
+    for version, migration in migrations:
+        if version <= current:
+            continue
+        try:
+            with transaction():
+                # Another process (run.py and upload_service both migrate at
+                # startup) may have applied it before we got the write lock
+                current = conn.execute(f'PRAGMA {schema}.user_version').fetchone()[0]
+                if version <= current:
+                    continue
+                migration(conn)
+                conn.execute(f'PRAGMA {schema}.user_version={version}')
+            db_logger.info(f"Applied {schema} database migration {version}: {migration.__doc__.strip()}")
+        except Exception as e:
+            error_logger.error(f"{schema.capitalize()} database migration {version} failed: {str(e)}")
+            raise
+    return conn.execute(f'PRAGMA {schema}.user_version').fetchone()[0]
+
+
+def run_migrations():
+    """Bring both database schemas up to the latest version recorded in user_version."""
+    conn = get_connection()
+    _apply_migrations(conn, CONFIG_MIGRATIONS, 'config')
+    return _apply_migrations(conn, MIGRATIONS, 'main')
+
+
+# ---------------------------------------------------------------------------
+# Recordings repository
+# ---------------------------------------------------------------------------
+
+SQL_FIND_RECORDING = '''
+    SELECT id FROM recordings
+    WHERE channel_id = ? AND filename = ?
+'''
+SQL_UPSERT_RECORDING = '''
+    INSERT INTO recordings (channel_id, filename, timestamp, transcription,
+                            captured_at_ms, received_at_ms, duration_ms, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(channel_id, filename) DO UPDATE SET
+        timestamp = excluded.timestamp,
+        transcription = excluded.transcription,
+        captured_at_ms = COALESCE(recordings.captured_at_ms, excluded.captured_at_ms),
+        received_at_ms = COALESCE(recordings.received_at_ms, excluded.received_at_ms),
+        duration_ms = COALESCE(recordings.duration_ms, excluded.duration_ms),
+        content_hash = COALESCE(recordings.content_hash, excluded.content_hash)
+'''
+SQL_INSERT_QUEUED_RECORDING = '''
+    INSERT INTO recordings (channel_id, filename, timestamp, status,
+                            captured_at_ms, received_at_ms, duration_ms, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(channel_id, filename) DO NOTHING
+'''
+SQL_FIND_DUPLICATE = '''
+    SELECT id, filename FROM recordings
+    WHERE channel_id = ? AND content_hash = ? AND filename != ?
+      AND transcription IS NOT NULL
+      AND COALESCE(received_at_ms, captured_at_ms) >= ?
+    ORDER BY id DESC LIMIT 1
+'''
+SQL_DELETE_QUEUED_RECORDING = '''
+    DELETE FROM recordings
+    WHERE channel_id = ? AND filename = ? AND transcription IS NULL
+'''
+SQL_UPDATE_STATUS = '''
+    UPDATE recordings SET status = ? WHERE filename = ?
+'''
+SQL_CHANNEL_RECORDINGS = '''
+    SELECT id, channel_id, filename, timestamp, transcription
+    FROM recordings
+    WHERE channel_id = ? AND file_present = 1
+    ORDER BY timestamp DESC
+'''
+SQL_LIST_COLUMNS = '''
+    SELECT id, channel_id, filename, timestamp, transcription, status,
+           captured_at_ms, received_at_ms, duration_ms,
+           rms_dbfs, peak_dbfs, clipping_ratio, snr_db, speech_ratio
+    FROM recordings
+'''
+# Transcriptions the hallucination filter treats as empty
+HALLUCINATION_PLACEHOLDERS = ('...', '.')
+SQL_GET_RECORDING = '''
+    SELECT id, channel_id, filename, timestamp, transcription, status
+    FROM recordings
+    WHERE id = ?
+'''
+SQL_DELETE_KEYWORD_HITS = 'DELETE FROM keyword_hits WHERE recording_id = ?'
+SQL_INSERT_KEYWORD_HIT = '''
+    INSERT INTO keyword_hits (recording_id, channel_id, keyword, created_at)
+    VALUES (?, ?, ?, ?)
+'''
+SQL_SAVE_PEAKS = '''
+    INSERT INTO recording_peaks (recording_id, sample_rate, samples_per_peak, peaks)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(recording_id) DO UPDATE SET
+        sample_rate = excluded.sample_rate,
+        samples_per_peak = excluded.samples_per_peak,
+        peaks = excluded.peaks
+'''
+SQL_GET_PEAKS = '''
+    SELECT recording_id, sample_rate, samples_per_peak, peaks
+    FROM recording_peaks WHERE recording_id IN ({ids})
+'''
+SQL_SAVE_METRICS = '''
+    UPDATE recordings
+    SET duration_ms = COALESCE(duration_ms, ?),
+        rms_dbfs = ?, peak_dbfs = ?, clipping_ratio = ?, snr_db = ?, speech_ratio = ?
+    WHERE id = ?
+'''
+SQL_DELETE_RECORDING = 'DELETE FROM recordings WHERE id = ?'
+SQL_TRUNCATE_RECORDINGS = 'DELETE FROM recordings'
+
+
+def save_recording(channel_id, filename, timestamp, transcription, keywords=(),
+                   captured_at_ms=None, received_at_ms=None, duration_ms=None, analysis=None,
+                   content_hash=None):
+    """
+    Insert or update the transcription for a recording.
+
+    Args:
+        keywords (iterable): Alert keywords matched in the transcription;
+            replaces any hits stored for an earlier transcription
+        captured_at_ms (int): Device capture time in epoch milliseconds
+        received_at_ms (int): Server receive time in epoch milliseconds
+        duration_ms (int): Audio duration; the three only fill in values the
+            row does not already have
+        analysis (dict): Ingest-time analysis from audio_analysis.analyze_clip
+        content_hash (str): SHA-256 of the clip, for upload deduplication
+
+    Returns:
+        int: The recording id
+    """
+    with transaction() as conn:
+        conn.execute(
+            SQL_UPSERT_RECORDING,
+            (channel_id, filename, timestamp, transcription,
+             captured_at_ms, received_at_ms, duration_ms, content_hash)
+        )
+        # RETURNING needs SQLite 3.35; the unique key makes this lookup cheap
+        recording_id = conn.execute(SQL_FIND_RECORDING, (channel_id, filename)).fetchone()['id']
+        conn.execute(SQL_DELETE_KEYWORD_HITS, (recording_id,))
+        if keywords:
+            now = now_ms()
+            conn.executemany(
+                SQL_INSERT_KEYWORD_HIT,
+                [(recording_id, channel_id, keyword, now) for keyword in keywords]
+            )
+        if analysis:
+            _save_peaks(conn, recording_id, analysis)
+            if analysis.get('metrics'):
+                metrics = analysis['metrics']
+                conn.execute(SQL_SAVE_METRICS, (
+                    metrics['duration_ms'], *(metrics[c] for c in METRIC_COLUMNS), recording_id
+                ))
+        return recording_id
+
+
+def _save_peaks(conn, recording_id, analysis):
+    conn.execute(SQL_SAVE_PEAKS, (
+        recording_id, analysis['sample_rate'], analysis['samples_per_peak'], analysis['peaks']
+    ))
+
+
+def save_peaks(recording_id, analysis):
+    """Store waveform peaks computed after the recording was saved."""
+    with transaction() as conn:
+        _save_peaks(conn, recording_id, analysis)
+
+
+def get_peaks(recording_ids):
+    """
+    Return stored waveform peaks.
+
+    Returns:
+        dict: recording id -> dict with sample_rate, samples_per_peak and
+        peaks (bytes); recordings without peaks are absent
+    """
+    ids = [int(rid) for rid in recording_ids]
+    if not ids:
+        return {}
+    sql = SQL_GET_PEAKS.format(ids=', '.join('?' * len(ids)))
+    return {row['recording_id']: dict(row) for row in get_connection().execute(sql, ids)}
+
+
+def insert_queued_recording(channel_id, filename, timestamp, captured_at_ms=None, received_at_ms=None,
+                            duration_ms=None, status='queued', content_hash=None):
+    """Insert a placeholder row for an upload awaiting transcription, unless one exists."""
+    with transaction() as conn:
+        conn.execute(
+            SQL_INSERT_QUEUED_RECORDING,
+            (channel_id, filename, timestamp, status, captured_at_ms, received_at_ms, duration_ms, content_hash)
+        )
+        return conn.execute(SQL_FIND_RECORDING, (channel_id, filename)).fetchone()['id']
+
+
+def find_duplicate_recording(channel_id, content_hash, since_ms, exclude_filename=''):
+    """
+    Find a recent, transcribed recording of the same clip on a channel.
+
+    Placeholder rows of clips still queued (or whose transcription failed)
+    never match, so a clip that failed can be sent again.
+
+    Args:
+        channel_id (int): The channel
+        content_hash (str): SHA-256 of the clip
+        since_ms (int): Only recordings received at or after this time count
+        exclude_filename (str): The clip's own row, if it already has one
+
+    Returns:
+        dict or None: id and filename of the newest match
+    """
+    row = get_connection().execute(
+        SQL_FIND_DUPLICATE, (channel_id, content_hash, exclude_filename, since_ms)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def delete_queued_recording(channel_id, filename):
+    """Delete a placeholder row that was never transcribed; returns True if one existed."""
+    with transaction() as conn:
+        return conn.execute(SQL_DELETE_QUEUED_RECORDING, (channel_id, filename)).rowcount > 0
+
+
+def update_recording_status(filename, status):
+    """Set the processing status for a recording identified by its stored path."""
+    with transaction() as conn:
+        conn.execute(SQL_UPDATE_STATUS, (status, filename))
+
+
+def get_channel_recordings(channel_id):
+    """Return the recordings for one channel whose audio file is present, newest first."""
+    rows = get_connection().execute(SQL_CHANNEL_RECORDINGS, (channel_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def query_recordings(limit, before_id=None, after_id=None, channel_id=None,
+                     start=None, end=None, statuses=None, hide_hallucinations=False,
+                     metric_ranges=None):
+    """
+    Return one page of recordings, newest first, using id as a keyset cursor.
+
+    Args:
+        limit (int): Maximum number of rows to return
+        before_id (int): Only rows with a smaller id (older page)
+        after_id (int): Only rows with a larger id (newer page)
+        channel_id (int): Restrict to one channel
+        start (str): Inclusive lower bound on timestamp (YYYYmmdd_HHMMSS)
+        end (str): Inclusive upper bound on timestamp (YYYYmmdd_HHMMSS)
+        statuses (list): Restrict to these status values
+        hide_hallucinations (bool): Drop rows whose transcription is a placeholder
+        metric_ranges (dict): Metric column -> (min, max), either bound may be None
+
+    Returns:
+        list: Recording dicts ordered by id descending
+    """
+    clauses = []
+    params = []
+    if before_id is not None:
+        clauses.append('id < ?')
+        params.append(before_id)
+    if after_id is not None:
+        clauses.append('id > ?')
+        params.append(after_id)
+    if channel_id is not None:
+        clauses.append('channel_id = ?')
+        params.append(channel_id)
+    if start:
+        clauses.append('timestamp >= ?')
+        params.append(start)
+    if end:
+        clauses.append('timestamp <= ?')
+        params.append(end)
+    if statuses:
+        clauses.append(f"status IN ({', '.join('?' for _ in statuses)})")
+        params.extend(statuses)
+    if hide_hallucinations:
+        placeholders = ', '.join('?' for _ in HALLUCINATION_PLACEHOLDERS)
+        clauses.append(f'(transcription IS NULL OR transcription NOT IN ({placeholders}))')
+        params.extend(HALLUCINATION_PLACEHOLDERS)
+    for column, (low, high) in (metric_ranges or {}).items():
+        if column not in METRIC_COLUMNS:
+            raise ValueError(f"Unknown metric: {column}")
+        if low is not None:
+            clauses.append(f'{column} >= ?')
+            params.append(low)
+        if high is not None:
+            clauses.append(f'{column} <= ?')
+            params.append(high)
+
+    sql = SQL_LIST_COLUMNS
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    # Paging forward walks up from the cursor, then flips to newest-first
+    sql += ' ORDER BY id ASC' if after_id is not None else ' ORDER BY id DESC'
+    sql += ' LIMIT ?'
+    params.append(limit)
+
+    rows = [dict(row) for row in get_connection().execute(sql, params)]
+    if after_id is not None:
+        rows.reverse()
+    return rows
+
+
+def get_recording(recording_id):
+    """Return a single recording as a dict, or None if it does not exist."""
+    row = get_connection().execute(SQL_GET_RECORDING, (recording_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def delete_recording(recording_id):
+    """
+    Delete a recording row.
+
+    Returns:
+        dict or None: The deleted row, or None if it did not exist
+    """
+    with transaction() as conn:
+        row = conn.execute(SQL_GET_RECORDING, (recording_id,)).fetchone()
+        if not row:
+            return None
+        conn.execute(SQL_DELETE_RECORDING, (recording_id,))
+        return dict(row)
+
+
+def delete_recordings(recording_ids, keep_rollups=False):
+    """
+    Delete several recording rows in one transaction.
+
+    Args:
+        keep_rollups (bool): Leave the traffic rollups as they are, so pruned
+            recordings still count towards historical statistics
+    """
+    with transaction() as conn:
+        if keep_rollups:
+            conn.execute('INSERT OR IGNORE INTO rollup_hold (id) VALUES (1)')
+        conn.executemany(SQL_DELETE_RECORDING, [(rid,) for rid in recording_ids])
+        if keep_rollups:
+            conn.execute('DELETE FROM rollup_hold')
+
+
+def truncate_recordings():
+    """
+    Delete every row from the recordings table.
+
+    Returns:
+        list: Stored filenames of the deleted rows, so their audio can be removed
+    """
+    with transaction() as conn:
+        filenames = [row[0] for row in conn.execute('SELECT filename FROM recordings')]
+        conn.execute(SQL_TRUNCATE_RECORDINGS)
+        return filenames
+
+
+# ---------------------------------------------------------------------------
+# Retention
+# ---------------------------------------------------------------------------
+
+SQL_RETENTION_COLUMNS = '''
+    SELECT id, channel_id, filename, timestamp, transcription, status,
+           captured_at_ms, received_at_ms, duration_ms, file_size
+    FROM recordings
+'''
+
+
+def get_recordings_older_than(channel_id, before_ms, limit):
+    """Return up to limit rows of a channel captured before before_ms, oldest first."""
+    sql = SQL_RETENTION_COLUMNS + '''
+        WHERE channel_id = ? AND captured_at_ms < ?
+        ORDER BY captured_at_ms LIMIT ?
+    '''
+    return [dict(row) for row in get_connection().execute(sql, (channel_id, before_ms, limit))]
+
+
+def get_recordings_beyond_count(channel_id, keep, limit):
+    """Return up to limit of a channel's rows beyond its newest keep, oldest first."""
+    sql = SQL_RETENTION_COLUMNS + '''
+        WHERE channel_id = ? AND id < (
+            SELECT id FROM recordings WHERE channel_id = ?
+            ORDER BY id DESC LIMIT 1 OFFSET ?
+        )
+        ORDER BY id LIMIT ?
+    '''
+    return [dict(row) for row in get_connection().execute(sql, (channel_id, channel_id, keep - 1, limit))]
+
+
+def get_oldest_recordings(limit, exclude_channel_ids=()):
+    """Return the oldest rows across channels, skipping the excluded channels."""
+    exclude = list(exclude_channel_ids)
+    sql = SQL_RETENTION_COLUMNS
+    if exclude:
+        sql += f" WHERE channel_id NOT IN ({', '.join('?' * len(exclude))})"
+    sql += ' ORDER BY id LIMIT ?'
+    return [dict(row) for row in get_connection().execute(sql, exclude + [limit])]
+
+
+def enable_incremental_vacuum():
+    """
+    Switch the database to auto_vacuum=INCREMENTAL.
+
+    Existing databases need one full VACUUM for the change to take effect.
+
+    Returns:
+        bool: True if a VACUUM was run
+    """
+    conn = get_connection()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
+
+
+def incremental_vacuum(max_pages):
+    """
+    Return up to max_pages free pages to the filesystem.
+
+    Returns:
+        int: Bytes released
+    """
+    conn = get_connection()
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # incremental_vacuum returns a row per freed page; drain it
+    conn.execute(f'PRAGMA incremental_vacuum({int(max_pages)})').fetchall()
+    after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return (before - after) * page_size
+
+
+# ---------------------------------------------------------------------------
+# Audio metrics
+# ---------------------------------------------------------------------------
+
+SQL_CHANNEL_METRICS = '''
+    SELECT COUNT(*) AS recordings,
+           AVG(rms_dbfs) AS rms_dbfs, AVG(peak_dbfs) AS peak_dbfs,
+           MAX(peak_dbfs) AS max_peak_dbfs, AVG(clipping_ratio) AS clipping_ratio,
+           AVG(snr_db) AS snr_db, AVG(speech_ratio) AS speech_ratio
+    FROM (
+        SELECT rms_dbfs, peak_dbfs, clipping_ratio, snr_db, speech_ratio
+        FROM recordings
+        WHERE channel_id = ? AND rms_dbfs IS NOT NULL
+        ORDER BY id DESC LIMIT ?
+    )
+'''
+
+
+def get_channel_metrics(channel_id, sample_size):
+    """Average the signal metrics of a channel's latest sample_size analyzed recordings."""
+    return dict(get_connection().execute(SQL_CHANNEL_METRICS, (channel_id, sample_size)).fetchone())
+
+
+# ---------------------------------------------------------------------------
+# Audio archive
+# ---------------------------------------------------------------------------
+
+SQL_WAV_RECORDINGS = '''
+    SELECT id, channel_id, filename
+    FROM recordings
+    WHERE filename LIKE '%.wav' AND id > ?
+      AND file_present = 1 AND transcription IS NOT NULL
+      AND COALESCE(received_at_ms, captured_at_ms) < ?
+    ORDER BY id LIMIT ?
+'''
+SQL_SET_RECORDING_FILE = '''
+    UPDATE recordings SET filename = ?, file_size = ?
+    WHERE id = ? AND filename = ?
+'''
+
+
+def get_wav_recordings(received_before_ms, after_id, limit):
+    """Return transcribed WAV recordings received before the cutoff, by id."""
+    return [dict(row) for row in get_connection().execute(
+        SQL_WAV_RECORDINGS, (after_id, received_before_ms, limit))]
+
+
+def set_recording_file(recording_id, old_filename, new_filename, file_size):
+    """
+    Point a recording at a new audio file, if it still points at old_filename.
+
+    Returns:
+        bool: True if the row was updated
+    """
+    with transaction() as conn:
+        cursor = conn.execute(SQL_SET_RECORDING_FILE, (new_filename, file_size, recording_id, old_filename))
+        return cursor.rowcount == 1
+
+
+# ---------------------------------------------------------------------------
+# Upload sessions
+# ---------------------------------------------------------------------------
+
+SQL_INSERT_UPLOAD_SESSION = '''
+    INSERT INTO upload_sessions (id, channel_id, mac, size, captured_at_ms, created_at_ms)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def create_upload_session(session_id, channel_id, mac, size, captured_at_ms, created_at_ms):
+    """Record a new resumable upload session."""
+    with transaction() as conn:
+        conn.execute(SQL_INSERT_UPLOAD_SESSION, (session_id, channel_id, mac, size, captured_at_ms, created_at_ms))
+
+
+def get_upload_session(session_id):
+    """Return an upload session, or None."""
+    row = get_connection().execute('SELECT * FROM upload_sessions WHERE id = ?', (session_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_upload_sessions():
+    """Return every upload session."""
+    return [dict(row) for row in get_connection().execute('SELECT * FROM upload_sessions ORDER BY id')]
+
+
+def delete_upload_session(session_id):
+    """Delete an upload session; returns True if it existed."""
+    with transaction() as conn:
+        return conn.execute('DELETE FROM upload_sessions WHERE id = ?', (session_id,)).rowcount > 0
+
+
+# ---------------------------------------------------------------------------
+# Change log (delta sync)
+# ---------------------------------------------------------------------------
+
+SQL_RECORD_CHANGE = '''
+    INSERT OR REPLACE INTO change_log (entity, entity_id, op)
+    VALUES (?, ?, ?)
+'''
+# Pruning may empty the log, but the version never goes back below the floor
+SQL_CURRENT_CHANGE_VERSION = '''
+    SELECT MAX(
+        (SELECT COALESCE(MAX(version), 0) FROM change_log),
+        (SELECT COALESCE(MAX(version), 0) FROM change_log_checkpoints WHERE pruned = 1)
+    )
+'''
+SQL_CHANGES_SINCE = '''
+    SELECT version, entity, entity_id, op
+    FROM change_log
+    WHERE version > ?
+    ORDER BY version ASC
+    LIMIT ?
+'''
+SQL_RECORDINGS_BY_IDS = SQL_LIST_COLUMNS + ' WHERE id IN ({ids}) ORDER BY id DESC'
+SQL_CHANGE_FLOOR = 'SELECT COALESCE(MAX(version), 0) FROM change_log_checkpoints WHERE pruned = 1'
+SQL_ADD_CHECKPOINT = '''
+    INSERT OR IGNORE INTO change_log_checkpoints (version, created_at_ms)
+    VALUES (?, ?)
+'''
+SQL_CHECKPOINT_BEFORE = '''
+    SELECT MAX(version) FROM change_log_checkpoints WHERE created_at_ms <= ?
+'''
+SQL_PRUNE_DELETED_CHANGES = "DELETE FROM change_log WHERE op = 'delete' AND version <= ?"
+SQL_MARK_CHECKPOINT_PRUNED = 'UPDATE change_log_checkpoints SET pruned = 1 WHERE version = ?'
+SQL_DROP_OLD_CHECKPOINTS = 'DELETE FROM change_log_checkpoints WHERE version < ?'
+
+
+def record_change(entity, entity_id='*', op='upsert'):
+    """
+    Bump the change version for a non-recording entity (channel, settings, ...).
+
+    Recording changes are logged by triggers and never need this call.
+    """
+    with transaction() as conn:
+        conn.execute(SQL_RECORD_CHANGE, (entity, str(entity_id), op))
+
+
+def get_change_version():
+    """Return the latest change version, or 0 if nothing has been logged."""
+    return get_connection().execute(SQL_CURRENT_CHANGE_VERSION).fetchone()[0]
+
+
+def get_changes_since(since, limit):
+    """Return up to limit change_log rows newer than since, oldest first."""
+    rows = get_connection().execute(SQL_CHANGES_SINCE, (since, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def get_change_floor():
+    """
+    Return the oldest change version a delta sync can start from.
+
+    Delete entries at or below it may have been pruned, so clients with an
+    older cursor need a full snapshot. 0 until anything was pruned.
+    """
+    return get_connection().execute(SQL_CHANGE_FLOOR).fetchone()[0]
+
+
+def prune_change_log(max_age_ms):
+    """
+    Drop delete entries no client cursor can still need.
+
+    Each call checkpoints the current change version. Delete entries up to
+    the newest checkpoint older than max_age_ms are removed and that
+    checkpoint becomes the floor returned by get_change_floor(), so a
+    client that has not synced for max_age_ms falls back to a full sync.
+
+    Returns:
+        int: Change log entries removed
+    """
+    now = now_ms()
+    with transaction() as conn:
+        version = conn.execute(SQL_CURRENT_CHANGE_VERSION).fetchone()[0]
+        conn.execute(SQL_ADD_CHECKPOINT, (version, now))
+        cutoff = conn.execute(SQL_CHECKPOINT_BEFORE, (now - max_age_ms,)).fetchone()[0]
+        if cutoff is None or cutoff <= conn.execute(SQL_CHANGE_FLOOR).fetchone()[0]:
+            return 0
+        removed = conn.execute(SQL_PRUNE_DELETED_CHANGES, (cutoff,)).rowcount
+        conn.execute(SQL_MARK_CHECKPOINT_PRUNED, (cutoff,))
+        conn.execute(SQL_DROP_OLD_CHECKPOINTS, (cutoff,))
+        return removed
+
+
+def get_recordings_by_ids(recording_ids):
+    """Return the current rows for the given recording ids, newest first."""
+    if not recording_ids:
+        return []
+    sql = SQL_RECORDINGS_BY_IDS.format(ids=', '.join('?' for _ in recording_ids))
+    return [dict(row) for row in get_connection().execute(sql, list(recording_ids))]
+
+
+# ---------------------------------------------------------------------------
+# File presence (filesystem reconciler)
+# ---------------------------------------------------------------------------
+
+SQL_RECORDING_CHANNEL_IDS = 'SELECT DISTINCT channel_id FROM recordings'
+SQL_CHANNEL_FILE_STATES = '''
+    SELECT id, filename, file_present, file_size, duration_ms
+    FROM recordings
+    WHERE channel_id = ?
+'''
+SQL_MARK_FILE_PRESENT = '''
+    UPDATE recordings
+    SET file_present = 1, file_size = ?, missing_since = NULL,
+        duration_ms = COALESCE(duration_ms, ?)
+    WHERE id = ?
+'''
+SQL_MARK_FILE_MISSING = '''
+    UPDATE recordings
+    SET file_present = 0, missing_since = ?
+    WHERE id = ? AND file_present = 1
+'''
+SQL_MISSING_RECORDING_IDS = '''
+    SELECT id FROM recordings
+    WHERE file_present = 0 AND missing_since < ?
+    LIMIT ?
+'''
+
+
+def get_recording_channel_ids():
+    """Return every channel id that has at least one recording row."""
+    return [row[0] for row in get_connection().execute(SQL_RECORDING_CHANNEL_IDS)]
+
+
+def get_channel_file_states(channel_id):
+    """Return id, filename, file_present, file_size and duration_ms for every row of a channel."""
+    return [dict(row) for row in get_connection().execute(SQL_CHANNEL_FILE_STATES, (channel_id,))]
+
+
+def mark_files_present(size_by_id):
+    """
+    Flag rows as having their file on disk.
+
+    size_by_id is a list of (file_size, duration_ms, id); duration_ms only
+    fills in a missing value.
+    """
+    with transaction() as conn:
+        conn.executemany(SQL_MARK_FILE_PRESENT, size_by_id)
+
+
+def mark_files_missing(recording_ids, missing_since):
+    """Flag rows whose file has disappeared, keeping the first time it was noticed."""
+    with transaction() as conn:
+        conn.executemany(SQL_MARK_FILE_MISSING, [(missing_since, rid) for rid in recording_ids])
+
+
+def get_missing_recording_ids(missing_before, limit):
+    """Return ids of rows whose file has been missing since before missing_before."""
+    return [row[0] for row in get_connection().execute(SQL_MISSING_RECORDING_IDS, (missing_before, limit))]
+
+
+# ---------------------------------------------------------------------------
+# Full-text search
+# ---------------------------------------------------------------------------
+
+SQL_SEARCH_RECORDINGS = '''
+    SELECT r.id, r.channel_id, r.filename, r.timestamp, r.transcription, r.status,
+           snippet(recordings_fts, 0, '<mark>', '</mark>', '...', 12) AS snippet,
+           bm25(recordings_fts) AS rank
+    FROM recordings_fts
+    JOIN recordings r ON r.id = recordings_fts.rowid
+    WHERE recordings_fts MATCH ?
+'''
+
+# A quoted phrase, or a bare term with an optional trailing * for prefix search
+_FTS_TOKEN_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def build_fts_query(text):
+    """
+    Turn user input into a safe FTS5 query.
+
+    "quoted text" becomes a phrase, term* a prefix match, and every other
+    term is quoted so punctuation can never produce FTS5 syntax errors.
+    All parts must match.
+
+    Returns:
+        str or None: The MATCH expression, or None if nothing searchable remains
+    """
+    parts = []
+    for phrase, term in _FTS_TOKEN_PATTERN.findall(text or ''):
+        if phrase:
+            # Pure punctuation tokenizes to nothing and would match no rows
+            if any(c.isalnum() for c in phrase):
+                parts.append(f'"{phrase}"')
+            continue
+        prefix = term.endswith('*')
+        term = term.rstrip('*').replace('"', '')
+        if any(c.isalnum() for c in term):
+            parts.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' AND '.join(parts) if parts else None
+
+
+def search_recordings(query, limit, offset=0, channel_id=None, start=None, end=None):
+    """
+    Full-text search over transcriptions, best BM25 match first.
+
+    Args:
+        query (str): User query (phrases in quotes, prefix with trailing *)
+        limit (int): Maximum number of results
+        offset (int): Results to skip, for paging
+        channel_id (int): Restrict to one channel
+        start (str): Inclusive lower bound on timestamp (YYYYmmdd_HHMMSS)
+        end (str): Inclusive upper bound on timestamp (YYYYmmdd_HHMMSS)
+
+    Returns:
+        list: Recording dicts with snippet and rank fields
+    """
+    match = build_fts_query(query)
+    if not match:
+        return []
+    sql = SQL_SEARCH_RECORDINGS
+    params = [match]
+    if channel_id is not None:
+        sql += ' AND r.channel_id = ?'
+        params.append(channel_id)
+    if start:
+        sql += ' AND r.timestamp >= ?'
+        params.append(start)
+    if end:
+        sql += ' AND r.timestamp <= ?'
+        params.append(end)
+    sql += ' ORDER BY rank LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+    return [dict(row) for row in get_connection().execute(sql, params)]
+
+
+# ---------------------------------------------------------------------------
+# Keyword alerts
+# ---------------------------------------------------------------------------
+
+SQL_LIST_ALERTS = '''
+    SELECT h.id, h.recording_id, h.channel_id, h.keyword, h.created_at,
+           r.filename, r.timestamp, r.transcription
+    FROM keyword_hits h
+    JOIN recordings r ON r.id = h.recording_id
+'''
+
+
+def query_alerts(limit, before_id=None, channel_id=None, keyword=None):
+    """
+    Return keyword hits joined with their recording, newest first.
+
+    Args:
+        limit (int): Maximum number of hits
+        before_id (int): Keyset cursor, only hits with a smaller id
+        channel_id (int): Restrict to one channel
+        keyword (str): Restrict to one keyword
+    """
+    clauses = []
+    params = []
+    if before_id is not None:
+        clauses.append('h.id < ?')
+        params.append(before_id)
+    if channel_id is not None:
+        clauses.append('h.channel_id = ?')
+        params.append(channel_id)
+    if keyword:
+        clauses.append('h.keyword = ?')
+        params.append(keyword)
+    sql = SQL_LIST_ALERTS
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY h.id DESC LIMIT ?'
+    params.append(limit)
+    return [dict(row) for row in get_connection().execute(sql, params)]
+
+
+# ---------------------------------------------------------------------------
+# Traffic rollups
+# ---------------------------------------------------------------------------
+
+SQL_ROLLUPS = '''
+    SELECT bucket_ms, channel_id, messages, airtime_ms, pending
+    FROM recording_rollups
+    WHERE period = ? AND bucket_ms >= ? AND bucket_ms < ?
+'''
+
+
+def get_rollups(period, start_ms, end_ms, channel_id=None):
+    """
+    Return traffic rollup rows for a time range, oldest bucket first.
+
+    Args:
+        period (str): 'minute', 'hour' or 'day'
+        start_ms (int): Inclusive start, epoch milliseconds
+        end_ms (int): Exclusive end, epoch milliseconds
+        channel_id (int): Restrict to one channel
+
+    Returns:
+        list: One dict per (bucket, channel) with messages, airtime_ms and
+        pending (recordings still awaiting a transcription)
+    """
+    sql = SQL_ROLLUPS
+    params = [period, start_ms, end_ms]
+    if channel_id is not None:
+        sql += ' AND channel_id = ?'
+        params.append(channel_id)
+    sql += ' ORDER BY bucket_ms, channel_id'
+    return [dict(row) for row in get_connection().execute(sql, params)]
+
+
+# ---------------------------------------------------------------------------
+# Config stores
+# ---------------------------------------------------------------------------
+
+SQL_CONFIG_VERSIONS = 'SELECT store, version FROM config.config_versions'
+SQL_CONFIG_VERSION = 'SELECT version FROM config.config_versions WHERE store = ?'
+
+
+def _record_key(store):
+    if store not in CONFIG_RECORD_STORES:
+        raise ValueError(f"Unknown config record store: {store}")
+    return CONFIG_RECORD_STORES[store]
+
+
+def _load_record(key_column, row):
+    record = json.loads(row['data'])
+    if key_column == 'id':
+        record['id'] = row['id']
+    return record
+
+
+def get_config_version(store):
+    """Return a counter that changes on every write to the store."""
+    row = get_connection().execute(SQL_CONFIG_VERSION, (store,)).fetchone()
+    return row[0] if row else 0
+
+
+def get_config_versions():
+    """Return {store: version} for every config store."""
+    return {row[0]: row[1] for row in get_connection().execute(SQL_CONFIG_VERSIONS)}
+
+
+def get_config_records(store):
+    """
+    Return every record of a record store.
+
+    Returns:
+        dict: {key: record} ordered by key; records of id-keyed stores
+        (channels, frequencies) carry their id
+    """
+    key_column = _record_key(store)
+    rows = get_connection().execute(f'SELECT {key_column}, data FROM config.{store} ORDER BY {key_column}')
+    return {row[0]: _load_record(key_column, row) for row in rows}
+
+
+def get_config_record(store, key):
+    """Return one record, or None."""
+    key_column = _record_key(store)
+    row = get_connection().execute(
+        f'SELECT {key_column}, data FROM config.{store} WHERE {key_column} = ?', (key,)
+    ).fetchone()
+    return _load_record(key_column, row) if row else None
+
+
+def save_config_record(store, record, key=None):
+    """
+    Insert or update one record; rewriting identical data is a no-op.
+
+    Args:
+        store (str): One of CONFIG_RECORD_STORES
+        record (dict): The record; for id-keyed stores the key is record['id']
+            and a record without one gets the next free id
+        key (str): The key of name-keyed stores (users, scanners, devices)
+
+    Returns:
+        The record's key
+    """
+    key_column = _record_key(store)
+    if key_column == 'id':
+        key = record.get('id')
+        record = {k: v for k, v in record.items() if k != 'id'}
+    elif key is None:
+        raise ValueError(f"A key is required for {store} records")
+
+    columns = {'data': json.dumps(record, sort_keys=True)}
+    if store == 'channels':
+        columns['mac'] = str(record.get('mac') or '').strip().upper() or None
+    if key is not None:
+        columns = dict({key_column: key}, **columns)
+
+    names = ', '.join(columns)
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f'{name} = excluded.{name}' for name in columns if name != key_column)
+    with transaction() as conn:
+        cursor = conn.execute(
+            f'''
+            INSERT INTO config.{store} ({names}) VALUES ({placeholders})
+            ON CONFLICT({key_column}) DO UPDATE SET {updates} WHERE data IS NOT excluded.data
+            ''',
+            list(columns.values())
+        )
+    return key if key is not None else cursor.lastrowid
+
+
+def delete_config_record(store, key):
+    """Delete one record; returns True if it existed."""
+    key_column = _record_key(store)
+    with transaction() as conn:
+        return conn.execute(f'DELETE FROM config.{store} WHERE {key_column} = ?', (key,)).rowcount > 0
+
+
+def replace_config_records(store, records):
+    """
+    Make a record store hold exactly records ({key: record}).
+
+    Only rows that were added, changed or removed are written.
+    """
+    key_column = _record_key(store)
+    with transaction() as conn:
+        existing = {row[0] for row in conn.execute(f'SELECT {key_column} FROM config.{store}')}
+        conn.executemany(
+            f'DELETE FROM config.{store} WHERE {key_column} = ?',
+            [(key,) for key in existing - set(records)]
+        )
+        for key, record in records.items():
+            if key_column == 'id':
+                save_config_record(store, dict(record, id=key))
+            else:
+                save_config_record(store, record, key=key)
+
+
+def get_config_values(store):
+    """Return a value store (settings, branding) as one dict."""
+    if store not in CONFIG_VALUE_STORES:
+        raise ValueError(f"Unknown config value store: {store}")
+    rows = get_connection().execute(f'SELECT key, value FROM config.{store} ORDER BY key')
+    return {row[0]: json.loads(row[1]) for row in rows}
+
+
+def set_config_values(store, values, replace=False):
+    """
+    Update keys of a value store; unchanged keys are not rewritten.
+
+    Args:
+        store (str): One of CONFIG_VALUE_STORES
+        values (dict): Keys to set
+        replace (bool): Also delete keys not in values
+    """
+    if store not in CONFIG_VALUE_STORES:
+        raise ValueError(f"Unknown config value store: {store}")
+    with transaction() as conn:
+        conn.executemany(
+            f'''
+            INSERT INTO config.{store} (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value WHERE value IS NOT excluded.value
+            ''',
+            [(key, json.dumps(value, sort_keys=True)) for key, value in values.items()]
+        )
+        if replace:
+            existing = {row[0] for row in conn.execute(f'SELECT key FROM config.{store}')}
+            conn.executemany(
+                f'DELETE FROM config.{store} WHERE key = ?',
+                [(key,) for key in existing - set(values)]
+            )
@@ -0,0 +1,184 @@
+# app/services/device_presence.py
+import atexit
+import threading
+from ..utils.logging_setup import error_logger, db_logger
+from ..utils.recording_ids import now_ms
+from . import database
+from .channel_registry import normalize_mac
+
+# Weight of the newest interval in the smoothed ping interval
+PING_INTERVAL_SMOOTHING = 0.2
+
+
+class DevicePresence:
+    """
+    In-memory presence table of the devices pinging /api/event.
+
+    Each MAC maps to an entry with its channel id, first and last seen time
+    (epoch ms), ping count, smoothed ping interval and the fields the
+    firmware reported in its last event body. Entries are never modified in
+    place: a ping builds a new entry and swaps in a new dict, so readers use
+    whatever dict is current without locking. Pings only mark the MAC dirty;
+    a background thread writes the dirty entries to the devices store every
+    persist_interval seconds (and on exit), so a ping never waits on SQLite.
+    A device is online while its last ping is at most offline_after seconds
+    old.
+    """
+
+    def __init__(self, offline_after=90, persist_interval=30):
+        self.offline_after_ms = int(offline_after * 1000)
+        self.persist_interval = persist_interval
+        self.running = False
+        self.thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._dirty = set()
+        self._devices = {}
+        self.load()
+
+    def load(self):
+        """Load the persisted entries, keeping any already seen in this process."""
+        try:
+            stored = database.get_config_records('devices')
+        except Exception as e:
+            error_logger.error(f"Error loading device presence: {str(e)}")
+            return
+        with self._lock:
+            devices = dict(stored)
+            devices.update(self._devices)
+            self._devices = devices
+
+    def start(self):
+        """Start the background persistence loop."""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        db_logger.info(f"Device presence started (persisting every {self.persist_interval} s)")
+
+    def stop(self):
+        """Stop the persistence loop and write anything still dirty."""
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+        self.persist()
+
+    def _run(self):
+        while self.running:
+            self._wakeup.wait(self.persist_interval)
+            try:
+                self.persist()
+            except Exception as e:
+                error_logger.error(f"Error persisting device presence: {str(e)}")
+
+    def record(self, mac, channel_id=None, reported=None):
+        """
+        Record a ping from a device.
+
+        Args:
+            mac (str): The device's MAC address, in any case
+            channel_id (int): The channel the device feeds
+            reported (dict): Fields from the event body, if it had one
+
+        Returns:
+            dict: The device's new entry
+        """
+        mac = normalize_mac(mac)
+        now = now_ms()
+        with self._lock:
+            previous = self._devices.get(mac)
+            entry = {
+                'mac': mac,
+                'channel_id': channel_id,
+                'first_seen': now,
+                'last_seen': now,
+                'pings': 1,
+                'interval_ms': None,
+                'reported': dict(reported) if reported else {},
+                'reported_at': now if reported else None,
+            }
+            if previous:
+                entry['first_seen'] = previous.get('first_seen') or now
+                entry['pings'] = (previous.get('pings') or 0) + 1
+                if channel_id is None:
+                    entry['channel_id'] = previous.get('channel_id')
+                if not reported:
+                    entry['reported'] = previous.get('reported') or {}
+                    entry['reported_at'] = previous.get('reported_at')
+
+                interval = now - (previous.get('last_seen') or now)
+                smoothed = previous.get('interval_ms')
+                if interval > self.offline_after_ms:
+                    # Back from offline (or a restart): the gap is not a ping interval
+                    entry['interval_ms'] = smoothed
+                elif smoothed is None:
+                    entry['interval_ms'] = interval
+                else:
+                    entry['interval_ms'] = int(
+                        smoothed + PING_INTERVAL_SMOOTHING * (interval - smoothed)
+                    )
+
+            devices = dict(self._devices)
+            devices[mac] = entry
+            self._devices = devices
+            self._dirty.add(mac)
+        return entry
+
+    def persist(self):
+        """Write the entries that changed since the last call in one transaction."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            devices = self._devices
+        if not dirty:
+            return 0
+        try:
+            with database.transaction():
+                for mac in dirty:
+                    database.save_config_record('devices', devices[mac], key=mac)
+        except Exception:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+        return len(dirty)
+
+    def _status(self, entry, now):
+        status = dict(entry)
+        interval = entry.get('interval_ms')
+        status['online'] = now - (entry.get('last_seen') or 0) <= self.offline_after_ms
+        status['ping_rate_per_min'] = round(60000 / interval, 2) if interval else None
+        return status
+
+    def get(self, mac):
+        """Return a device's entry with its online state, or None."""
+        entry = self._devices.get(normalize_mac(mac))
+        return self._status(entry, now_ms()) if entry else None
+
+    def all(self):
+        """Return every device's entry with its online state, ordered by MAC."""
+        devices, now = self._devices, now_ms()
+        return [self._status(devices[mac], now) for mac in sorted(devices)]
+
+
+# Singleton instance
+_device_presence = None
+_device_presence_lock = threading.Lock()
+
+def get_device_presence():
+    """Get the singleton presence table; until init_device_presence runs, nothing is persisted."""
+    global _device_presence
+    if _device_presence is None:
+        with _device_presence_lock:
+            if _device_presence is None:
+                _device_presence = DevicePresence()
+    return _device_presence
+
+def init_device_presence(**kwargs):
+    """Create the singleton presence table with the given settings and start persisting it."""
+    global _device_presence
+    with _device_presence_lock:
+        if _device_presence is None or not _device_presence.running:
+            _device_presence = DevicePresence(**kwargs)
+            _device_presence.start()
+    return _device_presence
@@ -0,0 +1,99 @@
+# app/services/event_bus.py
+import threading
+import time
+from collections import deque
+
+
+class Event:
+    """A single published event with a monotonically increasing id."""
+    __slots__ = ('id', 'type', 'data', 'published_at')
+
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.published_at = time.time()
+
+
+class EventBus:
+    """
+    In-process pub/sub bus feeding live clients.
+
+    Events are kept in a bounded ring buffer so a reconnecting client can
+    resume from its Last-Event-ID. Readers subscribe a callback that wakes
+    them and read events_since(); publishers never block on slow readers.
+    """
+
+    def __init__(self, history_size=1000):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=history_size)
+        self._last_id = 0
+        self._subscribers = []
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data):
+        """
+        Publish an event to every reader and subscriber.
+
+        Args:
+            event_type (str): Event name, e.g. 'recording' or 'channel'
+            data (dict): JSON-serializable payload
+
+        Returns:
+            Event: The published event
+        """
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self._events.append(event)
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # A failing subscriber must not break the publisher
+                pass
+        return event
+
+    def events_since(self, last_id):
+        """
+        Return events published after last_id.
+
+        Returns:
+            tuple: (events, complete) where complete is False when events
+            between last_id and the oldest buffered event were dropped
+        """
+        with self._lock:
+            if last_id >= self._last_id:
+                return [], True
+            oldest_id = self._events[0].id if self._events else self._last_id + 1
+            complete = last_id >= oldest_id - 1
+            return [e for e in self._events if e.id > last_id], complete
+
+    def subscribe(self, callback):
+        """Call callback(event) synchronously for every published event."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+
+# Singleton instance
+_event_bus = None
+_event_bus_lock = threading.Lock()
+
+def get_event_bus():
+    """Get the singleton event bus, creating it on first use."""
+    global _event_bus
+    if _event_bus is None:
+        with _event_bus_lock:
+            if _event_bus is None:
+                _event_bus = EventBus()
+    return _event_bus
@@ -0,0 +1,44 @@
+# app/services/json_store.py
+import json
+from ..utils.logging_setup import error_logger, warning_logger
+
+
+def load_json_file(path, default=None):
+    """
+    Read a legacy JSON config file, falling back to its <path>.bak copy.
+
+    Older releases wrote the config files atomically and kept the previous
+    version as <path>.bak; it is read if the main file is missing or
+    corrupt. Neither file is modified.
+
+    Returns:
+        The parsed JSON, or default if neither file exists
+
+    Raises:
+        ValueError: The file is corrupt and there is no usable backup
+    """
+    backup_path = path + '.bak'
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError as e:
+        error = e
+    except ValueError as e:
+        error = e
+
+    try:
+        with open(backup_path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        if isinstance(error, ValueError):
+            error_logger.error(f"{path} is unreadable ({str(error)}) and has no backup")
+            raise error
+        return default
+    except (OSError, ValueError) as e:
+        error_logger.error(f"{path} is unreadable ({str(error)}) and has no usable backup: {str(e)}")
+        if isinstance(error, ValueError):
+            raise error
+        return default
+
+    warning_logger.warning(f"{path} is unreadable ({str(error)}), using {backup_path}")
+    return data
@@ -0,0 +1,71 @@
+# app/services/keyword_alerts.py
+import re
+import threading
+from .settings_service import get_settings_service
+
+
+class KeywordMatcher:
+    """
+    Match a transcription against every alert keyword in a single regex scan.
+
+    Keywords are matched case-insensitively as substrings, the same way the
+    dashboard highlights them. The compiled pattern is swapped atomically on
+    update so matching never takes a lock.
+    """
+
+    def __init__(self, keywords=()):
+        self._state = ({}, None)
+        self.update(keywords)
+
+    def update(self, keywords):
+        """Recompile the matcher for a new keyword list."""
+        by_lower = {}
+        cleaned = [k.strip() for k in keywords or [] if isinstance(k, str) and k.strip()]
+        # Longest first so the alternation prefers the most specific keyword
+        for keyword in sorted(cleaned, key=len, reverse=True):
+            by_lower.setdefault(keyword.lower(), keyword)
+
+        pattern = None
+        if by_lower:
+            alternation = '|'.join(re.escape(k) for k in by_lower)
+            # Zero-width lookahead reports a match at every start position
+            pattern = re.compile(f'(?=({alternation}))', re.IGNORECASE)
+        self._state = (by_lower, pattern)
+
+    @property
+    def keywords(self):
+        return list(self._state[0].values())
+
+    def match(self, text):
+        """
+        Return the keywords found in text.
+
+        Returns:
+            list: Matched keywords in their configured spelling, sorted
+        """
+        by_lower, pattern = self._state
+        if pattern is None or not text:
+            return []
+        found = {m.group(1).lower() for m in pattern.finditer(text)}
+        if not found:
+            return []
+        # A keyword contained in a longer matched keyword also occurs in the text
+        hits = {k for k in by_lower if any(k in f for f in found)}
+        return sorted(by_lower[k] for k in hits)
+
+
+# Singleton instance
+_keyword_matcher = None
+_keyword_matcher_lock = threading.Lock()
+
+def get_keyword_matcher():
+    """Get the singleton keyword matcher, kept in sync with the keywords setting."""
+    global _keyword_matcher
+    if _keyword_matcher is None:
+        with _keyword_matcher_lock:
+            if _keyword_matcher is None:
+                settings = get_settings_service()
+                matcher = KeywordMatcher(settings.get_list('keywords'))
+                settings.subscribe(lambda changed: matcher.update(changed.get('keywords')), keys=('keywords',))
+                _keyword_matcher = matcher
+    return _keyword_matcher
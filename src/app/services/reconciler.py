@@ -0,0 +1,177 @@
+# app/services/reconciler.py
+import os
+import threading
+import time
+from ..utils.logging_setup import error_logger, warning_logger, db_logger
+from . import database
+from ..utils.wav_info import wav_duration_ms
+
+RECORDINGS_DIR = 'recordings'
+
+
+class FilesystemReconciler:
+    """
+    Keep the recordings table in step with the recordings/channel_* directories.
+
+    Runs in the background so read paths never touch the filesystem. Each pass
+    only rescans channel directories whose mtime changed (plus a periodic full
+    sweep), updates file_present/file_size (filling in missing WAV durations),
+    and removes rows whose file has been gone for longer than the grace
+    period. Audio files with no row are removed once they are older than the
+    grace period and not waiting in the upload queue.
+    """
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR, interval=60, batch_size=500,
+                 grace_seconds=3600, full_scan_every=60, delete_orphan_files=True,
+                 is_pending=None):
+        self.recordings_dir = recordings_dir
+        self.interval = interval
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+        self.full_scan_every = full_scan_every
+        self.delete_orphan_files = delete_orphan_files
+        self.is_pending = is_pending or (lambda path: False)
+        self.running = False
+        self.thread = None
+        self._dir_mtimes = {}
+        self._root_mtime = None
+        self._passes = 0
+
+    def start(self):
+        """Start the background reconcile loop."""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        db_logger.info("Filesystem reconciler started")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while self.running:
+            try:
+                self.reconcile_once()
+            except Exception as e:
+                error_logger.error(f"Error in filesystem reconciler: {str(e)}")
+            time.sleep(self.interval)
+
+    def reconcile_once(self):
+        """
+        Run one reconcile pass.
+
+        Returns:
+            dict: Counts of rows marked present/missing and rows/files removed
+        """
+        stats = {'present': 0, 'missing': 0, 'rows_removed': 0, 'files_removed': 0}
+        full_scan = self._passes % self.full_scan_every == 0
+        self._passes += 1
+
+        channel_dirs = {}
+        if os.path.isdir(self.recordings_dir):
+            root_mtime = os.stat(self.recordings_dir).st_mtime_ns
+            for entry in os.scandir(self.recordings_dir):
+                if entry.is_dir() and entry.name.startswith('channel_'):
+                    try:
+                        channel_dirs[int(entry.name[len('channel_'):])] = entry.path
+                    except ValueError:
+                        continue
+        else:
+            root_mtime = None
+
+        # Channels with rows but no directory only need checking when the set
+        # of directories changes (or on a full sweep)
+        channel_ids = set(channel_dirs)
+        if full_scan or root_mtime != self._root_mtime:
+            channel_ids.update(database.get_recording_channel_ids())
+        self._root_mtime = root_mtime
+
+        for channel_id in sorted(channel_ids):
+            if not self.running and self.thread is not None:
+                break
+            path = channel_dirs.get(channel_id)
+            mtime = os.stat(path).st_mtime_ns if path else None
+            if not full_scan and path and self._dir_mtimes.get(path) == mtime:
+                continue
+            self._reconcile_channel(channel_id, path, stats)
+            if path:
+                self._dir_mtimes[path] = mtime
+
+        stats['rows_removed'] += self._remove_missing_rows()
+
+        if any(stats.values()):
+            db_logger.info(f"Filesystem reconcile pass: {stats}")
+        return stats
+
+    def _reconcile_channel(self, channel_id, path, stats):
+        now = time.time()
+        files = {}
+        if path:
+            for entry in os.scandir(path):
+                if entry.is_file():
+                    st = entry.stat()
+                    files[os.path.normpath(entry.path)] = (st.st_size, st.st_mtime)
+
+        present, missing, seen = [], [], set()
+        for row in database.get_channel_file_states(channel_id):
+            filename = row['filename'] or ''
+            key = os.path.normpath(os.path.relpath(filename) if os.path.isabs(filename) else filename)
+            info = files.get(key)
+            if info:
+                seen.add(key)
+                needs_duration = row['duration_ms'] is None and key.lower().endswith('.wav')
+                if not row['file_present'] or row['file_size'] != info[0] or needs_duration:
+                    # 0 marks an unreadable header so it is not retried every pass
+                    duration = (wav_duration_ms(key) or 0) if needs_duration else None
+                    present.append((info[0], duration, row['id']))
+            elif row['file_present']:
+                missing.append(row['id'])
+
+        for batch in self._batches(present):
+            database.mark_files_present(batch)
+        for batch in self._batches(missing):
+            database.mark_files_missing(batch, int(now))
+        stats['present'] += len(present)
+        stats['missing'] += len(missing)
+        if missing:
+            warning_logger.warning(f"Audio files not found for {len(missing)} recordings on channel {channel_id}")
+
+        if self.delete_orphan_files:
+            for key, (_, mtime) in files.items():
+                if key in seen or now - mtime < self.grace_seconds or self.is_pending(key):
+                    continue
+                try:
+                    os.remove(key)
+                    stats['files_removed'] += 1
+                except OSError as e:
+                    error_logger.error(f"Failed to remove orphaned audio file {key}: {str(e)}")
+
+    def _remove_missing_rows(self):
+        """Delete rows whose file has been missing for longer than the grace period."""
+        removed = 0
+        cutoff = int(time.time() - self.grace_seconds)
+        while True:
+            ids = database.get_missing_recording_ids(cutoff, self.batch_size)
+            if not ids:
+                return removed
+            database.delete_recordings(ids)
+            removed += len(ids)
+            # Yield the write lock to live ingest between batches
+            time.sleep(0.05)
+
+    def _batches(self, items):
+        for i in range(0, len(items), self.batch_size):
+            yield items[i:i + self.batch_size]
+
+
+# Singleton instance
+_reconciler = None
+
+def init_reconciler(**kwargs):
+    """Create and start the singleton reconciler."""
+    global _reconciler
+    if _reconciler is None:
+        _reconciler = FilesystemReconciler(**kwargs)
+        _reconciler.start()
+    return _reconciler
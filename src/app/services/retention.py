@@ -0,0 +1,211 @@
+# app/services/retention.py
+import os
+import json
+import shutil
+import threading
+import time
+from ..utils.logging_setup import error_logger, warning_logger, db_logger
+from ..utils.recording_ids import now_ms
+from . import database
+
+RECORDINGS_DIR = 'recordings'
+MB = 1024 * 1024
+
+
+def remove_audio_files(filenames):
+    """
+    Remove the audio files of deleted recordings.
+
+    Args:
+        filenames (iterable): Stored recording paths
+
+    Returns:
+        tuple: (files removed, bytes reclaimed)
+    """
+    removed, reclaimed = 0, 0
+    for filename in filenames:
+        if not filename:
+            continue
+        try:
+            size = os.path.getsize(filename)
+            os.remove(filename)
+            removed += 1
+            reclaimed += size
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            error_logger.error(f"Failed to remove audio file {filename}: {str(e)}")
+    return removed, reclaimed
+
+
+class RetentionService:
+    """
+    Prune recordings so a long event never fills the disk.
+
+    Policies are per channel: max_age_days and max_recordings drop a
+    channel's oldest recordings, and channels with evict_for_space disabled
+    are skipped when free space on the recordings volume falls below
+    min_free_mb (recordings are then evicted oldest first until
+    target_free_mb is free again). Pruned audio is deleted, or moved to
+    archive_dir together with a JSON line per row.
+
+    Work is done in small batches with a pause in between so live ingest
+    keeps the database write lock and the SD card mostly to itself. Each
+    pass ends with an incremental VACUUM and the reclaimed space is logged
+    and kept in last_report. Delete entries older than sync_cursor_max_age_hours
+    are pruned from the change log too, as deleted recordings would
+    otherwise keep one entry each forever.
+    """
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR, interval=300, default_policy=None,
+                 channel_policies=None, min_free_mb=None, target_free_mb=None,
+                 archive_dir=None, batch_size=200, batch_pause=0.5, vacuum_pages=2048,
+                 sync_cursor_max_age_hours=168):
+        self.recordings_dir = recordings_dir
+        self.interval = interval
+        self.default_policy = dict(default_policy or {})
+        self.channel_policies = {int(k): dict(v) for k, v in (channel_policies or {}).items()}
+        self.min_free_bytes = int(min_free_mb * MB) if min_free_mb else None
+        target = target_free_mb or min_free_mb
+        self.target_free_bytes = int(target * MB) if target else None
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.sync_cursor_max_age_ms = int(sync_cursor_max_age_hours * 3600 * 1000)
+        self.running = False
+        self.thread = None
+        self.last_report = None
+        self._run_lock = threading.Lock()
+
+    def start(self):
+        """Start the background retention loop."""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        db_logger.info("Retention service started")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        try:
+            if database.enable_incremental_vacuum():
+                db_logger.info("Database converted to incremental auto-vacuum")
+        except Exception as e:
+            error_logger.error(f"Error enabling incremental vacuum: {str(e)}")
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                error_logger.error(f"Error in retention service: {str(e)}")
+            time.sleep(self.interval)
+
+    def policy_for(self, channel_id):
+        policy = dict(self.default_policy)
+        policy.update(self.channel_policies.get(channel_id, {}))
+        return policy
+
+    def run_once(self):
+        """
+        Apply every policy once.
+
+        Returns:
+            dict: Rows and files removed, bytes reclaimed from audio and from
+            the database, and free space afterwards
+        """
+        with self._run_lock:
+            report = {'rows_removed': 0, 'files_removed': 0, 'audio_bytes_reclaimed': 0,
+                      'db_bytes_reclaimed': 0, 'changes_pruned': 0, 'started_at': int(time.time())}
+
+            for channel_id in database.get_recording_channel_ids():
+                policy = self.policy_for(channel_id)
+                max_age_days = policy.get('max_age_days')
+                if max_age_days:
+                    cutoff = now_ms() - int(max_age_days * 86400 * 1000)
+                    self._prune(lambda: database.get_recordings_older_than(
+                        channel_id, cutoff, self.batch_size), report)
+                max_recordings = policy.get('max_recordings')
+                if max_recordings:
+                    self._prune(lambda: database.get_recordings_beyond_count(
+                        channel_id, int(max_recordings), self.batch_size), report)
+
+            if self.min_free_bytes and self.free_bytes() < self.min_free_bytes:
+                warning_logger.warning(
+                    f"Free space below {self.min_free_bytes // MB} MB, evicting oldest recordings"
+                )
+                protected = [cid for cid in database.get_recording_channel_ids()
+                             if not self.policy_for(cid).get('evict_for_space', True)]
+                self._prune(lambda: database.get_oldest_recordings(self.batch_size, protected),
+                            report, until=lambda: self.free_bytes() >= self.target_free_bytes)
+
+            report['changes_pruned'] = database.prune_change_log(self.sync_cursor_max_age_ms)
+            report['db_bytes_reclaimed'] = database.incremental_vacuum(self.vacuum_pages)
+            report['free_bytes'] = self.free_bytes()
+            report['finished_at'] = int(time.time())
+            self.last_report = report
+
+            if report['rows_removed'] or report['db_bytes_reclaimed']:
+                reclaimed = (report['audio_bytes_reclaimed'] + report['db_bytes_reclaimed']) / MB
+                db_logger.info(
+                    f"Retention pass removed {report['rows_removed']} recordings, "
+                    f"reclaimed {reclaimed:.1f} MB"
+                )
+            return report
+
+    def _prune(self, next_batch, report, until=None):
+        """Remove batches returned by next_batch() until it is empty or until() is true."""
+        while self.running or self.thread is None:
+            if until is not None and until():
+                return
+            rows = next_batch()
+            if not rows:
+                return
+            if self.archive_dir:
+                self._archive(rows)
+            # Rows first: a crash before the files go leaves orphans the
+            # reconciler cleans up, never rows pointing at missing audio
+            database.delete_recordings([row['id'] for row in rows], keep_rollups=True)
+            removed, reclaimed = remove_audio_files(row['filename'] for row in rows)
+            report['rows_removed'] += len(rows)
+            report['files_removed'] += removed
+            report['audio_bytes_reclaimed'] += reclaimed
+            # Give live ingest the write lock and the disk between batches
+            time.sleep(self.batch_pause)
+
+    def _archive(self, rows):
+        """Copy the audio of rows into archive_dir and append their metadata."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(os.path.join(self.archive_dir, 'recordings.jsonl'), 'a') as index:
+            for row in rows:
+                filename = row['filename']
+                if filename and os.path.exists(filename):
+                    target_dir = os.path.join(self.archive_dir, f"channel_{row['channel_id']}")
+                    os.makedirs(target_dir, exist_ok=True)
+                    target = os.path.join(target_dir, os.path.basename(filename))
+                    shutil.copy2(filename, target)
+                    row = dict(row, archived_path=target)
+                index.write(json.dumps(row) + '\n')
+
+    def free_bytes(self):
+        """Free space on the recordings volume, in bytes."""
+        path = self.recordings_dir if os.path.isdir(self.recordings_dir) else '.'
+        return shutil.disk_usage(path).free
+
+
+# Singleton instance
+_retention_service = None
+
+def init_retention_service(**kwargs):
+    """Create and start the singleton retention service."""
+    global _retention_service
+    if _retention_service is None:
+        _retention_service = RetentionService(**kwargs)
+        _retention_service.start()
+    return _retention_service
+
+def get_retention_service():
+    """Get the running retention service, or None if it was not started."""
+    return _retention_service
@@ -0,0 +1,145 @@
+# app/services/settings_service.py
+import copy
+import threading
+import time
+from ..utils.logging_setup import error_logger, db_logger
+from . import database
+
+# Keys written to the store when missing
+DEFAULT_SETTINGS = {
+    "global_model": "medium.en",
+    "global_target_language": "english",
+    "global_hallucination": "False",
+    "global_timezone": "UTC",
+    "keywords": []
+}
+
+
+def to_bool(value, default=False):
+    """Interpret a setting stored as "True"/"False" (or a real bool)."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        return value.strip().lower() == 'true'
+    return bool(value)
+
+
+class SettingsService:
+    """
+    Cached settings with typed accessors and change subscriptions.
+
+    Reads come from an in-memory copy. The settings store's version counter
+    is checked at most every check_interval seconds and the copy reloaded
+    when it moved; writes go through update(). Either way the changed keys
+    are diffed against the previous copy and passed to subscribers, so
+    components can apply new values live instead of on restart.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._checked_at = 0.0
+        self._version = None
+        self._settings = {}
+        self._subscribers = []
+        self.reload()
+
+    def reload(self):
+        """Reload the settings and notify subscribers of any changed keys."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                version = database.get_config_version('settings')
+                settings = database.get_config_values('settings')
+            except Exception as e:
+                # Keep serving the last good copy
+                error_logger.error(f"Error loading settings: {str(e)}")
+                return
+            initial = self._version is None
+            previous, self._settings, self._version = self._settings, settings, version
+            changed = {key: settings.get(key) for key in previous.keys() | settings.keys()
+                       if previous.get(key) != settings.get(key)}
+            subscribers = list(self._subscribers)
+
+        if changed and not initial:
+            db_logger.info(f"Settings changed: {', '.join(sorted(changed))}")
+            for callback, keys in subscribers:
+                relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+                if relevant:
+                    try:
+                        callback(relevant)
+                    except Exception as e:
+                        error_logger.error(f"Error applying settings change: {str(e)}")
+
+    def _current(self, force=False):
+        if force or time.monotonic() - self._checked_at >= self.check_interval:
+            self._checked_at = time.monotonic()
+            try:
+                if database.get_config_version('settings') != self._version:
+                    self.reload()
+            except Exception as e:
+                error_logger.error(f"Error checking settings version: {str(e)}")
+        return self._settings
+
+    def refresh(self):
+        """Pick up changes made elsewhere now instead of at the next periodic check."""
+        self._current(force=True)
+
+    def all(self):
+        """Return a copy of every setting (safe to modify)."""
+        return copy.deepcopy(self._current())
+
+    def get(self, key, default=None):
+        return self._current().get(key, default)
+
+    def get_bool(self, key, default=False):
+        return to_bool(self._current().get(key), default)
+
+    def get_list(self, key):
+        value = self._current().get(key)
+        return list(value) if isinstance(value, list) else []
+
+    def update(self, values):
+        """
+        Store new values and apply them.
+
+        Args:
+            values (dict): Settings to change; other keys are kept
+
+        Returns:
+            dict: The full settings after the update
+        """
+        with self._lock:
+            database.set_config_values('settings', values)
+            self.reload()
+            return copy.deepcopy(self._settings)
+
+    def ensure_defaults(self):
+        """Store DEFAULT_SETTINGS for keys that are missing and return every setting."""
+        missing = {key: value for key, value in DEFAULT_SETTINGS.items() if key not in self._current()}
+        if missing:
+            return self.update(missing)
+        return self.all()
+
+    def subscribe(self, callback, keys=None):
+        """
+        Call callback({key: new value}) whenever any of keys (default: any key) changes.
+
+        Callbacks run on the thread that noticed the change and must not block.
+        """
+        with self._lock:
+            self._subscribers.append((callback, frozenset(keys) if keys is not None else None))
+
+
+# Singleton instance
+_settings_service = None
+_settings_service_lock = threading.Lock()
+
+def get_settings_service():
+    """Get the singleton settings service, loading the settings on first use."""
+    global _settings_service
+    if _settings_service is None:
+        with _settings_service_lock:
+            if _settings_service is None:
+                _settings_service = SettingsService()
+    return _settings_service
@@ -12,6 +12,7 @@ import sqlite3
 import numpy as np
 import json
 from ..utils.logging_setup import error_logger, warning_logger, transcription_logger, db_logger
+from .settings_service import get_settings_service
 import requests
 
 
@@ -27,7 +28,7 @@ class TranscriptionService:
         self.whisper_model = None
         self.openai_client = None
         
-        # Load API settings from settings.json
+        # Load API settings from the settings store
         self.api_key, self.api_health_url, self.api_transcription_url = self._load_api_settings()
 
         # Service status flags to track availability
@@ -36,6 +37,9 @@ class TranscriptionService:
         
         # Store model name for lazy loading the local Whisper model
         self.model_name = model_name
+        # Latest model asked for by set_model; model_name follows once it has loaded
+        self._requested_model = model_name
+        self._model_lock = threading.Lock()
 
 
         # Load hallucinations once during initialization
@@ -46,36 +50,33 @@ class TranscriptionService:
         
     def _load_api_settings(self):
         """
-        Load API settings from db/settings.json
+        Load API settings from the settings store
         
         Returns:
             tuple: (api_key, api_health_url, api_transcription_url)
         """
         try:
-            with open("db/settings.json", "r") as file:
-                settings = json.load(file)
-                api_key = settings.get("open_ai_key", None)
-                api_health_url = settings.get("api_health_url", "https://api.boondockecho.com/health")
-                api_transcription_url = settings.get("api_transcription_url", "https://api.boondockecho.com/transcribe/")
-                return api_key, api_health_url, api_transcription_url
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            error_logger.error(f"Failed to load API settings from settings.json: {str(e)}")
+            settings = get_settings_service()
+            api_key = settings.get("open_ai_key", None)
+            api_health_url = settings.get("api_health_url", "https://api.boondockecho.com/health")
+            api_transcription_url = settings.get("api_transcription_url", "https://api.boondockecho.com/transcribe/")
+            return api_key, api_health_url, api_transcription_url
+        except Exception as e:
+            error_logger.error(f"Failed to load API settings: {str(e)}")
             return None, "https://api.boondockecho.com/health", "https://api.boondockecho.com/transcribe/"
   
     # This method is redundant as it's already covered by _load_api_settings - removing it would be ideal
     def _load_api_key(self):
         """
-        Load OpenAI API key from db/settings.json
+        Load OpenAI API key from the settings store
         
         Returns:
             str: OpenAI API key or None if not found
         """
         try:
-            with open("db/settings.json", "r") as file:
-                settings = json.load(file)
-                return settings.get("open_ai_key", None)
-        except (FileNotFoundError, json.JSONDecodeError) as e:
-            error_logger.error(f"Failed to load API key from settings.json: {str(e)}")
+            return get_settings_service().get("open_ai_key", None)
+        except Exception as e:
+            error_logger.error(f"Failed to load API key: {str(e)}")
             return None
 
     def _load_hallucinations(self):
@@ -122,13 +123,57 @@ class TranscriptionService:
             Exception: If model loading fails
         """
         if self.whisper_model is None:
+            with self._model_lock:
+                if self.whisper_model is not None:
+                    return
+                try:
+                    from faster_whisper import WhisperModel
+                    self.whisper_model = WhisperModel(self.model_name, device="cpu", compute_type="int8")
+                    transcription_logger.info(f"Local Whisper model loaded successfully: {self.model_name}")
+                except Exception as e:
+                    error_logger.error(f"Failed to load Whisper model: {str(e)}")
+                    raise
+
+    def set_model(self, model_name):
+        """
+        Switch the local Whisper model.
+
+        The new model is loaded on a background thread and swapped in once
+        ready; clips transcribed meanwhile keep using the current model.
+        """
+        if model_name == self._requested_model:
+            return
+        self._requested_model = model_name
+        if self.whisper_model is None:
+            self.model_name = model_name  # Not loaded yet; the next load picks up the new name
+            return
+        threading.Thread(target=self._swap_whisper_model, args=(model_name,), daemon=True).start()
+
+    def _swap_whisper_model(self, model_name):
+        with self._model_lock:
+            if model_name != self._requested_model:
+                return  # Superseded by a later change
             try:
                 from faster_whisper import WhisperModel
-                self.whisper_model = WhisperModel(self.model_name, device="cpu", compute_type="int8")
-                transcription_logger.info(f"Local Whisper model loaded successfully: {self.model_name}")
+                model = WhisperModel(model_name, device="cpu", compute_type="int8")
             except Exception as e:
-                error_logger.error(f"Failed to load Whisper model: {str(e)}")
-                raise
+                error_logger.error(f"Failed to load Whisper model {model_name}, keeping the current one: {str(e)}")
+                if model_name == self._requested_model:
+                    # Let a later set_model retry this model or return to the loaded one
+                    self._requested_model = self.model_name
+                return
+            if model_name == self._requested_model:
+                self.whisper_model = model
+                self.model_name = model_name
+                transcription_logger.info(f"Local Whisper model switched to {model_name}")
+
+    def apply_api_settings(self):
+        """Reload the API settings and give the remote services another chance."""
+        self.api_key, self.api_health_url, self.api_transcription_url = self._load_api_settings()
+        self.openai_client = None
+        self.nodes_available = True
+        self.openai_available = True
+        transcription_logger.info("Transcription API settings reloaded")
 
     def _load_openai_client(self):
         """
@@ -146,7 +191,7 @@ class TranscriptionService:
                 error_logger.error(f"Failed to initialize OpenAI client: {str(e)}")
                 raise
         elif not self.api_key:
-            error_logger.error("OpenAI API key is missing. Check db/settings.json.")
+            error_logger.error("OpenAI API key is missing. Check the open_ai_key setting.")
 
 
     def _initial_connectivity_check(self):
@@ -198,7 +243,7 @@ class TranscriptionService:
             error_logger.error(f"OpenAI connectivity check failed: {str(e)}")
             return False
 
-    def transcribe_audio(self, filepath, use_local=True, use_openai=False, use_nodes=False):
+    def transcribe_audio(self, filepath, use_local=True, use_openai=False, use_nodes=False, on_partial=None):
         """
         Transcribe audio using the specified method(s).
         Returns the transcription from the first successful method.
@@ -209,6 +254,7 @@ class TranscriptionService:
             use_local (bool): Whether to use local Whisper model
             use_openai (bool): Whether to use OpenAI API
             use_nodes (bool): Whether to use nodes API service
+            on_partial (callable): Called with the text so far as local segments are decoded
             
         Returns:
             str: Transcription text or "..." if all methods fail
@@ -244,7 +290,7 @@ class TranscriptionService:
         # Always try local as last resort, even if not initially enabled
         try:
             transcription_logger.info("Attempting local transcription...")
-            result = self._transcribe_local(filepath)
+            result = self._transcribe_local(filepath, on_partial=on_partial)
             if result:
                 transcription_logger.info("Local transcription successful")
                 return result
@@ -254,12 +300,13 @@ class TranscriptionService:
         error_logger.error("All transcription methods failed")
         return "..."
 
-    def _transcribe_local(self, filepath):
+    def _transcribe_local(self, filepath, on_partial=None):
         """
         Transcribe using local Whisper model.
         
         Args:
             filepath (str): Path to audio file
+            on_partial (callable): Called with the text so far after each segment
             
         Returns:
             str: Transcription text
@@ -269,8 +316,15 @@ class TranscriptionService:
         """
         try:
             self._load_whisper_model()  # Lazy load the model only when needed
-            segments, _ = self.whisper_model.transcribe(filepath)
-            transcription = " ".join([segment.text for segment in segments])
+            # Hold a reference so a model swap cannot pull it away mid-clip
+            model = self.whisper_model
+            segments, _ = model.transcribe(filepath)
+            texts = []
+            for segment in segments:
+                texts.append(segment.text)
+                if on_partial:
+                    on_partial(" ".join(texts))
+            transcription = " ".join(texts)
             transcription = self._filter_hallucinations(transcription)
             transcription_logger.info("Local transcription completed successfully")
             return transcription
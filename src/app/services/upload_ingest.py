@@ -0,0 +1,373 @@
+# app/services/upload_ingest.py
+import hashlib
+import os
+import tarfile
+import threading
+import time
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import default_stream_factory, parse_form_data
+from werkzeug.wsgi import get_input_stream
+from ..utils.logging_setup import error_logger
+from ..utils.wav_info import MAX_HEADER_BYTES, sniff_audio_header
+from .channel_registry import get_channel_registry
+
+UPLOAD_EXTENSIONS = ('wav', 'mp3')
+# Raw (non-multipart) bodies are copied in blocks of this size
+CHUNK_SIZE = 64 * 1024
+# Identical clips received on a channel within this window are stored once
+DEDUP_WINDOW_MS = 24 * 3600 * 1000
+
+
+class UploadRejected(Exception):
+    """An upload that cannot be accepted; carries the HTTP status (and headers) to answer with."""
+
+    def __init__(self, message, status=400, retry_after=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {'Retry-After': str(self.retry_after)} if self.retry_after else {}
+
+
+def allowed_upload(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in UPLOAD_EXTENSIONS
+
+
+def admit_device_upload(mac):
+    """
+    Check that an uploading device is registered and within its rate limit.
+
+    Args:
+        mac (str): The device's MAC address, from the request
+
+    Returns:
+        int: The channel id of the device
+
+    Raises:
+        UploadRejected: Missing or unknown MAC (400), or the device is over
+            its upload rate limit (429 with retry_after in seconds)
+    """
+    if not mac:
+        raise UploadRejected('MAC address is required')
+    channel_id = get_channel_registry().get_id_by_mac(mac)
+    if channel_id is None:
+        raise UploadRejected('Invalid MAC address')
+    retry_after = get_upload_rate_limiter().acquire(mac.upper())
+    if retry_after:
+        raise UploadRejected('Upload rate limit exceeded', 429, retry_after=int(retry_after) + 1)
+    return channel_id
+
+
+def duplicate_upload_body(duplicate, timestamp, channel_id, channel_details):
+    """Response body for an upload that duplicates an existing recording (id, filename)."""
+    return {
+        'message': 'Duplicate of an existing recording, not stored again',
+        'duplicate': True,
+        'recording_id': duplicate['id'],
+        'filename': duplicate['filename'],
+        'timestamp': timestamp,
+        'status': 'duplicate',
+        'channel_id': channel_id,
+        'channel_details': channel_details
+    }
+
+
+class ClipSink:
+    """
+    Writable target for one uploaded clip.
+
+    Data is written straight to the clip's final path (opened exclusively,
+    so an existing clip is never overwritten) while its SHA-256 is computed
+    and its header sniffed, so a bad or oversized upload is refused as soon
+    as its first bytes (or the limit) arrive instead of after it was saved.
+    A strict sink raises on the first problem; otherwise the clip is
+    deleted, the reason kept in error and the rest of its data dropped, so
+    one bad clip does not abort a batch.
+    """
+
+    def __init__(self, path, max_bytes=None, strict=True, source=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.strict = strict
+        self.source = source
+        self.captured_at = None
+        self.size = 0
+        self.format = None
+        self.sha256 = None
+        self.error = None
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._file = open(path, 'xb')
+
+    def write(self, data):
+        if self.error is not None:
+            return len(data)
+        try:
+            self.size += len(data)
+            if self.max_bytes and self.size > self.max_bytes:
+                raise RequestEntityTooLarge()
+            if self.format is None and len(self._head) < MAX_HEADER_BYTES:
+                self._head += bytes(data[:MAX_HEADER_BYTES - len(self._head)])
+                self._sniff(complete=False)
+        except (RequestEntityTooLarge, UploadRejected) as e:
+            if self.strict:
+                raise
+            self._reject(e)
+            return len(data)
+        self._hash.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def _reject(self, exc):
+        self.error = exc.message if isinstance(exc, UploadRejected) else 'Clip exceeds the maximum size'
+        self.discard()
+
+    def seek(self, *args):
+        # Werkzeug rewinds file parts once they are complete
+        return 0 if self._file.closed else self._file.seek(*args)
+
+    def _sniff(self, complete):
+        try:
+            self.format = sniff_audio_header(self._head, complete=complete)
+        except ValueError as e:
+            raise UploadRejected(f"Invalid audio file: {str(e)}")
+
+    def finish(self):
+        """Close the file once the whole clip is in and check it was recognized."""
+        if self.error is not None:
+            return
+        self._file.close()
+        if self.format is None:
+            try:
+                self._sniff(complete=True)
+            except UploadRejected as e:
+                if self.strict:
+                    raise
+                self._reject(e)
+                return
+        self.sha256 = self._hash.hexdigest()
+
+    def discard(self):
+        """Close and delete a clip that was not accepted."""
+        self._file.close()
+        if not os.path.exists(self.path):
+            return
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            error_logger.error(f"Failed to remove rejected upload {self.path}: {str(e)}")
+
+
+def receive_upload(request, path, max_bytes=None):
+    """
+    Stream the clip in an upload request to its final path.
+
+    Multipart requests must carry it in a 'file' field named *.wav or
+    *.mp3; any other body (e.g. audio/wav or application/octet-stream) is
+    taken as the clip itself. Either way the body is read in chunks and
+    written once, without Werkzeug's temporary spool file.
+
+    Args:
+        request: The Flask request (its form and files must not have been accessed)
+        path (str): Where to write the clip
+        max_bytes (int): Largest accepted clip
+
+    Returns:
+        tuple: (form, sink) with the request's form fields and the finished
+        ClipSink (size, sha256 and format of the clip)
+
+    Raises:
+        UploadRejected: The request holds no acceptable clip; nothing is left on disk
+    """
+    sink = None
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        nonlocal sink
+        if sink is None and filename and allowed_upload(filename):
+            sink = ClipSink(path, max_bytes)
+            return sink
+        return default_stream_factory(total_content_length, content_type, filename, content_length)
+
+    try:
+        if request.mimetype in ('multipart/form-data', 'application/x-www-form-urlencoded'):
+            try:
+                _, form, files = parse_form_data(
+                    request.environ, stream_factory=stream_factory,
+                    max_content_length=max_bytes, silent=False
+                )
+            except ValueError as e:
+                raise UploadRejected(f"Malformed upload: {str(e)}")
+            if 'file' not in files:
+                raise UploadRejected('No file part in the request')
+            file = files['file']
+            if file.filename == '':
+                raise UploadRejected('No file selected for uploading')
+            if not allowed_upload(file.filename) or file.stream is not sink:
+                raise UploadRejected('Allowed file types are wav, mp3')
+        else:
+            form = MultiDict()
+            sink = ClipSink(path, max_bytes)
+            while True:
+                chunk = request.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sink.write(chunk)
+            if sink.size == 0:
+                raise UploadRejected('No file part in the request')
+        sink.finish()
+        return form, sink
+    except RequestEntityTooLarge:
+        if sink is not None:
+            sink.discard()
+        raise UploadRejected('Upload exceeds the maximum size', 413)
+    except BaseException:
+        if sink is not None:
+            sink.discard()
+        raise
+
+
+def receive_batch(request, next_path, max_bytes=None, max_clip_bytes=None, max_clips=None):
+    """
+    Stream every clip in a batch upload request to its final path.
+
+    The body is either multipart/form-data with one 'file' part per clip
+    (optionally with captured_at fields in the same order) or a tar stream
+    (application/x-tar) whose members are the clips; a member's capture
+    time is its captured_at pax header, else its mtime. Clips are read and
+    written one at a time, never holding more than a chunk in memory. Clips
+    with a bad header or over max_clip_bytes are dropped individually.
+
+    Args:
+        request: The Flask request (its form and files must not have been accessed)
+        next_path (callable): Returns the path for the next clip
+        max_bytes (int): Largest accepted request body
+        max_clip_bytes (int): Largest accepted clip
+        max_clips (int): Most clips accepted in one request
+
+    Returns:
+        list: A ClipSink per clip in request order, with captured_at set to
+        the raw capture time (or None); check error before using a clip
+
+    Raises:
+        UploadRejected: The request as a whole cannot be accepted; nothing is left on disk
+    """
+    sinks = []
+
+    def new_sink(source):
+        if max_clips and len(sinks) >= max_clips:
+            raise UploadRejected(f'A batch may hold at most {max_clips} clips')
+        sink = ClipSink(next_path(), max_clip_bytes, strict=False, source=source)
+        sinks.append(sink)
+        return sink
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        if filename and allowed_upload(filename):
+            return new_sink(filename)
+        return default_stream_factory(total_content_length, content_type, filename, content_length)
+
+    try:
+        if request.mimetype == 'multipart/form-data':
+            try:
+                _, form, files = parse_form_data(
+                    request.environ, stream_factory=stream_factory,
+                    max_content_length=max_bytes, silent=False
+                )
+            except ValueError as e:
+                raise UploadRejected(f"Malformed upload: {str(e)}")
+            if not any(file.stream in sinks for file in files.getlist('file')):
+                raise UploadRejected('No file part in the request')
+            for sink, captured_at in zip(sinks, form.getlist('captured_at')):
+                sink.captured_at = captured_at or None
+        elif request.mimetype in ('application/x-tar', 'application/tar'):
+            stream = get_input_stream(request.environ, max_content_length=max_bytes)
+            try:
+                with tarfile.open(fileobj=stream, mode='r|') as tar:
+                    for member in tar:
+                        if not member.isfile() or not allowed_upload(member.name):
+                            continue
+                        sink = new_sink(os.path.basename(member.name))
+                        sink.captured_at = member.pax_headers.get('captured_at') or member.mtime or None
+                        source = tar.extractfile(member)
+                        while True:
+                            chunk = source.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            sink.write(chunk)
+            except tarfile.TarError as e:
+                raise UploadRejected(f"Malformed upload: {str(e)}")
+            if not sinks:
+                raise UploadRejected('No clips in the archive')
+        else:
+            raise UploadRejected('Batches must be multipart/form-data or application/x-tar', 415)
+
+        for sink in sinks:
+            sink.finish()
+        return sinks
+    except RequestEntityTooLarge:
+        for sink in sinks:
+            sink.discard()
+        raise UploadRejected('Upload exceeds the maximum size', 413)
+    except BaseException:
+        for sink in sinks:
+            sink.discard()
+        raise
+
+
+class UploadRateLimiter:
+    """
+    Per-device token bucket for uploads.
+
+    Each key (a device MAC) may upload burst clips at once and then one
+    every 60 / rate_per_minute seconds on average.
+    """
+
+    def __init__(self, rate_per_minute=60, burst=30):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def acquire(self, key, tokens=1):
+        """
+        Take tokens from a key's bucket.
+
+        Returns:
+            float: 0 if the upload may proceed, otherwise the seconds until
+            enough tokens are available
+        """
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            available, updated = self._buckets.get(key, (self.burst, now))
+            available = min(self.burst, available + (now - updated) * self.rate)
+            if available >= tokens:
+                self._buckets[key] = (available - tokens, now)
+                return 0.0
+            self._buckets[key] = (available, now)
+            return (tokens - available) / self.rate
+
+
+# Singleton instance
+_upload_rate_limiter = None
+_upload_rate_limiter_lock = threading.Lock()
+
+def get_upload_rate_limiter():
+    """Get the singleton rate limiter (default limits until init_upload_rate_limiter runs)."""
+    global _upload_rate_limiter
+    if _upload_rate_limiter is None:
+        with _upload_rate_limiter_lock:
+            if _upload_rate_limiter is None:
+                _upload_rate_limiter = UploadRateLimiter()
+    return _upload_rate_limiter
+
+def init_upload_rate_limiter(**kwargs):
+    """Create the singleton rate limiter with the given limits."""
+    global _upload_rate_limiter
+    with _upload_rate_limiter_lock:
+        _upload_rate_limiter = UploadRateLimiter(**kwargs)
+    return _upload_rate_limiter
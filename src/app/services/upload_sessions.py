@@ -0,0 +1,276 @@
+# app/services/upload_sessions.py
+import hashlib
+import os
+import threading
+import time
+from ..utils.logging_setup import error_logger, db_logger
+from ..utils.recording_ids import now_ms, new_ulid
+from ..utils.wav_info import MAX_HEADER_BYTES, sniff_audio_header
+from .upload_ingest import CHUNK_SIZE, UploadRejected
+from . import database
+
+# Outside the channel_* directories, so the reconciler never sees partial files
+DEFAULT_SESSIONS_DIR = os.path.join('recordings', 'upload_sessions')
+
+
+class UploadSessions:
+    """
+    Resumable chunked uploads for devices on flaky links.
+
+    A session is created for one clip, the clip is sent in any number of
+    chunks, each PUT at the offset the server has already received, and the
+    session is finalized into a normal upload. The received offset is
+    simply the size of the session's partial file (every chunk is fsynced
+    before it is acknowledged), so an interrupted chunk or a server restart
+    loses nothing the client was told was stored and needs no bookkeeping
+    writes per chunk. Partial files live in directory, on the same file
+    system as the recordings so finalizing is a rename. Sessions untouched
+    for ttl_seconds are garbage-collected by a background loop.
+    """
+
+    def __init__(self, directory=DEFAULT_SESSIONS_DIR, max_bytes=None, ttl_seconds=24 * 3600, interval=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.interval = interval
+        self.running = False
+        self.thread = None
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Start the background garbage collection loop."""
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        db_logger.info(f"Upload session collector started (sessions expire after {self.ttl_seconds} s)")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def _run(self):
+        while self.running:
+            try:
+                self.run_once()
+            except Exception as e:
+                error_logger.error(f"Error collecting upload sessions: {str(e)}")
+            time.sleep(self.interval)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f'{session_id}.part')
+
+    def _lock(self, session_id):
+        with self._locks_lock:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _forget(self, session_id):
+        with self._locks_lock:
+            self._locks.pop(session_id, None)
+
+    def _session(self, session_id):
+        session = database.get_upload_session(session_id)
+        if session is None or not os.path.exists(self._path(session_id)):
+            raise UploadRejected('Unknown upload session', 404)
+        return session
+
+    def create(self, channel_id, mac, size=None, captured_at_ms=None):
+        """
+        Start a session for one clip.
+
+        Args:
+            channel_id (int): The channel the clip belongs to
+            mac (str): The uploading device
+            size (int): Total clip size, if the device knows it
+            captured_at_ms (int): Device capture time in epoch milliseconds
+
+        Returns:
+            dict: The session, with offset 0
+        """
+        if size is not None and size <= 0:
+            raise UploadRejected('Invalid size')
+        if size is not None and self.max_bytes and size > self.max_bytes:
+            raise UploadRejected('Upload exceeds the maximum size', 413)
+        session_id = new_ulid()
+        open(self._path(session_id), 'xb').close()
+        try:
+            database.create_upload_session(session_id, channel_id, mac, size, captured_at_ms, now_ms())
+        except Exception:
+            os.remove(self._path(session_id))
+            raise
+        return self.status(session_id)
+
+    def status(self, session_id):
+        """
+        Return a session with its received offset.
+
+        Raises:
+            UploadRejected: Unknown (or collected) session
+        """
+        session = self._session(session_id)
+        session['offset'] = os.path.getsize(self._path(session_id))
+        return session
+
+    def append(self, session_id, offset, stream):
+        """
+        Append a chunk at offset.
+
+        Data from an interrupted request is kept up to where it stopped, so
+        the client resumes from whatever status() reports.
+
+        Args:
+            session_id (str): The session
+            offset (int): Where the chunk starts; must equal the received offset
+            stream: Readable request body
+
+        Returns:
+            int: The new received offset
+
+        Raises:
+            UploadRejected: Unknown session (404), wrong offset (409), too
+                much data (413) or not a WAV/MP3 file (400)
+        """
+        with self._lock(session_id):
+            session = self._session(session_id)
+            path = self._path(session_id)
+            received = os.path.getsize(path)
+            if offset != received:
+                raise UploadRejected(f'Expected offset {received}', 409)
+            limit = session['size'] or self.max_bytes
+
+            with open(path, 'ab') as f:
+                try:
+                    written = 0
+                    while True:
+                        chunk = stream.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        if limit and received + written > limit:
+                            raise UploadRejected('Upload exceeds the maximum size', 413)
+                        f.write(chunk)
+                    if received < MAX_HEADER_BYTES and written:
+                        f.flush()
+                        with open(path, 'rb') as head:
+                            try:
+                                sniff_audio_header(head.read(MAX_HEADER_BYTES))
+                            except ValueError as e:
+                                raise UploadRejected(f"Invalid audio file: {str(e)}")
+                except UploadRejected:
+                    # Refused chunks are dropped whole
+                    f.truncate(received)
+                    raise
+                finally:
+                    f.flush()
+                    os.fsync(f.fileno())
+            return os.path.getsize(path)
+
+    def finalize(self, session_id, final_path):
+        """
+        Check the complete clip and move it to final_path.
+
+        Returns:
+            dict: The session plus size, sha256 and format of the clip
+
+        Raises:
+            UploadRejected: Unknown session (404), incomplete clip (409) or
+                not a WAV/MP3 file (400, the session is discarded)
+        """
+        with self._lock(session_id):
+            session = self._session(session_id)
+            path = self._path(session_id)
+            size = os.path.getsize(path)
+            if not size or (session['size'] and size != session['size']):
+                raise UploadRejected(f"Upload incomplete: {size} of {session['size'] or 'unknown'} bytes received", 409)
+
+            digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                head = f.read(MAX_HEADER_BYTES)
+                digest.update(head)
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            try:
+                audio_format = sniff_audio_header(head, complete=True)
+            except ValueError as e:
+                self._discard(session_id)
+                raise UploadRejected(f"Invalid audio file: {str(e)}")
+
+            os.replace(path, final_path)
+            database.delete_upload_session(session_id)
+        self._forget(session_id)
+        return dict(session, size=size, sha256=digest.hexdigest(), format=audio_format)
+
+    def abort(self, session_id):
+        """Discard a session and its data; returns True if it existed."""
+        with self._lock(session_id):
+            existed = self._discard(session_id)
+        self._forget(session_id)
+        return existed
+
+    def _discard(self, session_id):
+        existed = database.delete_upload_session(session_id)
+        try:
+            os.remove(self._path(session_id))
+            existed = True
+        except FileNotFoundError:
+            pass
+        return existed
+
+    def run_once(self):
+        """
+        Discard sessions not written to for ttl_seconds, and partial files
+        without a session.
+
+        Returns:
+            int: Sessions and files removed
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        sessions = {s['id'] for s in database.get_upload_sessions()}
+        for session_id in sessions:
+            try:
+                last_write = os.path.getmtime(self._path(session_id))
+            except FileNotFoundError:
+                last_write = 0
+            if last_write < cutoff:
+                self.abort(session_id)
+                removed += 1
+
+        for entry in os.scandir(self.directory):
+            session_id = entry.name[:-len('.part')]
+            if (entry.name.endswith('.part') and session_id not in sessions
+                    and entry.stat().st_mtime < cutoff):
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError as e:
+                    error_logger.error(f"Failed to remove stale upload {entry.path}: {str(e)}")
+
+        if removed:
+            db_logger.info(f"Removed {removed} stale upload sessions")
+        return removed
+
+
+# Singleton instance
+_upload_sessions = None
+_upload_sessions_lock = threading.Lock()
+
+def get_upload_sessions():
+    """Get the singleton session store (default settings until init_upload_sessions runs)."""
+    global _upload_sessions
+    if _upload_sessions is None:
+        with _upload_sessions_lock:
+            if _upload_sessions is None:
+                _upload_sessions = UploadSessions()
+    return _upload_sessions
+
+def init_upload_sessions(**kwargs):
+    """Create the singleton session store and start collecting stale sessions."""
+    global _upload_sessions
+    with _upload_sessions_lock:
+        if _upload_sessions is None or not _upload_sessions.running:
+            _upload_sessions = UploadSessions(**kwargs)
+            _upload_sessions.start()
+    return _upload_sessions
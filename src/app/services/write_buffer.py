@@ -0,0 +1,174 @@
+# app/services/write_buffer.py
+import atexit
+import threading
+from concurrent.futures import Future
+from ..utils.logging_setup import error_logger, db_logger
+from . import database
+
+# full:    write through, fsync every commit (synchronous=FULL)
+# normal:  write through, WAL commits may be lost on power failure (synchronous=NORMAL)
+# batched: write behind, additionally loses at most one flush window of writes
+DURABILITY_MODES = ('full', 'normal', 'batched')
+
+
+class _PendingWrite:
+    __slots__ = ('key', 'fn', 'args', 'kwargs', 'futures')
+
+    def __init__(self, key, fn, args, kwargs, future):
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = [future]
+
+
+class WriteBehindBuffer:
+    """
+    Coalesce database writes into one transaction per flush.
+
+    Writers submit a database function and get a Future back. Pending writes
+    are committed together every flush_ms or as soon as max_rows are
+    waiting, so a burst of clips costs one fsync instead of one per clip.
+    Each write runs in its own savepoint, so one failing write does not roll
+    back the rest of the batch. Writes submitted with the same key replace
+    the pending one (e.g. successive status changes for one file).
+    Futures resolve, and their callbacks run, only after the commit.
+    """
+
+    def __init__(self, flush_ms=200, max_rows=100, durability='batched'):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.flush_interval = flush_ms / 1000
+        self.max_rows = max_rows
+        self.durability = durability
+        self.running = False
+        self.thread = None
+        self._pending = []
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        """Apply the durability mode and start the flush loop (batched mode only)."""
+        database.set_synchronous('FULL' if self.durability == 'full' else 'NORMAL')
+        if self.durability != 'batched':
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        db_logger.info(
+            f"Write-behind buffer started (flush every {int(self.flush_interval * 1000)} ms "
+            f"or {self.max_rows} rows)"
+        )
+
+    def stop(self):
+        """Stop the flush loop and commit anything still pending."""
+        self.running = False
+        self._wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5.0)
+            self.thread = None
+        self.flush()
+
+    def submit(self, fn, *args, key=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) for the next flush.
+
+        Args:
+            fn (callable): A database function; it joins the flush transaction
+            key (hashable): Optional coalescing key, a later write with the
+                same key supersedes a pending one
+
+        Returns:
+            Future: Resolves to fn's return value once committed
+        """
+        future = Future()
+        write = _PendingWrite(key, fn, args, kwargs, future)
+        if not self.running:
+            # Write-through modes (or before start/after stop)
+            self._execute([write])
+            return future
+
+        with self._lock:
+            previous = self._keys.get(key) if key is not None else None
+            if previous is not None:
+                previous.fn = None
+                write.futures[:0] = previous.futures
+            self._pending.append(write)
+            if key is not None:
+                self._keys[key] = write
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self._wakeup.set()
+        return future
+
+    def flush(self):
+        """Commit every pending write now."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._keys = self._pending, [], {}
+            if batch:
+                self._execute(batch)
+
+    def _run(self):
+        while self.running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                error_logger.error(f"Error flushing write-behind buffer: {str(e)}")
+
+    def _execute(self, batch):
+        outcomes = []
+        try:
+            with database.transaction() as conn:
+                for write in batch:
+                    if write.fn is None:
+                        continue  # superseded by a later write with the same key
+                    conn.execute('SAVEPOINT write_behind')
+                    try:
+                        result = write.fn(*write.args, **write.kwargs)
+                        conn.execute('RELEASE write_behind')
+                        outcomes.append((write, result, None))
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO write_behind')
+                        conn.execute('RELEASE write_behind')
+                        outcomes.append((write, None, e))
+        except Exception as e:
+            error_logger.error(f"Write-behind commit of {len(batch)} writes failed: {str(e)}")
+            outcomes = [(write, None, e) for write in batch if write.fn is not None]
+
+        for write, result, exc in outcomes:
+            if exc is not None:
+                error_logger.error(f"Buffered write {write.fn.__name__} failed: {str(exc)}")
+            for future in write.futures:
+                if exc is not None:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+
+
+# Singleton instance
+_write_buffer = None
+_write_buffer_lock = threading.Lock()
+
+def get_write_buffer():
+    """Get the singleton buffer; until init_write_buffer runs, writes go straight through."""
+    global _write_buffer
+    if _write_buffer is None:
+        with _write_buffer_lock:
+            if _write_buffer is None:
+                _write_buffer = WriteBehindBuffer(durability='normal')
+    return _write_buffer
+
+def init_write_buffer(**kwargs):
+    """Create and start the singleton buffer with the given settings."""
+    global _write_buffer
+    with _write_buffer_lock:
+        if _write_buffer is None or not _write_buffer.running:
+            _write_buffer = WriteBehindBuffer(**kwargs)
+            _write_buffer.start()
+    return _write_buffer
@@ -0,0 +1,69 @@
+# app/utils/config_cache.py
+import functools
+import hashlib
+import threading
+from flask import Response, make_response, request
+from ..services import database
+from ..services.channel_registry import get_channel_registry
+from ..services.settings_service import get_settings_service
+from .logging_setup import error_logger
+
+# Stores whose views read an in-memory snapshot that only re-checks the
+# database periodically; refreshed before a rebuild so the body matches its stamp
+SNAPSHOT_REFRESHERS = {
+    'channels': lambda: get_channel_registry().refresh(),
+    'settings': lambda: get_settings_service().refresh(),
+}
+
+
+def cached_config_response(*stores):
+    """
+    Cache a GET view's response until one of its config stores changes.
+
+    The serialized body is kept together with the stores' version counters
+    and rebuilt only when a write (from any process) moved one of them, so
+    a poll costs one small version query. Responses carry a strong ETag
+    derived from the body and answer If-None-Match with 304. Only 200
+    responses are cached; anything else is returned as the view made it.
+    The view's payload must not depend on the request's arguments.
+
+    Args:
+        stores (str): The config stores the view's payload is built from
+    """
+    def decorator(view):
+        lock = threading.Lock()
+        cached = {}
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                versions = database.get_config_versions()
+            except Exception as e:
+                error_logger.error(f"Error checking config versions for {view.__name__}: {str(e)}")
+                return view(*args, **kwargs)
+            # Read before building, so a concurrent write can only make the body newer than its stamp
+            stamp = tuple(versions.get(store, 0) for store in stores)
+
+            entry = cached.get('entry')
+            if entry is None or entry[0] != stamp:
+                with lock:
+                    entry = cached.get('entry')
+                    if entry is None or entry[0] != stamp:
+                        for store in stores:
+                            if store in SNAPSHOT_REFRESHERS:
+                                SNAPSHOT_REFRESHERS[store]()
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        body = response.get_data()
+                        entry = (stamp, hashlib.sha1(body).hexdigest(), body, response.mimetype)
+                        cached['entry'] = entry
+
+            response = Response(entry[2], mimetype=entry[3])
+            response.set_etag(entry[1])
+            # Let clients keep the body but revalidate it on every poll
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,125 @@
+# app/utils/recording_ids.py
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Crockford base32, as used by ULID
+_ULID_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+# Device capture times further than this from the receive time are ignored
+MAX_CAPTURE_SKEW_MS = 7 * 24 * 3600 * 1000
+
+_ulid_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def now_ms():
+    """Current UTC time as integer milliseconds since the epoch."""
+    return time.time_ns() // 1_000_000
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        chars.append(_ULID_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def new_ulid(timestamp_ms=None):
+    """
+    Generate a monotonic ULID.
+
+    Ids generated within the same millisecond increment the random part
+    instead of drawing a new one, so ids from this process always sort in
+    generation order and never repeat, however high the request rate.
+
+    Args:
+        timestamp_ms (int): Millisecond timestamp to encode (default: now)
+
+    Returns:
+        str: 26 character Crockford base32 ULID
+    """
+    global _last_ms, _last_random
+    with _ulid_lock:
+        ms = now_ms() if timestamp_ms is None else int(timestamp_ms)
+        if ms <= _last_ms:
+            # Same (or an earlier, clock-stepped) millisecond: keep ordering
+            ms = _last_ms
+            random_part = _last_random + 1
+            if random_part > _RANDOM_MAX:
+                ms += 1
+                random_part = int.from_bytes(os.urandom(10), 'big')
+        else:
+            random_part = int.from_bytes(os.urandom(10), 'big')
+        _last_ms, _last_random = ms, random_part
+    return _encode(ms, 10) + _encode(random_part, 16)
+
+
+def format_timestamp(timestamp_ms):
+    """Format epoch milliseconds as the UTC '%Y%m%d_%H%M%S' string stored in recordings.timestamp."""
+    return datetime.fromtimestamp(timestamp_ms / 1000, timezone.utc).strftime('%Y%m%d_%H%M%S')
+
+
+def recording_filename(received_at_ms):
+    """
+    Build a collision-free filename for an uploaded clip.
+
+    The readable second-resolution prefix is kept for operators browsing the
+    recordings directory; the ULID suffix makes every name unique.
+    """
+    return f"audio_{format_timestamp(received_at_ms)}_{new_ulid(received_at_ms)}.wav"
+
+
+def parse_captured_at(value, received_at_ms, strict=False):
+    """
+    Parse a device-supplied capture time.
+
+    Accepts epoch milliseconds, epoch seconds (with or without a fraction) or
+    an ISO 8601 string. A missing value, or one implausibly far from the
+    receive time, falls back to the receive time. So does a value that
+    cannot be parsed (including NaN and infinities), unless strict is set.
+
+    Args:
+        value (str): Raw value from the upload request, may be None
+        received_at_ms (int): Server receive time in epoch milliseconds
+        strict (bool): Raise instead of falling back on an unparseable value
+
+    Returns:
+        int: Capture time in epoch milliseconds
+
+    Raises:
+        ValueError: strict is set and the value cannot be parsed
+    """
+    if value in (None, ''):
+        return received_at_ms
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    captured = None
+    if number is not None:
+        if math.isfinite(number):
+            # Ten digit values are seconds, thirteen digit values milliseconds
+            captured = int(number * 1000) if abs(number) < 1e11 else int(number)
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            captured = int(parsed.timestamp() * 1000)
+        except (ValueError, OverflowError, OSError):
+            pass
+
+    if captured is None:
+        if strict:
+            raise ValueError(f"Unusable captured_at: {value!r}")
+        return received_at_ms
+    if abs(captured - received_at_ms) > MAX_CAPTURE_SKEW_MS:
+        return received_at_ms
+    return captured
@@ -0,0 +1,77 @@
+# app/utils/wav_info.py
+import wave
+
+
+def wav_duration_ms(path):
+    """
+    Read the duration of a WAV file from its header.
+
+    Args:
+        path (str): Path to the audio file
+
+    Returns:
+        int or None: Duration in milliseconds, None if the file is not a
+        readable PCM WAV file
+    """
+    try:
+        with wave.open(path, 'rb') as wav:
+            rate = wav.getframerate()
+            if not rate:
+                return None
+            return int(wav.getnframes() * 1000 / rate)
+    except (wave.Error, EOFError, OSError):
+        return None
+
+
+# PCM, IEEE float and WAVE_FORMAT_EXTENSIBLE
+WAV_FORMAT_TAGS = (1, 3, 0xFFFE)
+# How far into the file the fmt chunk may be
+MAX_HEADER_BYTES = 4096
+
+
+def sniff_audio_header(head, complete=False):
+    """
+    Check the start of an uploaded clip while it is still arriving.
+
+    Args:
+        head (bytes): The first bytes of the file
+        complete (bool): True if head is the whole file (or MAX_HEADER_BYTES)
+
+    Returns:
+        str or None: 'wav' or 'mp3' once the format is recognized, None if
+        more bytes are needed to decide
+
+    Raises:
+        ValueError: The data is not a plausible WAV or MP3 file
+    """
+    if len(head) >= 3 and (head[:3] == b'ID3' or (head[0] == 0xFF and head[1] & 0xE0 == 0xE0)):
+        return 'mp3'
+    if len(head) < 12:
+        if complete:
+            raise ValueError("not a WAV or MP3 file")
+        return None
+    if head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        raise ValueError("not a WAV or MP3 file")
+
+    offset = 12
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size = int.from_bytes(head[offset + 4:offset + 8], 'little')
+        if chunk_id == b'fmt ':
+            if offset + 24 > len(head):
+                break
+            format_tag = int.from_bytes(head[offset + 8:offset + 10], 'little')
+            channels = int.from_bytes(head[offset + 10:offset + 12], 'little')
+            rate = int.from_bytes(head[offset + 12:offset + 16], 'little')
+            bits = int.from_bytes(head[offset + 22:offset + 24], 'little')
+            if format_tag not in WAV_FORMAT_TAGS or not channels or not rate or bits not in (8, 16, 24, 32):
+                raise ValueError("unsupported WAV format")
+            return 'wav'
+        if chunk_id == b'data':
+            raise ValueError("WAV data chunk before fmt chunk")
+        # Chunks are word aligned
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    if complete or len(head) >= MAX_HEADER_BYTES:
+        raise ValueError("WAV fmt chunk not found")
+    return None
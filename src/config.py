@@ -5,3 +5,47 @@ class Config:
     UPLOAD_PORT = 4002
     EVENT_PORT = 4000
     EVENT_HOST = '127.0.0.1'
+    RECORDINGS_PAGE_SIZE = 500
+    RECORDINGS_MAX_PAGE_SIZE = 5000
+    STREAM_PORT = 4001
+    STREAM_HEARTBEAT_SECONDS = 15
+    RECONCILE_INTERVAL_SECONDS = 60
+    RECONCILE_BATCH_SIZE = 500
+    RECONCILE_GRACE_SECONDS = 3600
+    RECONCILE_DELETE_ORPHAN_FILES = True
+    # 'full' fsyncs every write, 'normal' writes through with WAL's relaxed
+    # syncing, 'batched' also buffers writes for up to one flush window
+    WRITE_DURABILITY = 'batched'
+    WRITE_BUFFER_FLUSH_MS = 200
+    WRITE_BUFFER_MAX_ROWS = 100
+    MAX_CONTENT_LENGTH = 32 * 1024 * 1024  # Largest accepted request body (and upload)
+    UPLOAD_RATE_PER_MINUTE = 60  # Sustained uploads per device; 0 disables the limit
+    UPLOAD_RATE_BURST = 30
+    BATCH_MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # /api/uploads/batch; MAX_CONTENT_LENGTH still applies per clip
+    BATCH_MAX_CLIPS = 1000
+    UPLOAD_SESSION_TTL_HOURS = 24  # Resumable uploads untouched this long are discarded
+    UPLOAD_SESSION_GC_INTERVAL_SECONDS = 3600
+    DEVICE_OFFLINE_SECONDS = 90  # A device is offline when it has not pinged for this long
+    DEVICE_PERSIST_INTERVAL_SECONDS = 30
+    STATS_DEFAULT_BUCKETS = 60
+    STATS_MAX_BUCKETS = 2000
+    RETENTION_INTERVAL_SECONDS = 300
+    # Per-channel policy keys: max_age_days, max_recordings, evict_for_space
+    RETENTION_DEFAULT_POLICY = {'max_age_days': None, 'max_recordings': None, 'evict_for_space': True}
+    RETENTION_CHANNEL_POLICIES = {}
+    RETENTION_MIN_FREE_MB = 2048
+    RETENTION_TARGET_FREE_MB = 4096
+    RETENTION_ARCHIVE_DIR = None  # e.g. a USB drive; None deletes pruned audio
+    RETENTION_BATCH_SIZE = 200
+    RETENTION_BATCH_PAUSE_SECONDS = 0.5
+    RETENTION_VACUUM_PAGES = 2048
+    SYNC_CURSOR_MAX_AGE_HOURS = 168  # /api/sync clients idle longer than this get a full snapshot
+    ARCHIVE_ENABLED = True
+    ARCHIVE_FORMAT = 'opus'  # 'opus' or 'flac'; Opus falls back to FLAC for unsupported sample rates
+    ARCHIVE_HOT_WINDOW_HOURS = 24
+    ARCHIVE_INTERVAL_SECONDS = 300
+    ARCHIVE_BATCH_SIZE = 50
+    ARCHIVE_COMPRESSION_LEVEL = None  # libsndfile 0.0 (best quality) .. 1.0 (smallest); None uses its default
+    AUDIO_CACHE_MAX_AGE = 365 * 24 * 3600
+    # Let a fronting nginx/Apache send audio files (X-Sendfile) instead of Python
+    USE_X_SENDFILE = False
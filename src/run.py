@@ -2,8 +2,15 @@
 import os
 import logging
 from waitress import serve
-from app import create_app
-from app.services.audio_handler import init_audio_handler
+from app import create_app, create_stream_app
+from app.services.audio_handler import init_audio_handler, is_upload_pending
+from app.services.reconciler import init_reconciler
+from app.services.retention import init_retention_service
+from app.services.audio_archiver import init_audio_archiver
+from app.services.write_buffer import init_write_buffer
+from app.services.device_presence import init_device_presence
+from app.services.upload_ingest import init_upload_rate_limiter
+from app.services.upload_sessions import init_upload_sessions
 from config import Config
 from flask_cors import CORS
 from app.routes.audio_routes import settings_bp
@@ -22,6 +29,10 @@ try:
     import netifaces  # Only required on Linux/Raspberry Pi
 except ImportError:
     netifaces = None  # Allow running on Windows without netifaces
+try:
+    from gevent.pywsgi import WSGIServer  # Serves the SSE stream without a thread per client
+except ImportError:
+    WSGIServer = None
 
 
 # Configure logging
@@ -110,8 +121,30 @@ def register_mdns_service():
             zeroconf.close()
             logger.info("mDNS service unregistered")
 
+# SSE clients hold their connection open indefinitely. Serving them from waitress
+# would pin one of its worker threads per dashboard, so /api/stream runs on a
+# separate gevent server whose greenlets cost almost nothing while idle.
+def run_stream_server():
+    if WSGIServer is None:
+        logger.warning("gevent is not installed, /api/stream is unavailable")
+        return
+    try:
+        stream_app = create_stream_app(Config)
+        CORS(stream_app, resources={r"/api/*": {"origins": "*"}})
+        logger.info(f"Starting stream server on {Config.FLASK_HOST}:{Config.STREAM_PORT}")
+        WSGIServer((Config.FLASK_HOST, Config.STREAM_PORT), stream_app, log=None).serve_forever()
+    except Exception as e:
+        logger.error(f"Error running stream server: {e}")
+
 def main():
     try:
+        # Apply the durability mode before any worker opens a connection
+        init_write_buffer(
+            flush_ms=Config.WRITE_BUFFER_FLUSH_MS,
+            max_rows=Config.WRITE_BUFFER_MAX_ROWS,
+            durability=Config.WRITE_DURABILITY
+        )
+
         # Initialize the DB
         initialize_db()
         logger.info("Database initialized successfully")
@@ -119,6 +152,31 @@ def main():
         logger.error(f"Error initializing database: {e}")
         raise
 
+    try:
+        # Track device pings in memory, persisting them lazily
+        init_device_presence(
+            offline_after=Config.DEVICE_OFFLINE_SECONDS,
+            persist_interval=Config.DEVICE_PERSIST_INTERVAL_SECONDS
+        )
+        logger.info("Device presence started")
+    except Exception as e:
+        logger.error(f"Error starting device presence: {e}")
+        raise
+
+    init_upload_rate_limiter(rate_per_minute=Config.UPLOAD_RATE_PER_MINUTE, burst=Config.UPLOAD_RATE_BURST)
+
+    try:
+        # Resumable uploads, with stale sessions collected in the background
+        init_upload_sessions(
+            max_bytes=Config.MAX_CONTENT_LENGTH,
+            ttl_seconds=Config.UPLOAD_SESSION_TTL_HOURS * 3600,
+            interval=Config.UPLOAD_SESSION_GC_INTERVAL_SECONDS
+        )
+        logger.info("Upload sessions initialized")
+    except Exception as e:
+        logger.error(f"Error initializing upload sessions: {e}")
+        raise
+
     try:
         # Create Flask app instance
         app = create_app(Config)
@@ -148,8 +206,8 @@ def main():
         raise
 
     try:
-        # Enable CORS globally
-        CORS(app, resources={r"/api/*": {"origins": "*"}})
+        # Enable CORS globally; browsers only let scripts read listed response headers
+        CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["X-Next-Before-Id"]}})
         logger.info("CORS enabled")
 
         # Initialize audio handler
@@ -163,6 +221,54 @@ def main():
         logger.error(f"Error starting audio handler: {e}")
         raise
 
+    try:
+        # Keep file_present/file_size in step with the recordings directories
+        init_reconciler(
+            interval=Config.RECONCILE_INTERVAL_SECONDS,
+            batch_size=Config.RECONCILE_BATCH_SIZE,
+            grace_seconds=Config.RECONCILE_GRACE_SECONDS,
+            delete_orphan_files=Config.RECONCILE_DELETE_ORPHAN_FILES,
+            is_pending=is_upload_pending
+        )
+        logger.info("Filesystem reconciler started")
+    except Exception as e:
+        logger.error(f"Error starting filesystem reconciler: {e}")
+        raise
+
+    try:
+        # Prune old recordings by age, count and free disk space
+        init_retention_service(
+            interval=Config.RETENTION_INTERVAL_SECONDS,
+            default_policy=Config.RETENTION_DEFAULT_POLICY,
+            channel_policies=Config.RETENTION_CHANNEL_POLICIES,
+            min_free_mb=Config.RETENTION_MIN_FREE_MB,
+            target_free_mb=Config.RETENTION_TARGET_FREE_MB,
+            archive_dir=Config.RETENTION_ARCHIVE_DIR,
+            batch_size=Config.RETENTION_BATCH_SIZE,
+            batch_pause=Config.RETENTION_BATCH_PAUSE_SECONDS,
+            vacuum_pages=Config.RETENTION_VACUUM_PAGES,
+            sync_cursor_max_age_hours=Config.SYNC_CURSOR_MAX_AGE_HOURS
+        )
+        logger.info("Retention service started")
+    except Exception as e:
+        logger.error(f"Error starting retention service: {e}")
+        raise
+
+    try:
+        # Transcode transcribed clips past the hot window to compressed audio
+        if Config.ARCHIVE_ENABLED:
+            init_audio_archiver(
+                audio_format=Config.ARCHIVE_FORMAT,
+                hot_window_hours=Config.ARCHIVE_HOT_WINDOW_HOURS,
+                interval=Config.ARCHIVE_INTERVAL_SECONDS,
+                batch_size=Config.ARCHIVE_BATCH_SIZE,
+                compression_level=Config.ARCHIVE_COMPRESSION_LEVEL
+            )
+            logger.info("Audio archiver started")
+    except Exception as e:
+        logger.error(f"Error starting audio archiver: {e}")
+        raise
+
     try:
         # Start mDNS service in a background thread
         mdns_thread = threading.Thread(target=register_mdns_service, daemon=True)
@@ -172,6 +278,15 @@ def main():
         logger.error(f"Error starting mDNS service thread: {e}")
         raise
 
+    try:
+        # Start the SSE stream server in a background thread
+        stream_thread = threading.Thread(target=run_stream_server, daemon=True)
+        stream_thread.start()
+        logger.info("Stream server thread started")
+    except Exception as e:
+        logger.error(f"Error starting stream server thread: {e}")
+        raise
+
     try:
         # Run the app with Waitress
         logger.info(f"Starting production server on {Config.FLASK_HOST}:{Config.FLASK_PORT}")
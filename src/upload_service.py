@@ -1,13 +1,21 @@
 from flask import Flask, request, jsonify, Blueprint
 import os
 import json
-import sqlite3
 from datetime import datetime
 import logging
 from pytz import timezone
 import time
 import requests
 from config import Config
+from app.services import database
+from app.services.write_buffer import get_write_buffer, init_write_buffer
+from app.services.channel_registry import get_channel_registry
+from app.services.upload_ingest import (
+    receive_upload, UploadRejected, admit_device_upload, init_upload_rate_limiter, DEDUP_WINDOW_MS,
+    duplicate_upload_body
+)
+from app.utils.recording_ids import now_ms, format_timestamp, recording_filename, parse_captured_at
+from app.utils.wav_info import wav_duration_ms
 
 # Set up logging
 error_logger = logging.getLogger('error_logger')
@@ -17,49 +25,16 @@ error_logger.addHandler(handler)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
 audio_bp = Blueprint('audio', __name__)
 
 # Configuration
-CHANNELS_JSON_PATH = os.path.join('db', 'channels.json')
-DB_PATH = os.path.join('db', 'default.db')
 QUEUE_JSON_PATH = os.path.join('db', 'queue.json')
-ALLOWED_EXTENSIONS = {'wav', 'mp3'}
-CHANNELS = []
 QUEUE_URL = f'http://{Config.EVENT_HOST}:{Config.EVENT_PORT}/api/uploads/queue'
 
-# Database connection with retry mechanism
-def get_db_connection():
-    for _ in range(5):
-        try:
-            conn = sqlite3.connect(DB_PATH, timeout=10)
-            conn.execute('PRAGMA journal_mode=WAL;')
-            return conn
-        except sqlite3.OperationalError as e:
-            if 'database is locked' in str(e):
-                time.sleep(0.1)
-                continue
-            raise
-    raise sqlite3.OperationalError("Database is locked after multiple retries")
-
 # Database initialization
 def init_db():
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recordings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                channel_id INTEGER,
-                filename TEXT,
-                timestamp TEXT,
-                transcription TEXT,
-                status TEXT DEFAULT 'new'
-            )
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_recordings_timestamp
-            ON recordings(timestamp DESC)
-        ''')
-        conn.commit()
+    database.run_migrations()
 
 # Initialize queue.json if it doesn't exist
 def init_queue_file():
@@ -67,45 +42,19 @@ def init_queue_file():
         with open(QUEUE_JSON_PATH, 'w') as f:
             json.dump([], f)
 
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def get_channel_id_from_mac(mac, refresh=False):
-    global CHANNELS
-    
-    if refresh:
-        try:
-            with open(CHANNELS_JSON_PATH, 'r') as f:
-                CHANNELS = json.load(f)
-        except Exception as e:
-            error_logger.error(f"Error refreshing channels from JSON: {str(e)}")
-    
-    if mac:
-        mac = mac.upper()
-        for channel in CHANNELS:
-            if channel.get('mac') == mac:
-                return channel.get('id')
-    return None
-
-def get_channel_details(channel_id):
-    for channel in CHANNELS:
-        if channel.get('id') == channel_id:
-            return channel
-    return None
-
 class AudioHandler:
-    def queue_upload_for_processing(self, file_path, channel_id):
+    def queue_upload_for_processing(self, file_path, channel_id, captured_at_ms, received_at_ms, content_hash=None):
         try:
-            utc_tz = timezone('UTC')
-            timestamp = datetime.now(utc_tz).strftime('%Y%m%d_%H%M%S')
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    'INSERT INTO recordings (channel_id, filename, timestamp, status) VALUES (?, ?, ?, ?)',
-                    (channel_id, file_path, timestamp, 'queued')
-                )
-                conn.commit()
+            timestamp = format_timestamp(captured_at_ms)
+            # Wait for the commit: the main process may delete this row as
+            # soon as the upload is forwarded
+            get_write_buffer().submit(
+                database.insert_queued_recording,
+                channel_id, file_path, timestamp,
+                captured_at_ms=captured_at_ms, received_at_ms=received_at_ms,
+                duration_ms=wav_duration_ms(os.path.join(os.getcwd(), file_path)),
+                content_hash=content_hash
+            ).result()
             
             return True, {
                 'timestamp': timestamp,
@@ -117,112 +66,100 @@ class AudioHandler:
 def get_audio_handler():
     return AudioHandler()
 
+def set_recording_status(relative_path, status):
+    # Keyed so only the latest pending status for a file is written
+    get_write_buffer().submit(
+        database.update_recording_status, relative_path, status,
+        key=('status', relative_path)
+    )
+
 @audio_bp.route('/api/uploads', methods=['POST'])
 def upload_audio():
     try:
+        received_at_ms = now_ms()
         mac = request.args.get('mac')
-        if not mac:
-            return jsonify({'error': 'MAC address is required'}), 400
+        channel_id = admit_device_upload(mac)
 
-        channel_id = get_channel_id_from_mac(mac, refresh=True)
-        if channel_id is None:
-            return jsonify({'error': 'Invalid MAC address'}), 400
+        utc_tz = timezone('UTC')
+        filename = recording_filename(received_at_ms)
+        relative_path = os.path.join('recordings', f'channel_{channel_id}', filename)
+        absolute_path = os.path.join(os.getcwd(), relative_path)
 
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file part in the request'}), 400
-
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected for uploading'}), 400
-
-        if file and allowed_file(file.filename):
-            utc_tz = timezone('UTC')
-            current_time = datetime.now(utc_tz).strftime('%Y%m%d_%H%M%S')
-            filename = f"audio_{current_time}.wav"
-            relative_path = os.path.join('recordings', f'channel_{channel_id}', filename)
-            absolute_path = os.path.join(os.getcwd(), relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        # Stream the body straight to its final path, hashing and checking it on the way
+        form, clip = receive_upload(request, absolute_path, Config.MAX_CONTENT_LENGTH)
+        try:
+            captured_at_ms = parse_captured_at(
+                request.args.get('captured_at') or form.get('captured_at'),
+                received_at_ms
+            )
 
-            os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
-            file.save(absolute_path)
+            # A retried upload of a clip that is already stored is not stored again
+            duplicate = database.find_duplicate_recording(
+                channel_id, clip.sha256, received_at_ms - DEDUP_WINDOW_MS, exclude_filename=relative_path
+            )
+            if duplicate:
+                clip.discard()
+                return jsonify(duplicate_upload_body(
+                    duplicate, format_timestamp(captured_at_ms), channel_id, get_channel_registry().get(channel_id)
+                )), 200
 
             audio_handler = get_audio_handler()
-            success, result = audio_handler.queue_upload_for_processing(relative_path, channel_id)
+            success, result = audio_handler.queue_upload_for_processing(
+                relative_path, channel_id, captured_at_ms, received_at_ms, content_hash=clip.sha256
+            )
+        except Exception:
+            # Never leave a clip on disk that no row points at
+            clip.discard()
+            raise
 
-            if success:
-                channel_details = get_channel_details(channel_id)
-               
-                
-                # Prepare dynamic data for queue request
-                queue_params = {
-                    'mac': mac,
-                    'relative_path': relative_path,
-                    'channel_id': str(channel_id)
-                }
+        if success:
+            channel_details = get_channel_registry().get(channel_id)
+           
+            
+            # Prepare dynamic data for queue request
+            queue_params = {
+                'mac': mac,
+                'relative_path': relative_path,
+                'channel_id': str(channel_id),
+                'captured_at_ms': str(captured_at_ms),
+                'received_at_ms': str(received_at_ms),
+                'content_hash': clip.sha256
+            }
+            
+            # Make POST request to queue endpoint
+            try:
+                queue_response = requests.post(QUEUE_URL, params=queue_params)
+                queue_data = queue_response.json()
                 
-                # Make POST request to queue endpoint
-                try:
-                    queue_response = requests.post(QUEUE_URL, params=queue_params)
-                    queue_data = queue_response.json()
+                if queue_response.status_code == 200 and queue_data.get('duplicate_of'):
+                    # The main process already dropped this copy and its row
+                    return jsonify(duplicate_upload_body(
+                        queue_data['duplicate_of'], result.get('timestamp'), channel_id, channel_details
+                    )), 200
+                if queue_response.status_code == 200 and queue_data.get('message') == 'OK':
+                     #HERE IS SUCCUSS THAN UPDATE COM PLETED IN DB
+                    set_recording_status(relative_path, 'completed')
+                    return jsonify({
+                        'message': 'File uploaded successfully and queued for processing',
+                        'filename': relative_path,
+                        'timestamp': result.get('timestamp'),
+                        'status': result.get('status'),
+                        'channel_id': channel_id,
+                        'channel_details': channel_details,
+                        'size': clip.size,
+                        'sha256': clip.sha256
+                    }), 200
+                else:
+                    # If queue fails, add to queue.json
+                    
                     
-                    if queue_response.status_code == 200 and queue_data.get('message') == 'OK':
-                         #HERE IS SUCCUSS THAN UPDATE COM PLETED IN DB
-                        with get_db_connection() as conn:
-                            cursor = conn.cursor()
-                            cursor.execute(
-                                'UPDATE recordings SET status = ? WHERE filename = ?',
-                                ('completed', relative_path)
-                            )
-                            conn.commit()
-                        return jsonify({
-                            'message': 'File uploaded successfully and queued for processing',
-                            'filename': relative_path,
-                            'timestamp': result.get('timestamp'),
-                            'status': result.get('status'),
-                            'channel_id': channel_id,
-                            'channel_details': channel_details
-                        }), 200
-                    else:
-                        # If queue fails, add to queue.json
-                        
-                        
-                        error_metadata = {
-                            'mac': mac,
-                            'relative_path': relative_path,
-                            'channel_id': channel_id,
-                            'timestamp': result.get('timestamp'),
-                            'error': queue_data.get('error', 'Unknown error'),
-                            'attempt_time': datetime.now(utc_tz).strftime('%Y%m%d_%H%M%S')
-                        }
-                        with open(QUEUE_JSON_PATH, 'r+') as f:
-                            queue_data = json.load(f)
-                            queue_data.append(error_metadata)
-                            f.seek(0)
-                            json.dump(queue_data, f, indent=2)
-                        
-                        return jsonify({
-                            'message': 'File uploaded but failed to queue',
-                            'filename': relative_path,
-                            'timestamp': result.get('timestamp'),
-                            'status': result.get('status'),
-                            'queue_error': queue_data.get('error')
-                        }), 200
-
-                except requests.exceptions.RequestException as e:
-                      #HERE IF FAILS THAN UPDATE QUEUE_FAILE IN DB
-                    with get_db_connection() as conn:
-                            cursor = conn.cursor()
-                            cursor.execute(
-                                'UPDATE recordings SET status = ? WHERE filename = ?',
-                                ('queue_failed', relative_path)
-                            )
-                            conn.commit()
-                    # Handle network errors
                     error_metadata = {
                         'mac': mac,
                         'relative_path': relative_path,
                         'channel_id': channel_id,
                         'timestamp': result.get('timestamp'),
-                        'error': str(e),
+                        'error': queue_data.get('error', 'Unknown error'),
                         'attempt_time': datetime.now(utc_tz).strftime('%Y%m%d_%H%M%S')
                     }
                     with open(QUEUE_JSON_PATH, 'r+') as f:
@@ -232,17 +169,44 @@ def upload_audio():
                         json.dump(queue_data, f, indent=2)
                     
                     return jsonify({
-                        'message': 'File uploaded but failed to queue due to network error',
+                        'message': 'File uploaded but failed to queue',
                         'filename': relative_path,
                         'timestamp': result.get('timestamp'),
                         'status': result.get('status'),
-                        'queue_error': str(e)
+                        'queue_error': queue_data.get('error')
                     }), 200
 
-            return jsonify({'error': f'Error queueing file: {result}'}), 500
-
-        return jsonify({'error': 'Allowed file types are wav, mp3'}), 400
-
+            except requests.exceptions.RequestException as e:
+                  #HERE IF FAILS THAN UPDATE QUEUE_FAILE IN DB
+                set_recording_status(relative_path, 'queue_failed')
+                # Handle network errors
+                error_metadata = {
+                    'mac': mac,
+                    'relative_path': relative_path,
+                    'channel_id': channel_id,
+                    'timestamp': result.get('timestamp'),
+                    'error': str(e),
+                    'attempt_time': datetime.now(utc_tz).strftime('%Y%m%d_%H%M%S')
+                }
+                with open(QUEUE_JSON_PATH, 'r+') as f:
+                    queue_data = json.load(f)
+                    queue_data.append(error_metadata)
+                    f.seek(0)
+                    json.dump(queue_data, f, indent=2)
+                
+                return jsonify({
+                    'message': 'File uploaded but failed to queue due to network error',
+                    'filename': relative_path,
+                    'timestamp': result.get('timestamp'),
+                    'status': result.get('status'),
+                    'queue_error': str(e)
+                }), 200
+
+        clip.discard()
+        return jsonify({'error': f'Error queueing file: {result}'}), 500
+
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status, e.headers
     except Exception as e:
         error_logger.error(f"Error in upload_audio: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -253,5 +217,11 @@ app.register_blueprint(audio_bp)
 if __name__ == '__main__':
     os.makedirs('db', exist_ok=True)
     init_db()
+    init_write_buffer(
+        flush_ms=Config.WRITE_BUFFER_FLUSH_MS,
+        max_rows=Config.WRITE_BUFFER_MAX_ROWS,
+        durability=Config.WRITE_DURABILITY
+    )
+    init_upload_rate_limiter(rate_per_minute=Config.UPLOAD_RATE_PER_MINUTE, burst=Config.UPLOAD_RATE_BURST)
     init_queue_file()
     app.run(host='0.0.0.0', port=Config.UPLOAD_PORT, debug=True)
\ No newline at end of file
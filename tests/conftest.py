@@ -0,0 +1,70 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+# The app resolves db/, logs/ and recordings/ against the working directory,
+# and its loggers open their files on import; keep all of that out of the tree
+os.chdir(tempfile.mkdtemp(prefix='scanner-tests-'))
+
+# Module-level singletons reset for every test
+SINGLETONS = (
+    ('app.services.channel_registry', '_channel_registry'),
+    ('app.services.settings_service', '_settings_service'),
+    ('app.services.keyword_alerts', '_keyword_matcher'),
+    ('app.services.write_buffer', '_write_buffer'),
+    ('app.services.device_presence', '_device_presence'),
+    ('app.services.upload_ingest', '_upload_rate_limiter'),
+    ('app.services.upload_sessions', '_upload_sessions'),
+    ('app.services.event_bus', '_event_bus'),
+    ('app.services.audio_handler', '_audio_handler'),
+)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in an empty working directory with a freshly migrated database."""
+    import importlib
+    from app.services import database
+
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('db')
+    database.close_all_connections()
+    for module_name, attribute in SINGLETONS:
+        monkeypatch.setattr(importlib.import_module(module_name), attribute, None)
+    database.run_migrations()
+    yield tmp_path
+    database.close_all_connections()
+
+
+@pytest.fixture
+def app(workdir):
+    from config import Config
+    from app import create_app
+    from app.routes.audio_routes import settings_bp
+
+    app = create_app(Config)
+    # Registered by run.py alongside create_app's blueprints
+    app.register_blueprint(settings_bp)
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def channel(workdir):
+    """A registered channel with a device MAC."""
+    from app.services.channel_registry import get_channel_registry
+
+    channel = {'id': 1, 'name': 'Channel 1', 'mac': 'AA:BB:CC:DD:EE:01', 'status': 'enabled'}
+    get_channel_registry().update(lambda channels: channels.append(dict(channel)))
+    return channel
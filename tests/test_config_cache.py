@@ -0,0 +1,52 @@
+# tests/test_config_cache.py
+import json
+import sqlite3
+
+from app.services import database
+
+
+def _outside_connection():
+    # A separate connection, as another process (e.g. upload_service) would use
+    return sqlite3.connect(database.CONFIG_DB_PATH, isolation_level=None)
+
+
+def test_channels_answer_304_until_changed(client, channel):
+    first = client.get('/api/channels')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/channels', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_channels_follow_a_write_from_another_connection(client, channel):
+    first = client.get('/api/channels')
+    assert [c['name'] for c in first.get_json()] == ['Channel 1']
+
+    conn = _outside_connection()
+    conn.execute(
+        'UPDATE channels SET data = ? WHERE id = ?',
+        (json.dumps(dict(channel, name='Renamed')), channel['id'])
+    )
+    conn.close()
+
+    second = client.get('/api/channels', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert [c['name'] for c in second.get_json()] == ['Renamed']
+    assert second.headers['ETag'] != first.headers['ETag']
+
+
+def test_settings_follow_a_write_from_another_connection(client):
+    first = client.get('/api/settings')
+    assert first.status_code == 200
+
+    conn = _outside_connection()
+    conn.execute(
+        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+        ('global_timezone', json.dumps('America/Denver'))
+    )
+    conn.close()
+
+    second = client.get('/api/settings')
+    assert second.get_json()['global_timezone'] == 'America/Denver'
+    assert second.headers['ETag'] != first.headers['ETag']
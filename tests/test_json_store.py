@@ -0,0 +1,34 @@
+# tests/test_json_store.py
+import json
+
+import pytest
+
+from app.services.json_store import load_json_file
+
+
+def test_reads_file(tmp_path):
+    path = tmp_path / 'channels.json'
+    path.write_text(json.dumps([{'id': 1}]))
+
+    assert load_json_file(str(path)) == [{'id': 1}]
+
+
+def test_missing_file_returns_default(tmp_path):
+    assert load_json_file(str(tmp_path / 'channels.json'), default=[]) == []
+
+
+def test_corrupt_file_falls_back_to_backup_without_touching_either(tmp_path):
+    path = tmp_path / 'channels.json'
+    path.write_text('{"truncated')
+    (tmp_path / 'channels.json.bak').write_text(json.dumps([{'id': 2}]))
+
+    assert load_json_file(str(path)) == [{'id': 2}]
+    assert path.read_text() == '{"truncated'
+
+
+def test_corrupt_file_without_backup_raises(tmp_path):
+    path = tmp_path / 'channels.json'
+    path.write_text('{"truncated')
+
+    with pytest.raises(ValueError):
+        load_json_file(str(path))
@@ -0,0 +1,14 @@
+# tests/test_keyword_hits.py
+from app.services import database
+from app.utils.recording_ids import now_ms
+
+
+def test_keyword_hits_are_stamped_in_milliseconds(channel):
+    before = now_ms()
+    database.save_recording(
+        channel['id'], 'recordings/channel_1/audio_0.wav', '20251009_085300',
+        'engine fire on main street', keywords=['fire']
+    )
+
+    [hit] = database.query_alerts(10)
+    assert before <= hit['created_at'] <= now_ms()
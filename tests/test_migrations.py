@@ -0,0 +1,58 @@
+# tests/test_migrations.py
+import threading
+from contextlib import contextmanager
+
+from app.services import database
+
+
+def user_version(schema):
+    return database.get_connection().execute(f'PRAGMA {schema}.user_version').fetchone()[0]
+
+
+def test_fresh_database_reaches_latest_version(workdir):
+    assert user_version('main') == database.MIGRATIONS[-1][0]
+    assert user_version('config') == database.CONFIG_MIGRATIONS[-1][0]
+
+
+def test_running_migrations_again_is_a_no_op(workdir):
+    assert database.run_migrations() == database.MIGRATIONS[-1][0]
+    assert database.run_migrations() == database.MIGRATIONS[-1][0]
+
+
+def test_concurrent_startups_apply_a_migration_once(workdir, monkeypatch):
+    version = database.MIGRATIONS[-1][0] + 1
+    applied = []
+
+    def migration(conn):
+        """Test migration."""
+        applied.append(threading.get_ident())
+        conn.execute('CREATE TABLE migration_probe (id INTEGER)')
+
+    # Both startups read user_version before either takes the write lock
+    both_read = threading.Barrier(2)
+    transaction = database.transaction
+
+    @contextmanager
+    def racing_transaction():
+        both_read.wait(timeout=5)
+        with transaction() as conn:
+            yield conn
+
+    monkeypatch.setattr(database, 'transaction', racing_transaction)
+    errors = []
+
+    def startup():
+        try:
+            database._apply_migrations(database.get_connection(), [(version, migration)], 'main')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=startup) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(applied) == 1
+    assert user_version('main') == version
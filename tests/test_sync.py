@@ -0,0 +1,59 @@
+# tests/test_sync.py
+import pytest
+
+from app.services import database
+
+
+@pytest.fixture
+def recordings(channel):
+    """Seven transcribed recordings, oldest first."""
+    return [
+        database.save_recording(
+            channel['id'], f'recordings/channel_1/audio_{index}.wav',
+            f'20251009_0853{index:02d}', f'transmission {index}'
+        )
+        for index in range(7)
+    ]
+
+
+def fetch_snapshot(client):
+    pages = [client.get('/api/sync').get_json()]
+    while pages[-1]['has_more']:
+        pages.append(client.get(f"/api/sync?before_id={pages[-1]['next_before_id']}").get_json())
+    return pages
+
+
+def test_full_snapshot_is_paged(app, client, recordings):
+    app.config['RECORDINGS_PAGE_SIZE'] = 3
+
+    pages = fetch_snapshot(client)
+
+    assert [len(page['recordings']) for page in pages] == [3, 3, 1]
+    assert all(page['full'] for page in pages)
+    assert pages[-1]['next_before_id'] is None
+    ids = [recording['id'] for page in pages for recording in page['recordings']]
+    assert ids == sorted(recordings, reverse=True)
+
+
+def test_full_snapshot_that_fits_one_page_has_no_more(app, client, recordings):
+    app.config['RECORDINGS_PAGE_SIZE'] = len(recordings)
+
+    body = client.get('/api/sync').get_json()
+
+    assert body['has_more'] is False
+    assert body['next_before_id'] is None
+    assert len(body['recordings']) == len(recordings)
+
+
+def test_delta_after_snapshot_holds_only_changes(app, client, recordings):
+    app.config['RECORDINGS_PAGE_SIZE'] = 3
+    version = fetch_snapshot(client)[0]['version']
+
+    assert client.get(f'/api/sync?since={version}').status_code == 304
+
+    database.delete_recording(recordings[0])
+    body = client.get(f'/api/sync?since={version}').get_json()
+
+    assert body['full'] is False
+    assert body['deleted_recordings'] == [recordings[0]]
+    assert body['recordings'] == []
@@ -0,0 +1,144 @@
+# tests/test_uploads.py
+import io
+import os
+import wave
+
+import pytest
+
+from app.routes import audio_routes
+from app.utils.recording_ids import parse_captured_at
+
+RECEIVED_AT_MS = 1_760_000_000_000
+
+
+def make_wav(frames=800):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b'\x00\x01' * frames)
+    return buffer.getvalue()
+
+
+class FakeAudioHandler:
+    """Records what the routes queue instead of transcribing it."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.uploads = []
+        self.batches = []
+
+    def queue_upload_for_processing(self, file_path, channel_id, captured_at_ms=None, received_at_ms=None,
+                                    content_hash=None):
+        if self.fail:
+            raise RuntimeError('queue unavailable')
+        self.uploads.append((file_path, channel_id, captured_at_ms, received_at_ms))
+        return True, {'timestamp': captured_at_ms, 'status': 'queued'}
+
+    def queue_batch_for_processing(self, clips, channel_id, received_at_ms=None):
+        if self.fail:
+            raise RuntimeError('queue unavailable')
+        self.batches.append(list(clips))
+        return {}
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    handler = FakeAudioHandler()
+    monkeypatch.setattr(audio_routes, 'get_audio_handler', lambda: handler)
+    return handler
+
+
+def stored_clips(workdir):
+    directory = os.path.join(workdir, 'recordings', 'channel_1')
+    return os.listdir(directory) if os.path.isdir(directory) else []
+
+
+@pytest.mark.parametrize('value', ['inf', '-inf', 'nan', '1e400', 'Infinity', '9999-99-99', 'soon', None, ''])
+def test_parse_captured_at_falls_back_to_receive_time(value):
+    assert parse_captured_at(value, RECEIVED_AT_MS) == RECEIVED_AT_MS
+
+
+@pytest.mark.parametrize('value', ['inf', 'nan', '1e400', '9999-99-99', 'soon'])
+def test_strict_parse_captured_at_rejects_unparseable_values(value):
+    with pytest.raises(ValueError):
+        parse_captured_at(value, RECEIVED_AT_MS, strict=True)
+
+
+@pytest.mark.parametrize('value', [
+    RECEIVED_AT_MS - 5000,
+    (RECEIVED_AT_MS - 5000) / 1000,
+    str(RECEIVED_AT_MS - 5000),
+    '2025-10-09T08:53:15Z',
+])
+def test_parse_captured_at_accepts_epoch_and_iso(value):
+    assert parse_captured_at(value, RECEIVED_AT_MS) == RECEIVED_AT_MS - 5000
+
+
+@pytest.mark.parametrize('captured_at', ['inf', '1e400', 'nan'])
+def test_upload_with_unusable_captured_at_uses_receive_time(client, channel, handler, workdir, captured_at):
+    response = client.post(
+        f"/api/uploads?mac={channel['mac']}&captured_at={captured_at}",
+        data=make_wav(), content_type='audio/wav'
+    )
+
+    assert response.status_code == 200
+    [(file_path, channel_id, captured_at_ms, received_at_ms)] = handler.uploads
+    assert captured_at_ms == received_at_ms
+    assert stored_clips(workdir) == [os.path.basename(file_path)]
+
+
+def test_upload_removes_clip_when_queueing_fails(client, channel, handler, workdir):
+    handler.fail = True
+
+    response = client.post(f"/api/uploads?mac={channel['mac']}", data=make_wav(), content_type='audio/wav')
+
+    assert response.status_code == 500
+    assert stored_clips(workdir) == []
+
+
+def test_upload_from_unknown_device_is_rejected(client, channel, handler, workdir):
+    response = client.post('/api/uploads?mac=00:00:00:00:00:00', data=make_wav(), content_type='audio/wav')
+
+    assert response.status_code == 400
+    assert handler.uploads == []
+    assert stored_clips(workdir) == []
+
+
+def post_batch(client, channel, captured_at):
+    files = [(io.BytesIO(make_wav(800 + index)), f'clip{index}.wav') for index in range(len(captured_at))]
+    return client.post(
+        f"/api/uploads/batch?mac={channel['mac']}",
+        data={'file': files, 'captured_at': captured_at}, content_type='multipart/form-data'
+    )
+
+
+def test_batch_rejects_clip_with_unusable_captured_at(client, channel, handler, workdir):
+    response = post_batch(client, channel, [str(RECEIVED_AT_MS), 'inf'])
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [clip['source'] for clip in body['accepted']] == ['clip0.wav']
+    assert [clip['source'] for clip in body['rejected']] == ['clip1.wav']
+    [queued] = handler.batches
+    assert len(queued) == 1
+    assert stored_clips(workdir) == [os.path.basename(body['accepted'][0]['filename'])]
+
+
+def test_batch_with_only_unusable_captured_at_leaves_nothing_behind(client, channel, handler, workdir):
+    response = post_batch(client, channel, ['nan', '1e400'])
+
+    assert response.status_code == 400
+    assert len(response.get_json()['rejected']) == 2
+    assert handler.batches == []
+    assert stored_clips(workdir) == []
+
+
+def test_batch_removes_clips_when_queueing_fails(client, channel, handler, workdir):
+    handler.fail = True
+
+    response = post_batch(client, channel, ['', ''])
+
+    assert response.status_code == 500
+    assert stored_clips(workdir) == []